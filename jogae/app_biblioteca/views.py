@@ -2,7 +2,7 @@ from django.shortcuts import render, get_object_or_404, redirect
 from .models import FavoriteGamesByUser
 from django.contrib.auth.decorators import login_required
 from games.models import Game
-from django.db.models import Avg, F
+from games.search import search_game_ids
 # Create your views here.
 
 @login_required
@@ -19,13 +19,14 @@ def Biblioteca(request):
     search_query = request.GET.get('q', '')
     ordering = request.GET.get('orderby', 'title') 
 
-    # Filtra jogos da lista pela pesquisa
+    # Filtra jogos da lista pela pesquisa (título, descrição, gêneros e tags)
     if search_query:
-        game_list = game_list.filter(title__icontains=search_query)
+        matched_ids = search_game_ids(search_query, within=game_list.values_list('pk', flat=True))
+        game_list = game_list.filter(pk__in=matched_ids)
 
     # Ordena de acordo com o que foi solicitado
     if ordering == 'rating':
-        game_list = game_list.annotate(avg_rating=Avg('ratings__rating')).order_by(F('avg_rating').desc(nulls_last=True))
+        game_list = game_list.top_rated()
     else:
         game_list = game_list.order_by('title')
 
@@ -3,6 +3,7 @@ from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from django.contrib.auth import get_user_model
 from .models import Thread, ChatMessage
+from .write_buffer import chat_write_buffer
 
 User = get_user_model()
 
@@ -33,13 +34,16 @@ class ChatConsumer(AsyncWebsocketConsumer):
             self.room_group_name,
             self.channel_name
         )
+        # Persist the buffered messages without waiting for the flush interval
+        chat_write_buffer.request_flush()
 
     # Receive message from WebSocket
     async def receive(self, text_data):
         data = json.loads(text_data)
         message = data['message']
 
-        chat_message = await self.create_chat_message(message)
+        # Saved later by the write buffer, off the critical path
+        chat_write_buffer.add(ChatMessage(thread=self.thread, user=self.user, message=message))
 
         # Send message to room group
         await self.channel_layer.group_send(
@@ -63,7 +67,3 @@ class ChatConsumer(AsyncWebsocketConsumer):
     @database_sync_to_async
     def get_or_create_thread(self, user1, user2):
         return Thread.objects.get_or_create(user1, user2)
-
-    @database_sync_to_async
-    def create_chat_message(self, message):
-        return ChatMessage.objects.create(thread=self.thread, user=self.user, message=message)
\ No newline at end of file
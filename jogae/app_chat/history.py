@@ -0,0 +1,57 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from django.conf import settings
+
+from .models import ChatMessage
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(message):
+    payload = json.dumps([message.timestamp.isoformat(), message.pk], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        payload = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        timestamp, pk = json.loads(payload)
+        return datetime.fromisoformat(timestamp), int(pk)
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError) as error:
+        raise InvalidCursor('Cursor de paginação inválido.') from error
+
+
+def message_page(thread, before=None, page_size=None):
+    """
+    Most recent messages of the thread (or the ones before the 'before'
+    cursor), with their authors in the same query. Returns (messages from
+    oldest to newest, cursor for the older messages or None).
+
+    Keyset pagination over the (thread, timestamp, id) index: loading old
+    messages costs the same as loading the most recent ones.
+    """
+    page_size = page_size or settings.CHAT_HISTORY_PAGE_SIZE
+
+    queryset = (
+        ChatMessage.objects.filter(thread=thread)
+        .select_related('user')
+        .order_by('-timestamp', '-id')
+    )
+    if before:
+        timestamp, pk = decode_cursor(before)
+        # (timestamp, id) < (timestamp, id) of the oldest message already shown
+        queryset = queryset.filter(timestamp__lte=timestamp).exclude(timestamp=timestamp, id__gte=pk)
+
+    # One extra message tells whether there are older messages left
+    messages = list(queryset[:page_size + 1])
+    cursor = None
+    if len(messages) > page_size:
+        messages = messages[:page_size]
+        cursor = encode_cursor(messages[-1])
+    messages.reverse()
+    return messages, cursor
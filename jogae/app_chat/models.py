@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 from django.db.models import Q
+from django.utils import timezone
 
 User = get_user_model()
 
@@ -21,6 +22,12 @@ class ThreadManager(models.Manager):
         )
         return thread, created
 
+    def between(self, user1, user2):
+        # Same ordering as get_or_create, without creating the thread
+        if user1.id > user2.id:
+            user1, user2 = user2, user1
+        return self.get_queryset().filter(first_person=user1, second_person=user2)
+
 class Thread(models.Model):
     first_person = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='chat_thread_first')
     second_person = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='chat_thread_second')
@@ -36,4 +43,11 @@ class ChatMessage(models.Model):
     thread = models.ForeignKey(Thread, null=True, blank=True, on_delete=models.CASCADE, related_name='chatmessage_thread')
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     message = models.TextField()
-    timestamp = models.DateTimeField(auto_now_add=True)
\ No newline at end of file
+    # Set when the message is received, not when the write buffer saves it
+    timestamp = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # Most recent messages of a thread and keyset pagination, see app_chat.history
+            models.Index(fields=['thread', 'timestamp', 'id'], name='chatmessage_thread_ts_idx'),
+        ]
@@ -1,3 +1,97 @@
-from django.test import TestCase
+from datetime import timedelta
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from app_cadastro_usuario.models import User
+
+from .history import message_page
+from .models import ChatMessage, Thread
+from .write_buffer import ChatWriteBuffer
+
+
+class ChatWriteBufferTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='jogador')
+        other_user = User.objects.create(username='amigo')
+        cls.thread, _ = Thread.objects.get_or_create(cls.user, other_user)
+
+    def message(self, text):
+        return ChatMessage(thread=self.thread, user=self.user, message=text)
+
+    def test_messages_are_written_in_batches(self):
+        buffer = ChatWriteBuffer(batch_size=3, background=False)
+        first = self.message('primeira')
+        buffer.add(first)
+        buffer.add(self.message('segunda'))
+        self.assertEqual(ChatMessage.objects.count(), 0)
+        self.assertEqual(buffer.queue_depth, 2)
+
+        # The third message fills the batch: one INSERT with all three
+        with self.assertNumQueries(1):
+            buffer.add(self.message('terceira'))
+        self.assertEqual(buffer.queue_depth, 0)
+        self.assertEqual(
+            list(ChatMessage.objects.order_by('id').values_list('message', flat=True)),
+            ['primeira', 'segunda', 'terceira'],
+        )
+        # Time the message was received, not when it was saved
+        self.assertEqual(ChatMessage.objects.get(message='primeira').timestamp, first.timestamp)
+
+        stats = buffer.stats.as_dict()
+        self.assertEqual((stats['enqueued'], stats['written'], stats['flush_count']), (3, 3, 1))
+        self.assertEqual(stats['max_queue_depth'], 3)
+
+    def test_drain_writes_remaining_messages(self):
+        buffer = ChatWriteBuffer(batch_size=10, background=False)
+        buffer.add(self.message('pendente'))
+        buffer.drain()
+        self.assertEqual(buffer.queue_depth, 0)
+        self.assertTrue(ChatMessage.objects.filter(message='pendente').exists())
+
+
+@override_settings(CHAT_HISTORY_PAGE_SIZE=2)
+class ChatHistoryTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='jogador')
+        cls.other_user = User.objects.create(username='amigo')
+        cls.outsider = User.objects.create(username='intruso')
+        cls.thread, _ = Thread.objects.get_or_create(cls.user, cls.other_user)
+
+        # Messages with the same timestamp exercise the tie-break on id
+        now = timezone.now()
+        timestamps = [now - timedelta(minutes=2)] + [now - timedelta(minutes=1)] * 3 + [now]
+        for i, timestamp in enumerate(timestamps):
+            ChatMessage.objects.create(thread=cls.thread, user=cls.user, message=f'mensagem {i}', timestamp=timestamp)
+
+    def test_pages_cover_the_thread_in_order(self):
+        pages, before = [], None
+        while True:
+            messages, before = message_page(self.thread, before=before)
+            self.assertLessEqual(len(messages), 2)
+            pages.insert(0, [message.message for message in messages])
+            if before is None:
+                break
+        self.assertEqual(pages, [['mensagem 0'], ['mensagem 1', 'mensagem 2'], ['mensagem 3', 'mensagem 4']])
+
+    def test_history_view(self):
+        self.client.force_login(self.user)
+        url = reverse('chat:history', kwargs={'username': self.other_user.username})
+        _, before = message_page(self.thread)
+
+        data = self.client.get(url, {'before': before}).json()
+        self.assertEqual([result['message'] for result in data['results']], ['mensagem 1', 'mensagem 2'])
+        self.assertIsNotNone(data['next_cursor'])
+
+        self.assertEqual(self.client.get(url, {'before': 'inválido'}).status_code, 400)
+
+    def test_history_of_other_users_thread(self):
+        # There is no thread between the outsider and the friend
+        self.client.force_login(self.outsider)
+        url = reverse('chat:history', kwargs={'username': self.other_user.username})
+        self.assertEqual(self.client.get(url).status_code, 404)
@@ -3,6 +3,8 @@ from . import views
 
 app_name = 'chat'
 urlpatterns = [
+    path('stats/buffer/', views.chat_buffer_stats, name='buffer_stats'),
     path('<str:username>/', views.chat_room, name='room'),
+    path('<str:username>/history/', views.chat_history, name='history'),
 ]
 
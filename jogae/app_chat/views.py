@@ -1,7 +1,11 @@
 from django.shortcuts import render, get_object_or_404
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import get_user_model
-from .models import Thread, ChatMessage
+from django.http import JsonResponse
+from .history import InvalidCursor, message_page
+from .models import Thread
+from .write_buffer import chat_write_buffer
 
 User = get_user_model()
 
@@ -9,11 +13,43 @@ User = get_user_model()
 def chat_room(request, username):
     other_user = get_object_or_404(User, username=username)
     thread, _ = Thread.objects.get_or_create(request.user, other_user)
-    messages = ChatMessage.objects.filter(thread=thread).order_by('timestamp')
+    # Only the most recent messages, older ones are loaded by chat_history
+    messages, older_cursor = message_page(thread)
     context = {
         'thread': thread,
         'other_user': other_user,
-        'messagesList': messages
+        'messagesList': messages,
+        'older_cursor': older_cursor,
     }
     return render(request, 'chat/chat_room.html', context)
 
+@login_required
+def chat_history(request, username):
+    # Older messages of the conversation as the user scrolls up
+    other_user = get_object_or_404(User, username=username)
+    thread = get_object_or_404(Thread.objects.between(request.user, other_user))
+    try:
+        messages, older_cursor = message_page(thread, before=request.GET.get('before'))
+    except InvalidCursor as error:
+        return JsonResponse({'error': str(error)}, status=400)
+
+    return JsonResponse({
+        'results': [
+            {
+                'id': message.pk,
+                'username': message.user.username,
+                'message': message.message,
+                'timestamp': message.timestamp.isoformat(),
+            }
+            for message in messages
+        ],
+        'next_cursor': older_cursor,
+    })
+
+@staff_member_required
+def chat_buffer_stats(request):
+    # Write buffer of the process (worker) that served the request
+    return JsonResponse({
+        'queue_depth': chat_write_buffer.queue_depth,
+        **chat_write_buffer.stats.as_dict(),
+    })
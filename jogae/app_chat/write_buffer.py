@@ -0,0 +1,226 @@
+import atexit
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+
+from .models import ChatMessage
+
+logger = logging.getLogger(__name__)
+
+# Attempts to save the same batch before it is dropped
+MAX_FLUSH_ATTEMPTS = 3
+
+
+class ChatWriteBufferStats:
+    """
+    Counters of the chat message write buffer in this process.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.failures = 0
+        self.max_queue_depth = 0
+        self.flush_count = 0
+        self.flush_total = 0.0
+        self.flush_max = 0.0
+        self.last_flush_size = 0
+
+    def record_enqueue(self, queue_depth):
+        with self._lock:
+            self.enqueued += 1
+            self.max_queue_depth = max(self.max_queue_depth, queue_depth)
+
+    def record_flush(self, size, seconds):
+        with self._lock:
+            self.written += size
+            self.flush_count += 1
+            self.flush_total += seconds
+            self.flush_max = max(self.flush_max, seconds)
+            self.last_flush_size = size
+
+    def record_failure(self, dropped=0):
+        with self._lock:
+            self.failures += 1
+            self.dropped += dropped
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                'enqueued': self.enqueued,
+                'written': self.written,
+                'dropped': self.dropped,
+                'failures': self.failures,
+                'max_queue_depth': self.max_queue_depth,
+                'flush_count': self.flush_count,
+                'flush_avg_ms': self.flush_total * 1000 / self.flush_count if self.flush_count else 0.0,
+                'flush_max_ms': self.flush_max * 1000,
+                'last_flush_size': self.last_flush_size,
+            }
+
+
+class ChatWriteBuffer:
+    """
+    Write-behind buffer for chat messages. The consumer sends the message to
+    the room group right away and only queues it here; a thread of the process
+    saves the queued messages with a single bulk_create once the buffer holds
+    'batch_size' messages or the oldest one has waited 'interval' seconds. One
+    INSERT per batch takes SQLite's write lock once, instead of once per
+    message of every room.
+
+    With background=False there is no thread: the batch is saved by the
+    add() call that fills it, or by flush().
+    """
+
+    def __init__(self, batch_size=None, interval=None, background=True):
+        self._batch_size = batch_size
+        self._interval = interval
+        self.background = background
+        self.stats = ChatWriteBufferStats()
+
+        self._condition = threading.Condition()
+        # Serializes the writes, keeping the batches in order
+        self._flush_lock = threading.Lock()
+        self._pending = []
+        self._oldest_at = None
+        self._attempts = 0
+        self._thread = None
+        self._stopping = False
+
+    @property
+    def batch_size(self):
+        return self._batch_size or getattr(settings, 'CHAT_WRITE_BUFFER_SIZE', 100)
+
+    @property
+    def interval(self):
+        if self._interval is not None:
+            return self._interval
+        return getattr(settings, 'CHAT_WRITE_BUFFER_INTERVAL', 0.5)
+
+    @property
+    def queue_depth(self):
+        with self._condition:
+            return len(self._pending)
+
+    def add(self, message):
+        """
+        Queue the message (an unsaved ChatMessage carrying the time it was
+        received). In background mode this never touches the database, so it
+        can be called straight from the event loop.
+        """
+        with self._condition:
+            if not self._pending:
+                self._oldest_at = time.monotonic()
+            self._pending.append(message)
+            queue_depth = len(self._pending)
+            if self.background:
+                self._ensure_thread()
+                if queue_depth >= self.batch_size:
+                    self._condition.notify_all()
+        self.stats.record_enqueue(queue_depth)
+
+        if not self.background and queue_depth >= self.batch_size:
+            self.flush()
+
+    def request_flush(self):
+        """
+        Ask the thread to save whatever is buffered without waiting for the
+        interval (e.g. when a conversation is closed).
+        """
+        with self._condition:
+            self._oldest_at = float('-inf') if self._pending else None
+            self._condition.notify_all()
+
+    def flush(self):
+        """
+        Save the buffered messages with a single bulk_create and return how
+        many were saved. On error the batch goes back to the front of the
+        buffer, and it is dropped after MAX_FLUSH_ATTEMPTS attempts.
+        """
+        with self._flush_lock:
+            with self._condition:
+                batch, self._pending = self._pending, []
+                self._oldest_at = None
+            if not batch:
+                return 0
+
+            started = time.perf_counter()
+            try:
+                ChatMessage.objects.bulk_create(batch)
+            except Exception:
+                self._attempts += 1
+                if self._attempts >= MAX_FLUSH_ATTEMPTS:
+                    logger.exception("Dropped a batch of %s chat messages after %s attempts.", len(batch), self._attempts)
+                    self._attempts = 0
+                    self.stats.record_failure(dropped=len(batch))
+                else:
+                    logger.exception("Failed to save %s chat messages.", len(batch))
+                    self.stats.record_failure()
+                    with self._condition:
+                        self._pending[:0] = batch
+                        self._oldest_at = time.monotonic()
+                return 0
+
+            self._attempts = 0
+            self.stats.record_flush(len(batch), time.perf_counter() - started)
+            return len(batch)
+
+    def _ensure_thread(self):
+        # Called with self._condition held
+        if self._thread is None or not self._thread.is_alive():
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name='chat-write-buffer', daemon=True)
+            self._thread.start()
+
+    def _wait_for_batch(self):
+        # Wait until the batch is full, the oldest message has waited the
+        # interval or the buffer is drained; an idle buffer never wakes up
+        with self._condition:
+            while not self._stopping:
+                if not self._pending:
+                    self._condition.wait()
+                    continue
+                if len(self._pending) >= self.batch_size:
+                    return
+                remaining = self._oldest_at + self.interval - time.monotonic()
+                if remaining <= 0:
+                    return
+                self._condition.wait(remaining)
+
+    def _run(self):
+        try:
+            while True:
+                self._wait_for_batch()
+                written = self.flush()
+                with self._condition:
+                    if self._stopping and (not self._pending or not written):
+                        return
+        finally:
+            connection.close()
+
+    def drain(self, timeout=10):
+        """
+        Stop the thread and save everything still buffered. Called when the
+        process exits.
+        """
+        with self._condition:
+            self._stopping = True
+            thread = self._thread
+            self._condition.notify_all()
+        if thread is not None:
+            thread.join(timeout)
+        # Whatever the thread did not save (or no thread at all)
+        while self.flush():
+            pass
+
+
+chat_write_buffer = ChatWriteBuffer()
+atexit.register(chat_write_buffer.drain)
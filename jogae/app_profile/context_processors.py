@@ -1,10 +1,15 @@
-from .models import Friendship
+from django.utils.functional import SimpleLazyObject
+
+from .friend_graph import get_friends
 
 def friends_list(request):
     """
     Makes the user's friends list available in the context of all templates.
+    The list is only loaded when a template actually reads it.
     """
-    if request.user.is_authenticated:
-        friends = Friendship.objects.get_friends(request.user)
-        return {'friends_for_sidebar': friends}
-    return {}
\ No newline at end of file
+    def load_friends():
+        if request.user.is_authenticated:
+            return get_friends(request.user)
+        return []
+
+    return {'friends_for_sidebar': SimpleLazyObject(load_friends)}
@@ -0,0 +1,323 @@
+import itertools
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.db.models import Q
+
+from .models import Friendship
+
+User = get_user_model()
+
+CACHE_ALIAS = 'friends'
+# Usuários alterados depois da construção do grafo que disparam uma
+# reconstrução completa em segundo plano
+MAX_OVERRIDES = 10000
+
+
+def get_cache():
+    return caches[CACHE_ALIAS]
+
+
+def _friends_key(user_id):
+    return f'friends:{user_id}'
+
+
+def load_friend_ids(user_id):
+    """
+    Ids dos amigos do usuário (amizades aceitas nos dois sentidos) direto da
+    base de dados, sem instanciar as amizades nem os usuários.
+    """
+    pairs = Friendship.objects.filter(
+        Q(from_user_id=user_id) | Q(to_user_id=user_id),
+        status=Friendship.Status.ACCEPTED,
+    ).values_list('from_user_id', 'to_user_id')
+    return tuple(sorted({to_id if from_id == user_id else from_id for from_id, to_id in pairs}))
+
+
+def load_request_user_ids(user_id):
+    """
+    Ids dos usuários com um pedido de amizade pendente ou recusado com o
+    usuário, enviado ou recebido. Não são sugeridos como amigos.
+    """
+    pairs = Friendship.objects.filter(
+        Q(from_user_id=user_id) | Q(to_user_id=user_id),
+    ).exclude(status=Friendship.Status.ACCEPTED).values_list('from_user_id', 'to_user_id')
+    return {to_id if from_id == user_id else from_id for from_id, to_id in pairs}
+
+
+def get_friend_ids(user_id):
+    """
+    Ids dos amigos do usuário em uma tupla ordenada, guardada no cache
+    'friends' até a próxima alteração de amizade do usuário.
+    """
+    cache = get_cache()
+    friend_ids = cache.get(_friends_key(user_id))
+    if friend_ids is None:
+        friend_ids = load_friend_ids(user_id)
+        cache.set(_friends_key(user_id), friend_ids)
+    return friend_ids
+
+
+def get_friends(user):
+    """
+    Amigos do usuário ordenados pelo nome de usuário, com uma única consulta
+    (nenhuma quando ele não possui amigos).
+    """
+    friend_ids = get_friend_ids(user.pk)
+    if not friend_ids:
+        return []
+    return list(User.objects.filter(pk__in=friend_ids).order_by('username'))
+
+
+def invalidate_friends(user_ids):
+    """
+    Descarta os amigos em cache dos usuários após o commit da transação
+    atual, assim a próxima leitura já enxerga a amizade nova.
+    """
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    if not user_ids:
+        return
+    transaction.on_commit(lambda: get_cache().delete_many([_friends_key(user_id) for user_id in user_ids]))
+
+
+class FriendGraph:
+    """
+    Grafo de amizades aceitas em memória no formato CSR: 'user_ids' ordenado
+    com os usuários que possuem amigos, e os amigos do usuário na posição i
+    ficam ordenados em indices[indptr[i]:indptr[i + 1]].
+
+    O grafo base é imutável. Amizades alteradas depois da construção entram em
+    'overrides' (usuário -> lista completa de amigos) em uma cópia nova do
+    grafo, assim leitores em outras threads nunca enxergam uma alteração pela
+    metade.
+    """
+
+    def __init__(self, user_ids, indptr, indices, overrides=None):
+        self.user_ids = user_ids
+        self.indptr = indptr
+        self.indices = indices
+        self.overrides = overrides or {}
+
+    @classmethod
+    def from_edges(cls, from_ids, to_ids):
+        """
+        Monta o grafo a partir das amizades (from_ids[i], to_ids[i]) nos dois
+        sentidos, sem laços nem arestas repetidas.
+        """
+        from_ids = np.asarray(from_ids)
+        to_ids = np.asarray(to_ids)
+        max_id = int(max(from_ids.max(initial=0), to_ids.max(initial=0)))
+        # Ids até 2^31 cabem em int32, a metade da memória
+        dtype = np.int32 if max_id < 2 ** 31 else np.int64
+        sources = np.concatenate([from_ids, to_ids]).astype(dtype, copy=False)
+        targets = np.concatenate([to_ids, from_ids]).astype(dtype, copy=False)
+
+        keep = sources != targets
+        sources, targets = sources[keep], targets[keep]
+        # Ordena e remove as repetidas com uma única chave inteira por aresta
+        base = max_id + 1
+        keys = np.sort(sources.astype(np.int64) * base + targets)
+        unique = np.ones(len(keys), dtype=bool)
+        unique[1:] = keys[1:] != keys[:-1]
+        keys = keys[unique]
+        sources, targets = (keys // base).astype(dtype), (keys % base).astype(dtype)
+
+        # 'sources' já está ordenado: cada usuário começa onde o id muda
+        first = np.ones(len(sources), dtype=bool)
+        first[1:] = sources[1:] != sources[:-1]
+        starts = np.flatnonzero(first)
+        user_ids = sources[starts]
+        indptr = np.append(starts, len(sources)).astype(np.int64)
+        return cls(user_ids, indptr, targets)
+
+    @property
+    def num_edges(self):
+        # Amizades (cada uma aparece nos dois sentidos) do grafo base
+        return len(self.indices) // 2
+
+    def _row(self, user_id):
+        row = np.searchsorted(self.user_ids, user_id)
+        if row < len(self.user_ids) and self.user_ids[row] == user_id:
+            return row
+        return None
+
+    def friends(self, user_id):
+        """
+        Ids dos amigos do usuário em um array ordenado, O(log n) para
+        encontrar a linha.
+        """
+        if user_id in self.overrides:
+            return self.overrides[user_id]
+        row = self._row(user_id)
+        if row is None:
+            return self.indices[:0]
+        return self.indices[self.indptr[row]:self.indptr[row + 1]]
+
+    def mutual_count(self, user_id, other_user_id):
+        """
+        Quantidade de amigos em comum: cada amigo da menor lista é procurado
+        (busca binária) na maior, sem montar conjuntos.
+        """
+        smaller, larger = sorted((self.friends(user_id), self.friends(other_user_id)), key=len)
+        if not len(smaller) or not len(larger):
+            return 0
+        positions = np.minimum(np.searchsorted(larger, smaller), len(larger) - 1)
+        return int(np.count_nonzero(larger[positions] == smaller))
+
+    def _friends_of(self, user_ids):
+        # Concatena as listas de amigos de vários usuários; as do grafo base
+        # são lidas de uma vez com índices vetorizados
+        base_ids = [user_id for user_id in user_ids if user_id not in self.overrides]
+        parts = [self.overrides[user_id] for user_id in user_ids if user_id in self.overrides]
+
+        if base_ids:
+            base_ids = np.asarray(base_ids, dtype=self.user_ids.dtype)
+            rows = np.searchsorted(self.user_ids, base_ids)
+            found = rows < len(self.user_ids)
+            found[found] = self.user_ids[rows[found]] == base_ids[found]
+            rows = rows[found]
+            starts = self.indptr[rows]
+            lengths = self.indptr[rows + 1] - starts
+            offsets = np.repeat(starts - np.concatenate([[0], np.cumsum(lengths)[:-1]]), lengths)
+            parts.append(self.indices[np.arange(lengths.sum()) + offsets])
+        if not parts:
+            return self.indices[:0]
+        return np.concatenate(parts)
+
+    def suggestions(self, user_id, limit=10, exclude=()):
+        """
+        Amigos de amigos que ainda não são amigos do usuário, ordenados pela
+        quantidade de amigos em comum (e pelo id nos empates). Usuários em
+        'exclude' (por exemplo com pedido pendente ou recusado, ver
+        load_request_user_ids) nunca são sugeridos. Custo proporcional à soma
+        dos graus dos amigos. Retorna [(user_id, em comum)].
+        """
+        friends = self.friends(user_id)
+        if not len(friends):
+            return []
+        candidates = self._friends_of([int(friend_id) for friend_id in friends])
+        keep = (candidates != user_id) & ~np.isin(candidates, friends)
+        if len(exclude):
+            keep &= ~np.isin(candidates, np.fromiter(exclude, dtype=np.int64))
+        candidates = candidates[keep]
+        if not len(candidates):
+            return []
+
+        candidate_ids, mutual = np.unique(candidates, return_counts=True)
+        order = np.lexsort((candidate_ids, -mutual))[:limit]
+        return [(int(candidate_ids[i]), int(mutual[i])) for i in order]
+
+    def with_friendship(self, user_id, other_user_id, accepted):
+        """
+        Cópia do grafo com a amizade entre os dois usuários criada
+        (accepted=True) ou desfeita.
+        """
+        overrides = dict(self.overrides)
+        for first, second in ((user_id, other_user_id), (other_user_id, user_id)):
+            friends = self.friends(first)
+            position = np.searchsorted(friends, second)
+            present = position < len(friends) and friends[position] == second
+            if accepted and not present:
+                friends = np.insert(friends, position, second).astype(self.indices.dtype, copy=False)
+            elif not accepted and present:
+                friends = np.delete(friends, position)
+            overrides[first] = friends
+        return FriendGraph(self.user_ids, self.indptr, self.indices, overrides)
+
+
+def build_friend_graph():
+    """
+    Lê todas as amizades aceitas em uma única consulta (somente os ids) e
+    monta o grafo.
+    """
+    pairs = Friendship.objects.filter(
+        status=Friendship.Status.ACCEPTED,
+    ).values_list('from_user_id', 'to_user_id').iterator(chunk_size=10000)
+    flat = np.fromiter(itertools.chain.from_iterable(pairs), dtype=np.int64)
+    return FriendGraph.from_edges(flat[0::2], flat[1::2])
+
+
+class FriendGraphService:
+    """
+    Mantém o grafo de amizades do processo. Alterações feitas neste processo
+    são aplicadas na hora; o grafo é reconstruído em segundo plano a cada
+    FRIEND_GRAPH_REFRESH_INTERVAL segundos (alterações de outros processos) ou
+    quando acumula MAX_OVERRIDES usuários alterados.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._graph = None
+        self._built_at = None
+        self._rebuilding = False
+        # Alterações recebidas durante uma reconstrução, reaplicadas no grafo novo
+        self._pending_changes = None
+
+    def get(self):
+        with self._lock:
+            graph = self._graph
+            refresh_interval = getattr(settings, 'FRIEND_GRAPH_REFRESH_INTERVAL', 300)
+            stale = (
+                self._built_at is None
+                or time.monotonic() - self._built_at >= refresh_interval
+                or (graph is not None and len(graph.overrides) >= MAX_OVERRIDES)
+            )
+            start_rebuild = stale and graph is not None and not self._rebuilding
+            if start_rebuild:
+                self._rebuilding = True
+
+        if graph is None:
+            # Primeira consulta do processo: constrói antes de responder
+            return self.rebuild()
+        if start_rebuild:
+            threading.Thread(target=self._rebuild_in_background, daemon=True).start()
+        return graph
+
+    def _rebuild_in_background(self):
+        try:
+            self.rebuild()
+        finally:
+            connection.close()
+            with self._lock:
+                self._rebuilding = False
+
+    def rebuild(self):
+        with self._lock:
+            self._pending_changes = []
+        graph = build_friend_graph()
+        with self._lock:
+            for change in self._pending_changes or []:
+                graph = graph.with_friendship(*change)
+            self._pending_changes = None
+            self._graph = graph
+            self._built_at = time.monotonic()
+        return graph
+
+    def apply_change(self, user_id, other_user_id, accepted):
+        with self._lock:
+            if self._pending_changes is not None:
+                self._pending_changes.append((user_id, other_user_id, accepted))
+            if self._graph is not None:
+                self._graph = self._graph.with_friendship(user_id, other_user_id, accepted)
+
+
+friend_graph_service = FriendGraphService()
+
+
+def get_friend_graph():
+    return friend_graph_service.get()
+
+
+def update_friend_graph(friendship, deleted=False):
+    """
+    Aplica a mudança de status da amizade no grafo do processo após o commit
+    da transação atual.
+    """
+    accepted = not deleted and friendship.status == Friendship.Status.ACCEPTED
+    from_user_id, to_user_id = friendship.from_user_id, friendship.to_user_id
+    transaction.on_commit(lambda: friend_graph_service.apply_change(from_user_id, to_user_id, accepted))
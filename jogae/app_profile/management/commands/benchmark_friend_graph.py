@@ -0,0 +1,66 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from app_profile.friend_graph import FriendGraph
+
+class Command(BaseCommand):
+    help = 'Mede o grafo de amizades (CSR) em um grafo sintético, sem acessar a base de dados.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1_000_000, help='Quantidade de usuários do grafo sintético.')
+        parser.add_argument('--avg-degree', type=int, default=20, help='Quantidade média de amigos por usuário.')
+        parser.add_argument('--max-degree', type=int, default=5000, help='Grau esperado máximo de um usuário.')
+        parser.add_argument('--queries', type=int, default=1000, help='Quantidade de consultas medidas em cada operação.')
+        parser.add_argument('--limit', type=int, default=10, help='Quantidade de sugestões por consulta.')
+        parser.add_argument('--seed', type=int, default=42, help='Semente do gerador aleatório.')
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+        num_users = options['users']
+        num_edges = num_users * options['avg_degree'] // 2
+
+        # Grau esperado de cada usuário segue uma lei de potência limitada em
+        # --max-degree (modelo de Chung-Lu): poucos usuários com muitos amigos
+        self.stdout.write(self.style.NOTICE(f'Gerando {num_edges} amizades entre {num_users} usuários...'))
+        weights = rng.pareto(2.5, size=num_users) + 1
+        weights = np.minimum(weights, options['max_degree'] * weights.mean() / options['avg_degree'])
+        probabilities = weights / weights.sum()
+        from_ids = rng.choice(num_users, size=num_edges, p=probabilities) + 1
+        to_ids = rng.choice(num_users, size=num_edges, p=probabilities) + 1
+
+        started = time.perf_counter()
+        graph = FriendGraph.from_edges(from_ids, to_ids)
+        build_time = time.perf_counter() - started
+        del from_ids, to_ids
+        size_mb = (graph.user_ids.nbytes + graph.indptr.nbytes + graph.indices.nbytes) / (1024 * 1024)
+        degrees = np.diff(graph.indptr)
+        self.stdout.write(
+            f'Grafo com {len(graph.user_ids)} usuários e {graph.num_edges} amizades em {build_time:.2f}s | '
+            f'{size_mb:.1f} MB | grau médio {degrees.mean():.1f}, máximo {degrees.max()}'
+        )
+
+        users = rng.choice(graph.user_ids, size=options['queries'])
+        # Pares a dois passos de distância, que possuem amigos em comum
+        pairs = []
+        for user_id in users:
+            friends = graph.friends(user_id)
+            friends_of_friend = graph.friends(rng.choice(friends))
+            pairs.append((user_id, rng.choice(friends_of_friend)))
+
+        self.report('Amigos em comum', [lambda pair=pair: graph.mutual_count(*pair) for pair in pairs])
+        self.report('Sugestões (2 passos)', [
+            lambda user_id=user_id: graph.suggestions(user_id, limit=options['limit']) for user_id in users
+        ])
+        self.report('Alteração de amizade', [lambda pair=pair: graph.with_friendship(*pair, True) for pair in pairs])
+        self.stdout.write(self.style.SUCCESS('Benchmark concluído!'))
+
+    def report(self, label, calls):
+        timings = []
+        for call in calls:
+            started = time.perf_counter()
+            call()
+            timings.append((time.perf_counter() - started) * 1000)
+        p50, p99 = np.percentile(timings, [50, 99])
+        self.stdout.write(f'  {label}: p50 {p50:.3f} ms | p99 {p99:.3f} ms | máximo {max(timings):.3f} ms')
@@ -12,7 +12,7 @@ class FriendshipManager(models.Manager):
         friend_qs = self.get_queryset().filter(
             (Q(from_user=user) | Q(to_user=user)),
             status='ACCEPTED'
-        )
+        ).select_related('from_user', 'to_user')
         friends = []
         for friendship in friend_qs:
             if friendship.from_user == user:
@@ -0,0 +1,19 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .friend_graph import invalidate_friends, update_friend_graph
+from .models import Friendship
+
+
+@receiver(post_save, sender=Friendship)
+def friendship_saved(sender, instance, **kwargs):
+    # Pedido aceito, recusado ou reenviado: os dois lados são recarregados
+    invalidate_friends([instance.from_user_id, instance.to_user_id])
+    update_friend_graph(instance)
+
+
+@receiver(post_delete, sender=Friendship)
+def friendship_deleted(sender, instance, **kwargs):
+    invalidate_friends([instance.from_user_id, instance.to_user_id])
+    update_friend_graph(instance, deleted=True)
+
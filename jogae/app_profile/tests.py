@@ -1,3 +1,181 @@
-from django.test import TestCase
+import numpy as np
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from app_cadastro_usuario.models import User
+
+from .friend_graph import (
+    FriendGraph,
+    FriendGraphService,
+    friend_graph_service,
+    get_cache,
+    get_friend_ids,
+    get_friends,
+    load_request_user_ids,
+)
+from .models import Friendship
+
+
+class FriendsCacheTests(TestCase):
+    """
+    Amigos da barra lateral guardados no cache 'friends' e descartados pelos
+    sinais de Friendship.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='jogador')
+        cls.friend = User.objects.create(username='amigo')
+        cls.new_friend = User.objects.create(username='novo_amigo')
+        Friendship.objects.create(from_user=cls.user, to_user=cls.friend, status=Friendship.Status.ACCEPTED)
+
+    def setUp(self):
+        get_cache().clear()
+        self.addCleanup(get_cache().clear)
+
+    def test_cold_fill_then_hit(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(get_friend_ids(self.user.pk), (self.friend.pk,))
+        with self.assertNumQueries(0):
+            self.assertEqual(get_friend_ids(self.user.pk), (self.friend.pk,))
+        # Somente a consulta dos usuários, os ids já estão em cache
+        with self.assertNumQueries(1):
+            self.assertEqual(get_friends(self.user), [self.friend])
+
+    def test_friendship_changes_invalidate_both_users(self):
+        get_friend_ids(self.user.pk)
+        get_friend_ids(self.new_friend.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            friendship = Friendship.objects.create(
+                from_user=self.new_friend, to_user=self.user, status=Friendship.Status.ACCEPTED,
+            )
+        with self.assertNumQueries(1):
+            self.assertEqual(get_friend_ids(self.user.pk), tuple(sorted((self.friend.pk, self.new_friend.pk))))
+        self.assertEqual(get_friend_ids(self.new_friend.pk), (self.user.pk,))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            friendship.delete()
+        self.assertEqual(get_friend_ids(self.user.pk), (self.friend.pk,))
+        self.assertEqual(get_friend_ids(self.new_friend.pk), ())
+
+
+class FriendGraphTests(SimpleTestCase):
+    """
+    Grafo CSR comparado com conjuntos montados por força bruta, antes e
+    depois de amizades criadas e desfeitas com cópia (overrides).
+    """
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        # Laços e arestas repetidas nos dois sentidos são descartados pelo grafo
+        edges = rng.integers(1, 40, size=(120, 2))
+        self.graph = FriendGraph.from_edges(edges[:, 0], edges[:, 1])
+        self.friends = {user_id: set() for user_id in range(1, 45)}
+        for first, second in edges.tolist():
+            if first != second:
+                self.friends[first].add(second)
+                self.friends[second].add(first)
+
+    def expected_suggestions(self, user_id, limit, exclude=()):
+        mutual = {
+            candidate: len(self.friends[user_id] & self.friends[candidate])
+            for candidate in self.friends
+            if candidate != user_id and candidate not in self.friends[user_id] and candidate not in exclude
+        }
+        ranked = sorted((-count, candidate) for candidate, count in mutual.items() if count)
+        return [(candidate, -count) for count, candidate in ranked[:limit]]
+
+    def assert_matches(self, graph):
+        for user_id in self.friends:
+            self.assertEqual(graph.friends(user_id).tolist(), sorted(self.friends[user_id]))
+            self.assertEqual(graph.suggestions(user_id, limit=5), self.expected_suggestions(user_id, 5))
+            for other_user_id in self.friends:
+                self.assertEqual(
+                    graph.mutual_count(user_id, other_user_id),
+                    len(self.friends[user_id] & self.friends[other_user_id]),
+                )
+
+    def change(self, graph, user_id, other_user_id, accepted):
+        if accepted:
+            self.friends[user_id].add(other_user_id)
+            self.friends[other_user_id].add(user_id)
+        else:
+            self.friends[user_id].discard(other_user_id)
+            self.friends[other_user_id].discard(user_id)
+        return graph.with_friendship(user_id, other_user_id, accepted)
+
+    def test_base_graph(self):
+        self.assert_matches(self.graph)
+
+    def test_excluded_suggestions(self):
+        for user_id in self.friends:
+            # Os primeiros sugeridos saem e a lista é completada com os seguintes
+            exclude = {candidate for candidate, _ in self.expected_suggestions(user_id, 2)}
+            self.assertEqual(
+                self.graph.suggestions(user_id, limit=5, exclude=exclude),
+                self.expected_suggestions(user_id, 5, exclude),
+            )
+
+    def test_friendships_changed_after_the_build(self):
+        graph = self.graph
+        base_friends = {user_id: self.graph.friends(user_id).tolist() for user_id in self.friends}
+        # Amizade nova (inclusive de um usuário fora do grafo base) e desfeita
+        user_id = int(self.graph.user_ids[0])
+        removed = int(self.graph.friends(user_id)[0])
+        for first, second, accepted in ((user_id, 44, True), (user_id, removed, False), (3, 17, True), (user_id, 44, False)):
+            graph = self.change(graph, first, second, accepted)
+            self.assert_matches(graph)
+        self.assertIn(user_id, graph.overrides)
+
+        # O grafo base não é alterado pelas cópias
+        self.assertEqual({user_id: self.graph.friends(user_id).tolist() for user_id in self.friends}, base_friends)
+        self.assertEqual(self.graph.overrides, {})
+
+
+class FriendGraphServiceTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [User.objects.create(username=f'jogador{i}') for i in range(3)]
+        Friendship.objects.create(from_user=cls.users[0], to_user=cls.users[1], status=Friendship.Status.ACCEPTED)
+
+    def test_changes_after_the_build(self):
+        service = FriendGraphService()
+        first, second, third = (user.pk for user in self.users)
+        self.assertEqual(service.get().friends(first).tolist(), [second])
+
+        service.apply_change(first, third, True)
+        self.assertEqual(service.get().friends(first).tolist(), sorted([second, third]))
+        self.assertEqual(service.get().mutual_count(second, third), 1)
+
+        service.apply_change(first, third, False)
+        self.assertEqual(service.get().friends(first).tolist(), [second])
+        self.assertEqual(service.get().friends(third).tolist(), [])
+
+
+class ProfileSuggestionsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='jogador')
+        friend = User.objects.create(username='amigo')
+        cls.pending = User.objects.create(username='pendente')
+        cls.declined = User.objects.create(username='recusado')
+        cls.suggested = User.objects.create(username='sugerido')
+        Friendship.objects.create(from_user=cls.user, to_user=friend, status=Friendship.Status.ACCEPTED)
+        for other in (cls.pending, cls.declined, cls.suggested):
+            Friendship.objects.create(from_user=friend, to_user=other, status=Friendship.Status.ACCEPTED)
+        # Pedido enviado pelo usuário e pedido recebido e recusado por ele
+        Friendship.objects.create(from_user=cls.user, to_user=cls.pending, status=Friendship.Status.PENDING)
+        Friendship.objects.create(from_user=cls.declined, to_user=cls.user, status=Friendship.Status.DECLINED)
+
+    def setUp(self):
+        friend_graph_service.rebuild()
+        self.addCleanup(friend_graph_service.rebuild)
+
+    def test_requested_users_are_not_suggested(self):
+        self.assertEqual(load_request_user_ids(self.user.pk), {self.pending.pk, self.declined.pk})
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('profile:profile', kwargs={'pk': self.user.username}))
+        self.assertEqual(response.context['suggestions'], [(self.suggested, 1)])
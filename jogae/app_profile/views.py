@@ -4,6 +4,7 @@ from django.contrib.auth import get_user_model
 from django.contrib import messages
 from app_cadastro_usuario.forms import UserChangeForm
 from django.db.models import Q, Count
+from .friend_graph import get_friend_graph, get_friend_ids, load_request_user_ids
 from .models import Friendship
 from app_biblioteca.models import FavoriteGamesByUser
 from games.models import Game
@@ -30,9 +31,29 @@ def Profile(request,pk):
         elif friendship.status == Friendship.Status.ACCEPTED:
             friendship_status = 'FRIENDS'
 
+    # Amigos em comum e sugestões de amizade pelo grafo de amizades em memória
+    friend_graph = get_friend_graph()
+    mutual_friends = None
+    suggestions = []
+    if user != request.user:
+        mutual_friends = friend_graph.mutual_count(request.user.pk, user.pk)
+    else:
+        # Sem quem já tem um pedido de amizade pendente ou recusado com o usuário
+        suggested = friend_graph.suggestions(
+            request.user.pk, limit=5, exclude=load_request_user_ids(request.user.pk),
+        )
+        suggested_users = User.objects.in_bulk([user_id for user_id, _ in suggested])
+        suggestions = [
+            (suggested_users[user_id], mutual)
+            for user_id, mutual in suggested
+            if user_id in suggested_users
+        ]
+
     context = { 
         'user' : user,
-        'friendship_status': friendship_status
+        'friendship_status': friendship_status,
+        'mutual_friends': mutual_friends,
+        'suggestions': suggestions,
     }
 
     return render(request, 'profile/profile.html', context)
@@ -55,11 +76,15 @@ def games(request,pk):
 
 @login_required
 def Friends(request):
-    # Use the manager to get a list of friend user objects
-    friends = Friendship.objects.get_friends(request.user)
+    # Friends from the cached friend graph, with their games in one extra query
+    friends = User.objects.filter(
+        pk__in=get_friend_ids(request.user.pk)
+    ).prefetch_related('game_set').order_by('username')
 
     # Get pending requests sent to the current user for them to accept/decline
-    pending_requests = Friendship.objects.filter(to_user=request.user, status=Friendship.Status.PENDING)
+    pending_requests = Friendship.objects.filter(
+        to_user=request.user, status=Friendship.Status.PENDING
+    ).select_related('from_user')
 
     context = {
         'friends': friends,
@@ -136,7 +161,9 @@ def Solicitacoes(request):
         
         return redirect('profile:solicitacoes')
 
-    pending_requests = Friendship.objects.filter(to_user=user, status=Friendship.Status.PENDING)
+    pending_requests = Friendship.objects.filter(
+        to_user=user, status=Friendship.Status.PENDING
+    ).select_related('from_user')
 
     context = {
         'pending_requests': pending_requests
@@ -0,0 +1,266 @@
+import time
+
+import numpy as np
+from django.conf import settings
+from scipy import sparse
+from sklearn.decomposition import TruncatedSVD
+from sklearn.preprocessing import normalize
+
+from .artifact_registry import ArtifactRegistry
+from .artifact_storage import delete_artifact, load_arrays, save_arrays
+from .models import GameANNIndex
+from .ranking import top_k
+
+
+ARTIFACT_KIND = 'ann'
+ARTIFACT_ARRAYS = ('components', 'centroids', 'list_offsets', 'list_rows', 'game_ids')
+
+DEFAULT_COMPONENTS = 128
+DEFAULT_ITERATIONS = 20
+DEFAULT_NPROBE = 8
+
+
+def build_embeddings(tfidf_matrix, num_components=DEFAULT_COMPONENTS, random_state=0):
+    """
+    Reduz a matriz TF-IDF (jogos x vocabulário) com SVD truncado. Retorna os
+    embeddings densos normalizados (jogos x componentes) e a matriz de projeção
+    (componentes x vocabulário) usada para projetar os perfis na consulta.
+    """
+    num_components = min(num_components, tfidf_matrix.shape[1] - 1, tfidf_matrix.shape[0] - 1)
+    svd = TruncatedSVD(n_components=num_components, algorithm='randomized', random_state=random_state)
+    embeddings = svd.fit_transform(tfidf_matrix)
+    return (
+        normalize(embeddings, norm='l2').astype(np.float32),
+        svd.components_.astype(np.float32),
+    )
+
+
+def assign_lists(embeddings, centroids, block_size=65536):
+    # Centróide mais próximo (maior cosseno) de cada embedding, em blocos para
+    # não materializar a matriz jogos x listas inteira
+    assignments = np.empty(embeddings.shape[0], dtype=np.int64)
+    for start in range(0, embeddings.shape[0], block_size):
+        stop = start + block_size
+        assignments[start:stop] = np.argmax(embeddings[start:stop] @ centroids.T, axis=1)
+    return assignments
+
+
+def spherical_kmeans(embeddings, num_lists, iterations=DEFAULT_ITERATIONS, random_state=0):
+    """
+    K-means com similaridade de cosseno: os centróides são a média normalizada
+    dos embeddings de cada lista. Retorna (centróides, lista de cada jogo).
+    """
+    rng = np.random.default_rng(random_state)
+    num_games = embeddings.shape[0]
+    num_lists = max(1, min(num_lists, num_games))
+    centroids = embeddings[rng.choice(num_games, num_lists, replace=False)].copy()
+
+    assignments = None
+    for _ in range(iterations):
+        new_assignments = assign_lists(embeddings, centroids)
+        if assignments is not None and np.array_equal(assignments, new_assignments):
+            break
+        assignments = new_assignments
+
+        # Soma dos embeddings de cada lista com um único produto esparso
+        membership = sparse.csr_matrix(
+            (np.ones(num_games, dtype=np.float32), (assignments, np.arange(num_games))),
+            shape=(num_lists, num_games),
+        )
+        sums = np.asarray(membership @ embeddings)
+
+        # Listas vazias recebem um jogo qualquer como novo centróide
+        empty = np.bincount(assignments, minlength=num_lists) == 0
+        if empty.any():
+            sums[empty] = embeddings[rng.choice(num_games, int(empty.sum()), replace=False)]
+        centroids = normalize(sums, norm='l2').astype(np.float32)
+
+    return centroids, assign_lists(embeddings, centroids)
+
+
+def build_index(tfidf_matrix, num_components=DEFAULT_COMPONENTS, num_lists=None,
+                iterations=DEFAULT_ITERATIONS, random_state=0):
+    """
+    Monta o índice IVF: cada jogo pertence à lista do centróide mais próximo e
+    as listas são guardadas concatenadas ('list_rows') com os limites em
+    'list_offsets'. Por padrão usa sqrt(jogos) listas.
+    """
+    embeddings, components = build_embeddings(tfidf_matrix, num_components, random_state)
+    if not num_lists:
+        num_lists = int(round(np.sqrt(embeddings.shape[0])))
+    centroids, assignments = spherical_kmeans(embeddings, num_lists, iterations, random_state)
+
+    list_rows = np.argsort(assignments, kind='stable')
+    list_sizes = np.bincount(assignments, minlength=centroids.shape[0])
+    list_offsets = np.concatenate(([0], np.cumsum(list_sizes))).astype(np.int64)
+    return {
+        'components': components,
+        'centroids': centroids,
+        'list_offsets': list_offsets,
+        'list_rows': list_rows.astype(np.int64),
+    }
+
+
+def build_artifact(index_arrays, game_ids, vocabulary_fingerprint):
+    relative_path, checksum = save_arrays(ARTIFACT_KIND, {
+        **index_arrays,
+        'game_ids': np.array([str(game_id) for game_id in game_ids], dtype='U36'),
+    })
+    return {
+        'artifact_path': relative_path,
+        'checksum': checksum,
+        'vocabulary_fingerprint': vocabulary_fingerprint,
+        'num_components': index_arrays['components'].shape[0],
+        'num_lists': index_arrays['centroids'].shape[0],
+    }
+
+
+def delete_artifact_files(ann_index):
+    delete_artifact(ann_index.artifact_path)
+
+
+class LoadedANNIndex:
+
+    def __init__(self, version, arrays, vocabulary_fingerprint):
+        self.version = version
+        self.components = arrays['components']
+        self.centroids = arrays['centroids']
+        self.list_offsets = arrays['list_offsets']
+        self.list_rows = arrays['list_rows']
+        self.game_ids = arrays['game_ids']
+        self.vocabulary_fingerprint = vocabulary_fingerprint
+        # (versão do TF-IDF, linha TF-IDF de cada jogo do índice, linhas fora do índice)
+        self._tfidf_rows = None
+
+    def project(self, user_profile):
+        # Projeta o perfil (vetor no espaço do vocabulário) nos componentes do
+        # SVD usando somente os termos presentes no perfil
+        profile = np.asarray(user_profile, dtype=np.float32).ravel()
+        terms = np.flatnonzero(profile)
+        query = self.components[:, terms] @ profile[terms]
+        norm = np.linalg.norm(query)
+        return query / norm if norm else query
+
+    def tfidf_rows(self, tfidf_model):
+        """
+        Linha da matriz TF-IDF de cada jogo do índice (-1 se o jogo foi removido)
+        e as linhas TF-IDF que não estão no índice (jogos adicionados por
+        atualizações incrementais depois da construção).
+        """
+        if self._tfidf_rows is None or self._tfidf_rows[0] != tfidf_model.version:
+            # Busca binária vetorizada nos ids ordenados do modelo, sem percorrer
+            # os jogos em Python a cada revisão do TF-IDF
+            order, sorted_ids = tfidf_model.sorted_game_ids()
+            rows = np.full(len(self.game_ids), -1, dtype=np.int64)
+            if len(sorted_ids):
+                positions = np.minimum(np.searchsorted(sorted_ids, self.game_ids), len(sorted_ids) - 1)
+                found = sorted_ids[positions] == self.game_ids
+                rows[found] = order[positions[found]]
+            covered = np.zeros(tfidf_model.tfidf_matrix.shape[0], dtype=bool)
+            covered[rows[rows >= 0]] = True
+            self._tfidf_rows = (tfidf_model.version, rows, np.flatnonzero(~covered))
+        return self._tfidf_rows[1], self._tfidf_rows[2]
+
+    def candidate_rows(self, tfidf_model, query, nprobe, min_candidates=0):
+        """
+        Linhas da matriz TF-IDF das 'nprobe' listas mais próximas da consulta.
+        Mais listas são visitadas até somar 'min_candidates' jogos.
+        """
+        centroid_scores = self.centroids @ query
+        list_order = np.argsort(-centroid_scores, kind='stable')
+        list_sizes = np.diff(self.list_offsets)[list_order]
+        enough = int(np.searchsorted(np.cumsum(list_sizes), min_candidates)) + 1
+        probed = list_order[:max(nprobe, enough)]
+
+        index_rows, unindexed_rows = self.tfidf_rows(tfidf_model)
+        rows = index_rows[np.concatenate([
+            self.list_rows[self.list_offsets[i]:self.list_offsets[i + 1]] for i in probed
+        ])]
+        # Ordenadas, assim empates são desfeitos pela linha como na busca exata
+        return np.union1d(rows[rows >= 0], unindexed_rows)
+
+    def search(self, tfidf_model, user_profile, k, exclude=(), nprobe=DEFAULT_NPROBE):
+        """
+        Retorna as linhas TF-IDF dos 'k' jogos mais similares ao perfil entre
+        os candidatos das listas visitadas. Os candidatos são reordenados pela
+        similaridade exata, então os scores são os mesmos da busca completa.
+        """
+        query = self.project(user_profile)
+        candidates = self.candidate_rows(tfidf_model, query, nprobe, min_candidates=k + len(exclude))
+        scores = tfidf_model.similarities(user_profile, rows=candidates)
+        best = top_k(scores, k, exclude=np.isin(candidates, exclude))
+        return candidates[best]
+
+
+class ANNIndexRegistry(ArtifactRegistry):
+
+    model = GameANNIndex
+
+    def load(self, row, version):
+        arrays = load_arrays(row.artifact_path, ARTIFACT_ARRAYS, checksum=row.checksum)
+        return LoadedANNIndex(version, arrays, row.vocabulary_fingerprint)
+
+
+ann_index_registry = ANNIndexRegistry()
+
+
+def get_ann_index():
+    return ann_index_registry.get()
+
+
+def search_similar(tfidf_model, user_profile, k, exclude=(), nprobe=None):
+    """
+    Busca aproximada usada pelas recomendações por conteúdo. Retorna None
+    quando a busca exata deve ser usada: índice desativado, catálogo pequeno,
+    índice inexistente ou construído com outro vocabulário, ou candidatos
+    insuficientes para 'k' resultados.
+    """
+    if not getattr(settings, 'ANN_INDEX_ENABLED', False):
+        return None
+    if tfidf_model.tfidf_matrix.shape[0] < getattr(settings, 'ANN_MIN_CATALOG_SIZE', 0):
+        return None
+
+    index = get_ann_index()
+    if index is None or index.vocabulary_fingerprint != tfidf_model.vocabulary_fingerprint:
+        return None
+
+    if nprobe is None:
+        nprobe = getattr(settings, 'ANN_NPROBE', DEFAULT_NPROBE)
+    rows = index.search(tfidf_model, user_profile, k, exclude=exclude, nprobe=nprobe)
+    if len(rows) < k:
+        return None
+    return rows
+
+
+def recall_report(tfidf_model, index, nprobe_values, k=10, num_queries=200, random_state=0):
+    """
+    Compara a busca aproximada com a exata usando jogos aleatórios do catálogo
+    como consulta (o próprio jogo é excluído). Retorna uma linha por 'nprobe'
+    com recall@k médio e a latência média de cada busca em milissegundos.
+    """
+    rng = np.random.default_rng(random_state)
+    num_games = tfidf_model.tfidf_matrix.shape[0]
+    query_rows = rng.choice(num_games, min(num_queries, num_games), replace=False)
+    profiles = [tfidf_model.tfidf_matrix[row].toarray() for row in query_rows]
+
+    exact_results = []
+    started = time.perf_counter()
+    for row, profile in zip(query_rows, profiles):
+        scores = tfidf_model.similarities(profile)
+        exact_results.append(top_k(scores, k, exclude=[row]))
+    exact_ms = (time.perf_counter() - started) * 1000 / len(query_rows)
+
+    report = []
+    for nprobe in nprobe_values:
+        recalls = []
+        started = time.perf_counter()
+        for row, profile, exact in zip(query_rows, profiles, exact_results):
+            approximate = index.search(tfidf_model, profile, k, exclude=[row], nprobe=nprobe)
+            recalls.append(len(np.intersect1d(exact, approximate)) / len(exact) if len(exact) else 1.0)
+        report.append({
+            'nprobe': nprobe,
+            'recall': float(np.mean(recalls)),
+            'ann_ms': (time.perf_counter() - started) * 1000 / len(query_rows),
+            'exact_ms': exact_ms,
+        })
+    return report
@@ -0,0 +1,106 @@
+import threading
+import time
+
+from django.conf import settings
+
+
+class ArtifactRegistry:
+    """
+    Mantém um artefato pré-computado carregado por processo (worker), evitando
+    buscar e desserializar os dados na base de dados a cada requisição.
+
+    A cada acesso é feita somente uma consulta leve pela versão mais recente
+    (id e created_at) e o artefato só é recarregado quando uma linha mais nova
+    aparece. Subclasses definem 'model' e 'load'.
+    """
+
+    model = None
+    # Campos da linha que identificam a versão carregada
+    version_fields = ('id', 'created_at')
+
+    def __init__(self, check_interval=None):
+        self._lock = threading.Lock()
+        self._model = None
+        self._last_check = None
+        self._check_interval = check_interval
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+
+    @property
+    def check_interval(self):
+        if self._check_interval is not None:
+            return self._check_interval
+        return getattr(settings, 'ARTIFACTS_VERSION_CHECK_INTERVAL', 0)
+
+    def get(self):
+        with self._lock:
+            now = time.monotonic()
+
+            # Dentro do intervalo de verificação usa o artefato em memória sem consultar a base
+            if (
+                self._model is not None
+                and self._last_check is not None
+                and now - self._last_check < self.check_interval
+            ):
+                self.hits += 1
+                return self._model
+
+            version = self._latest_version()
+            self._last_check = now
+
+            # Não há artefato pré-computado
+            if version is None:
+                self._model = None
+                self.misses += 1
+                return None
+
+            if self._model is not None and self._model.version == version:
+                self.hits += 1
+                return self._model
+
+            if self._model is None:
+                self.misses += 1
+            else:
+                self.reloads += 1
+
+            try:
+                self._model = self.load(self.model.objects.get(pk=version[0]), version)
+            except (self.model.DoesNotExist, FileNotFoundError):
+                # A versão foi substituída (e seus arquivos removidos) entre a
+                # verificação e a leitura, mantém o artefato atual e verifica
+                # novamente no próximo acesso
+                self._last_check = None
+            return self._model
+
+    def load(self, row, version):
+        raise NotImplementedError
+
+    def invalidate(self):
+        # Força a verificação de versão no próximo acesso
+        with self._lock:
+            self._last_check = None
+
+    def clear(self):
+        with self._lock:
+            self._model = None
+            self._last_check = None
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses + self.reloads
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'reloads': self.reloads,
+                'hit_ratio': self.hits / total if total else 0.0,
+                'version': self._model.version if self._model is not None else None,
+            }
+
+    def _latest_version(self):
+        return (
+            self.model.objects
+            .order_by('-created_at', '-id')
+            .values_list(*self.version_fields)
+            .first()
+        )
@@ -0,0 +1,81 @@
+import hashlib
+import os
+import shutil
+import uuid
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+
+class ArtifactChecksumError(Exception):
+    pass
+
+
+def artifact_root(kind):
+    """
+    Diretório base onde os artefatos de um tipo ('tfidf', ...) são gravados.
+    """
+    return Path(settings.ARTIFACTS_ROOT) / kind
+
+
+def save_arrays(kind, arrays):
+    """
+    Grava cada array como um arquivo .npy em um diretório versionado novo e
+    retorna (caminho relativo, checksum).
+
+    Os arquivos são escritos em um diretório temporário e renomeados ao final,
+    assim leitores nunca enxergam um artefato pela metade.
+    """
+    root = artifact_root(kind)
+    root.mkdir(parents=True, exist_ok=True)
+
+    version_name = f"v{timezone.now():%Y%m%d%H%M%S}-{uuid.uuid4().hex[:8]}"
+    tmp_dir = root / f".tmp-{version_name}"
+    tmp_dir.mkdir()
+    try:
+        for name, array in arrays.items():
+            # allow_pickle=False garante que nenhum objeto Python seja serializado
+            np.save(tmp_dir / f"{name}.npy", np.asarray(array), allow_pickle=False)
+        checksum = directory_checksum(tmp_dir, arrays.keys())
+        os.rename(tmp_dir, root / version_name)
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    return f"{kind}/{version_name}", checksum
+
+
+def load_arrays(relative_path, names, checksum=None):
+    """
+    Abre os arrays de um artefato com mmap (somente leitura), permitindo que
+    vários processos compartilhem as mesmas páginas em memória.
+    """
+    directory = Path(settings.ARTIFACTS_ROOT) / relative_path
+    if checksum and getattr(settings, 'ARTIFACTS_VERIFY_CHECKSUM', True):
+        actual = directory_checksum(directory, names)
+        if actual != checksum:
+            raise ArtifactChecksumError(
+                f"Checksum inválido para {relative_path}: esperado {checksum}, encontrado {actual}"
+            )
+
+    return {
+        name: np.load(directory / f"{name}.npy", mmap_mode='r', allow_pickle=False)
+        for name in names
+    }
+
+
+def delete_artifact(relative_path):
+    if not relative_path:
+        return
+    shutil.rmtree(Path(settings.ARTIFACTS_ROOT) / relative_path, ignore_errors=True)
+
+
+def directory_checksum(directory, names):
+    digest = hashlib.sha256()
+    for name in names:
+        with open(Path(directory) / f"{name}.npy", 'rb') as file:
+            for chunk in iter(lambda: file.read(1024 * 1024), b''):
+                digest.update(chunk)
+    return digest.hexdigest()
@@ -0,0 +1,73 @@
+from collections import defaultdict
+
+from .models import Game
+
+# Quantidade de jogos lidos da base de dados por vez
+DEFAULT_CHUNK_SIZE = 2000
+
+
+def iter_game_documents(chunk_size=DEFAULT_CHUNK_SIZE, pk_gte=None, pk_lt=None):
+    """
+    Percorre os jogos em blocos ordenados por pk usando paginação por chave
+    (sem OFFSET) e somente os campos necessários, sem instanciar os models.
+    Cada bloco é uma lista de documentos, ver 'game_documents'. Usado pela
+    matriz TF-IDF e pelo índice de busca.
+    """
+    queryset = Game.objects.order_by('pk')
+    if pk_gte is not None:
+        queryset = queryset.filter(pk__gte=pk_gte)
+    if pk_lt is not None:
+        queryset = queryset.filter(pk__lt=pk_lt)
+
+    last_pk = None
+    while True:
+        page = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        rows = list(page.values('id', 'title', 'description')[:chunk_size])
+        if not rows:
+            return
+        yield game_documents(rows)
+        last_pk = rows[-1]['id']
+
+
+def load_game_documents(game_ids):
+    """
+    Documentos dos jogos informados que ainda existem.
+    """
+    rows = list(Game.objects.filter(pk__in=list(game_ids)).values('id', 'title', 'description'))
+    return game_documents(rows)
+
+
+def game_documents(rows):
+    """
+    Documentos das linhas ('id', 'title', 'description') de jogos: dicionários
+    com id, título, descrição e os nomes dos gêneros e tags separados por
+    espaço. Os nomes são coletados com uma consulta para gêneros e outra para
+    tags.
+    """
+    game_ids = [row['id'] for row in rows]
+    genre_names = defaultdict(list)
+    for game_id, name in Game.genres.through.objects.filter(
+        game_id__in=game_ids
+    ).order_by('pk').values_list('game_id', 'genre__name'):
+        genre_names[game_id].append(name)
+    tag_names = defaultdict(list)
+    for game_id, name in Game.tags.through.objects.filter(
+        game_id__in=game_ids
+    ).order_by('pk').values_list('game_id', 'tag__name'):
+        tag_names[game_id].append(name)
+
+    return [
+        {
+            'id': str(row['id']),
+            'title': row['title'],
+            'description': row['description'],
+            'genres': ' '.join(genre_names[row['id']]),
+            'tags': ' '.join(tag_names[row['id']]),
+        }
+        for row in rows
+    ]
+
+
+def document_text(document):
+    # Junta título, descrição, gêneros e tags do jogo em um único texto
+    return f"{document['title']} {document['description']} {document['genres']} {document['tags']}"
@@ -0,0 +1,180 @@
+import numpy as np
+from scipy import sparse
+
+from app_biblioteca.models import FavoriteGamesByUser
+
+from .artifact_registry import ArtifactRegistry
+from .artifact_storage import delete_artifact, load_arrays, save_arrays
+from .models import GameItemSimilarity, Rating
+from .ranking import top_k
+
+
+ARTIFACT_KIND = 'item_similarity'
+ARTIFACT_ARRAYS = ('data', 'indices', 'indptr', 'shape', 'game_ids')
+
+# Mesma nota mínima usada pela recomendação por conteúdo das notas do usuário
+HIGH_RATING_THRESHOLD = 4.5
+
+
+def build_interactions(game_index_map, min_rating=HIGH_RATING_THRESHOLD):
+    """
+    Matriz binária usuários x jogos com os favoritos e as notas altas de cada usuário.
+    """
+    FavoriteGames = FavoriteGamesByUser.games.through
+    pairs = list(
+        FavoriteGames.objects.values_list('favoritegamesbyuser__user_id', 'game_id')
+    )
+    pairs += list(
+        Rating.objects.filter(rating__gte=min_rating).values_list('user_id', 'game_id')
+    )
+
+    user_row = {}
+    rows, cols = [], []
+    for user_id, game_id in pairs:
+        game_index = game_index_map.get(str(game_id))
+        if game_index is None:
+            continue
+        rows.append(user_row.setdefault(user_id, len(user_row)))
+        cols.append(game_index)
+
+    interactions = sparse.csr_matrix(
+        (np.ones(len(rows)), (rows, cols)),
+        shape=(len(user_row), len(game_index_map)),
+    )
+    # Favorito + nota alta no mesmo jogo conta somente uma vez
+    interactions.data[:] = 1.0
+    return interactions
+
+
+def build_similarity_matrix(interactions, top_n=50, block_size=1024):
+    """
+    Similaridade de cosseno item-item a partir da co-ocorrência, mantendo
+    somente os 'top_n' vizinhos de cada jogo. Os jogos são processados em
+    blocos para limitar a memória do produto esparso.
+    """
+    num_games = interactions.shape[1]
+    item_users = sparse.csr_matrix(interactions.T)
+    # Quantidade de usuários que interagiram com cada jogo
+    item_counts = np.asarray(interactions.sum(axis=0)).ravel()
+    item_norms = np.sqrt(item_counts)
+    item_norms[item_norms == 0] = 1.0
+
+    data, indices, indptr = [], [], [0]
+    for start in range(0, num_games, block_size):
+        stop = min(start + block_size, num_games)
+
+        # Co-ocorrência do bloco de jogos com todos os jogos
+        cooccurrence = (item_users[start:stop] @ interactions).tocsr()
+
+        for local_row in range(stop - start):
+            row = start + local_row
+            row_slice = slice(cooccurrence.indptr[local_row], cooccurrence.indptr[local_row + 1])
+            neighbours = cooccurrence.indices[row_slice]
+            scores = cooccurrence.data[row_slice] / (item_norms[row] * item_norms[neighbours])
+
+            # O próprio jogo não é vizinho dele mesmo
+            keep = top_k(scores, top_n, exclude=neighbours == row)
+            # Mantém as colunas ordenadas como esperado em uma matriz CSR
+            keep = np.sort(keep)
+
+            indices.append(neighbours[keep])
+            data.append(scores[keep])
+            indptr.append(indptr[-1] + len(keep))
+
+    return sparse.csr_matrix(
+        (
+            np.concatenate(data) if data else np.empty(0),
+            np.concatenate(indices) if indices else np.empty(0, dtype=np.int32),
+            np.array(indptr),
+        ),
+        shape=(num_games, num_games),
+    )
+
+
+def build_artifact(similarity_matrix, game_ids, top_n):
+    relative_path, checksum = save_arrays(ARTIFACT_KIND, {
+        'data': similarity_matrix.data,
+        'indices': similarity_matrix.indices,
+        'indptr': similarity_matrix.indptr,
+        'shape': np.array(similarity_matrix.shape, dtype=np.int64),
+        'game_ids': np.array([str(game_id) for game_id in game_ids], dtype='U36'),
+    })
+    return {
+        'artifact_path': relative_path,
+        'checksum': checksum,
+        'top_n': top_n,
+    }
+
+
+def delete_artifact_files(item_similarity):
+    delete_artifact(item_similarity.artifact_path)
+
+
+class LoadedItemSimilarity:
+
+    def __init__(self, version, similarity_matrix, game_ids):
+        self.version = version
+        self.similarity_matrix = similarity_matrix
+        self.game_ids = game_ids
+        self.game_index_map = {game_id: i for i, game_id in enumerate(game_ids)}
+
+    def score(self, game_indices):
+        """
+        Soma as linhas de vizinhos dos jogos informados. Retorna (índices, scores)
+        somente dos jogos que aparecem como vizinho de algum deles.
+        """
+        selector = sparse.csr_matrix(
+            (np.ones(len(game_indices)), (np.zeros(len(game_indices), dtype=np.intp), game_indices)),
+            shape=(1, self.similarity_matrix.shape[0]),
+        )
+        summed = (selector @ self.similarity_matrix).tocsr()
+        return summed.indices, summed.data
+
+
+class ItemSimilarityRegistry(ArtifactRegistry):
+
+    model = GameItemSimilarity
+
+    def load(self, row, version):
+        arrays = load_arrays(row.artifact_path, ARTIFACT_ARRAYS, checksum=row.checksum)
+        similarity_matrix = sparse.csr_matrix(
+            (arrays['data'], arrays['indices'], arrays['indptr']),
+            shape=tuple(arrays['shape']),
+            copy=False,
+        )
+        return LoadedItemSimilarity(version, similarity_matrix, arrays['game_ids'])
+
+
+item_similarity_registry = ItemSimilarityRegistry()
+
+
+def get_item_similarity_model():
+    return item_similarity_registry.get()
+
+
+def get_item_based_scores(favorite_game_ids, num_recommendations=5):
+    """
+    Recomendação item-item: soma a similaridade dos vizinhos de cada jogo
+    favorito. Retorna [(game_id, score), ...] do maior para o menor score,
+    sem os próprios favoritos.
+    """
+    model = get_item_similarity_model()
+    if model is None:
+        return []
+
+    favorite_indices = [
+        model.game_index_map[str(game_id)]
+        for game_id in favorite_game_ids
+        if str(game_id) in model.game_index_map
+    ]
+    if not favorite_indices:
+        return []
+
+    candidate_indices, candidate_scores = model.score(favorite_indices)
+    excluded = np.isin(candidate_indices, favorite_indices)
+    best = top_k(candidate_scores, num_recommendations, exclude=excluded)
+
+    return [
+        (str(model.game_ids[candidate_indices[i]]), float(candidate_scores[i]))
+        for i in best
+    ]
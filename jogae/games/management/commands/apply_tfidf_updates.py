@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from games.tfidf_pipeline import apply_pending_updates
+
+class Command(BaseCommand):
+    help = 'Aplica na matriz TF-IDF os jogos criados, editados ou removidos desde a última atualização.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=None,
+            help='Quantidade máxima de alterações aplicadas em cada lote.',
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Continua executando e verifica a fila a cada --interval segundos.',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=30.0,
+            help='Segundos entre as verificações da fila com --loop.',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            self.apply_batches(options['limit'])
+            if not options['loop']:
+                return
+            # Não segura a conexão enquanto espera o próximo lote
+            connection.close()
+            time.sleep(options['interval'])
+
+    def apply_batches(self, limit):
+        while True:
+            started = time.perf_counter()
+            updated, applied = apply_pending_updates(limit=limit)
+            if updated is None:
+                return
+            self.stdout.write(self.style.SUCCESS(
+                f'{applied} jogo(s) atualizado(s) na matriz TF-IDF (revisão {updated.revision}) '
+                f'em {time.perf_counter() - started:.2f}s.'
+            ))
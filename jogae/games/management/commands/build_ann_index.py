@@ -0,0 +1,81 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from games.models import GameANNIndex
+from games.ann_index import (
+    DEFAULT_COMPONENTS,
+    DEFAULT_ITERATIONS,
+    LoadedANNIndex,
+    build_artifact,
+    build_index,
+    delete_artifact_files,
+    get_ann_index,
+    recall_report,
+)
+from games.tfidf_registry import get_tfidf_model
+
+class Command(BaseCommand):
+    help = 'Constrói o índice aproximado (SVD truncado + listas invertidas) sobre a matriz TF-IDF.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--components', type=int, default=DEFAULT_COMPONENTS, help='Dimensão dos embeddings gerados pelo SVD.')
+        parser.add_argument('--lists', type=int, default=0, help='Quantidade de listas invertidas (padrão: raiz quadrada da quantidade de jogos).')
+        parser.add_argument('--iterations', type=int, default=DEFAULT_ITERATIONS, help='Iterações máximas do k-means.')
+        parser.add_argument('--report', action='store_true', help='Ao final, compara o índice com a busca exata (recall@k).')
+        parser.add_argument('--report-only', action='store_true', help='Somente compara o índice atual com a busca exata, sem reconstruir.')
+        parser.add_argument('--k', type=int, default=10, help='Quantidade de resultados considerados no recall@k.')
+        parser.add_argument('--queries', type=int, default=200, help='Quantidade de jogos aleatórios usados como consulta no relatório.')
+        parser.add_argument('--nprobe', default='1,2,4,8,16', help='Valores de nprobe avaliados no relatório, separados por vírgula.')
+
+    def handle(self, *args, **options):
+        tfidf_model = get_tfidf_model()
+        if tfidf_model is None:
+            raise CommandError("Matriz TF-IDF não encontrada, execute 'python manage.py precompute_tfidf'.")
+        if tfidf_model.vocabulary is None:
+            raise CommandError("A matriz TF-IDF atual não possui vocabulário, execute 'python manage.py precompute_tfidf'.")
+
+        if options['report_only']:
+            index = get_ann_index()
+            if index is None:
+                raise CommandError("Índice não encontrado, execute 'python manage.py build_ann_index'.")
+            if index.vocabulary_fingerprint != tfidf_model.vocabulary_fingerprint:
+                self.stdout.write(self.style.WARNING('O índice foi construído com outro vocabulário e não está sendo usado.'))
+            self.write_report(tfidf_model, index, options)
+            return
+
+        self.stdout.write(self.style.NOTICE('Iniciando a construção do índice aproximado...'))
+        started = time.perf_counter()
+        index_arrays = build_index(
+            tfidf_model.tfidf_matrix,
+            num_components=options['components'],
+            num_lists=options['lists'],
+            iterations=options['iterations'],
+        )
+        self.stdout.write(
+            f"Índice com {index_arrays['components'].shape[0]} componentes e "
+            f"{index_arrays['centroids'].shape[0]} listas em {time.perf_counter() - started:.2f}s."
+        )
+
+        self.stdout.write('Gravando o artefato no disco...')
+        artifact = build_artifact(index_arrays, tfidf_model.game_ids, tfidf_model.vocabulary_fingerprint)
+
+        # Salva a versão nova e só depois limpa as antigas
+        new_index = GameANNIndex.objects.create(**artifact)
+        for old_index in GameANNIndex.objects.exclude(pk=new_index.pk):
+            delete_artifact_files(old_index)
+            old_index.delete()
+
+        if options['report']:
+            index = LoadedANNIndex(None, {**index_arrays, 'game_ids': tfidf_model.game_ids}, artifact['vocabulary_fingerprint'])
+            self.write_report(tfidf_model, index, options)
+
+        self.stdout.write(self.style.SUCCESS('Sucesso na construção do índice aproximado!'))
+
+    def write_report(self, tfidf_model, index, options):
+        nprobe_values = [int(value) for value in options['nprobe'].split(',') if value.strip()]
+        self.stdout.write(f"Comparando com a busca exata ({options['queries']} consultas, k={options['k']})...")
+        for row in recall_report(tfidf_model, index, nprobe_values, k=options['k'], num_queries=options['queries']):
+            self.stdout.write(
+                f"  nprobe={row['nprobe']:<4} recall@{options['k']}={row['recall']:.3f} | "
+                f"aproximada: {row['ann_ms']:.2f} ms | exata: {row['exact_ms']:.2f} ms"
+            )
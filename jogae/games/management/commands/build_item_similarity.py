@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from games.models import Game, GameItemSimilarity
+from games.item_similarity import (
+    HIGH_RATING_THRESHOLD,
+    build_artifact,
+    build_interactions,
+    build_similarity_matrix,
+    delete_artifact_files,
+)
+
+class Command(BaseCommand):
+    help = 'Pré-Computa a matriz de similaridade item-item para a recomendação colaborativa.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-n', type=int, default=50, help='Quantidade de vizinhos mantidos por jogo.')
+        parser.add_argument('--min-rating', type=float, default=HIGH_RATING_THRESHOLD, help='Nota mínima para contar como interação.')
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.NOTICE('Iniciando a pré-computação da similaridade item-item...'))
+
+        game_ids = [str(game_id) for game_id in Game.objects.order_by('pk').values_list('pk', flat=True)]
+        if not game_ids:
+            self.stdout.write(self.style.WARNING('Não foi encontrado jogos na base de dados. Encerrando...'))
+            return
+        game_index_map = {game_id: i for i, game_id in enumerate(game_ids)}
+
+        # Matriz usuários x jogos com favoritos e notas altas
+        self.stdout.write('Coletando favoritos e notas altas...')
+        interactions = build_interactions(game_index_map, min_rating=options['min_rating'])
+        self.stdout.write(f'Localizado {interactions.shape[0]} usuários e {interactions.nnz} interações.')
+
+        # Co-ocorrência jogos x jogos podada para os N vizinhos mais similares
+        self.stdout.write('Calculando a matriz de co-ocorrência...')
+        similarity_matrix = build_similarity_matrix(interactions, top_n=options['top_n'])
+
+        self.stdout.write('Gravando o artefato no disco...')
+        artifact = build_artifact(similarity_matrix, game_ids, options['top_n'])
+
+        # Salva a versão nova e só depois limpa as antigas
+        new_similarity = GameItemSimilarity.objects.create(**artifact)
+        for old_similarity in GameItemSimilarity.objects.exclude(pk=new_similarity.pk):
+            delete_artifact_files(old_similarity)
+            old_similarity.delete()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Sucesso na pré-computação da similaridade item-item ({similarity_matrix.nnz} pares armazenados)!'
+        ))
@@ -0,0 +1,46 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from app_biblioteca.models import FavoriteGamesByUser
+from games.recommendation_utils import recommend_for_users
+from games.tfidf_registry import get_tfidf_model
+
+class Command(BaseCommand):
+    help = 'Exporta as recomendações por conteúdo de todos os usuários com jogos favoritos (uma linha JSON por usuário), por exemplo para o digest por e-mail.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--k', type=int, default=10, help='Quantidade de jogos recomendados por usuário.')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Quantidade de usuários lidos da base de dados e processados por vez.',
+        )
+
+    def handle(self, *args, **options):
+        if get_tfidf_model() is None:
+            raise CommandError("Matriz TF-IDF não encontrada, execute 'python manage.py precompute_tfidf'.")
+
+        user_ids = (
+            FavoriteGamesByUser.objects.filter(games__isnull=False)
+            .order_by('user_id').values_list('user_id', flat=True).distinct()
+        )
+        batch = []
+        exported = 0
+        for user_id in user_ids.iterator(chunk_size=options['batch_size']):
+            batch.append(user_id)
+            if len(batch) == options['batch_size']:
+                exported += self.export(batch, options['k'])
+                batch = []
+        if batch:
+            exported += self.export(batch, options['k'])
+        self.stderr.write(self.style.SUCCESS(f'Recomendações de {exported} usuário(s) exportadas.'))
+
+    def export(self, user_ids, k):
+        # Perfis e scores do lote calculados de uma vez, ver recommend_for_users
+        for user_id, games in recommend_for_users(user_ids, k=k).items():
+            self.stdout.write(json.dumps({
+                'user_id': user_id,
+                'games': [{'id': game_id, 'score': round(score, 6)} for game_id, score in games],
+            }))
+        return len(user_ids)
@@ -1,56 +1,182 @@
-import pickle
-from django.core.management.base import BaseCommand
-from sklearn.feature_extraction.text import TfidfVectorizer
-from games.models import Game, GameTFIDF
+import resource
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from games.models import GameTFIDF
+from games.tfidf_artifact import build_artifact, delete_artifact_files
+from games.similar_games import DEFAULT_BLOCK_SIZE, rebuild_similar_games
+from games.tfidf_pipeline import (
+    DEFAULT_CHUNK_SIZE,
+    apply_pending_updates,
+    build_tfidf,
+    change_retention,
+    drift_ratio,
+    last_change_id,
+    prune_changes,
+)
 
 class Command(BaseCommand):
     help = 'Pré-Computa a matriz TF-IDF para recomendação de conteúdo.'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--if-needed',
+            action='store_true',
+            help='Somente reajusta o modelo se não houver matriz ou se as atualizações incrementais marcaram o vocabulário como defasado.',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help='Quantidade de jogos lidos da base de dados por vez.',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Quantidade de processos, cada um processa uma faixa de pk do catálogo.',
+        )
+        parser.add_argument(
+            '--similar-block-size',
+            type=int,
+            default=DEFAULT_BLOCK_SIZE,
+            help='Quantidade de jogos multiplicados por vez no cálculo dos jogos similares.',
+        )
+        parser.add_argument(
+            '--skip-similar',
+            action='store_true',
+            help='Não recalcula as listas de jogos similares.',
+        )
+        parser.add_argument(
+            '--compare-serial',
+            action='store_true',
+            help='Com --workers, executa também a versão serial para verificar se o resultado é idêntico e reportar o ganho de tempo.',
+        )
+
     def handle(self, *args, **options):
+        if options['if_needed']:
+            current = GameTFIDF.objects.order_by('-created_at', '-id').first()
+            if current is not None and not current.needs_refit:
+                # Alterações já aplicadas no artefato atual saem da fila
+                prune_changes(current.last_change_id)
+                self.stdout.write(self.style.NOTICE(
+                    f'Matriz TF-IDF atual ainda é válida ({drift_ratio(current):.1%} dos tokens novos fora do vocabulário). Encerrando...'
+                ))
+                return
+
         self.stdout.write(self.style.NOTICE('Iniciando a pré-computação de TF-IDF...'))
+        started = time.perf_counter()
+        # Alterações enfileiradas até aqui estão no catálogo lido pelo ajuste;
+        # as posteriores são reaplicadas sobre o artefato novo ao final
+        snapshot_change_id = last_change_id()
 
-        # Use prefetch_related para carregar os gêneros e tags de forma eficiente
-        all_games = list(Game.objects.all().prefetch_related('genres', 'tags'))
-        if not all_games:
+        # Os jogos são lidos em blocos duas vezes: a primeira passagem conta a
+        # frequência dos termos (vocabulário e IDF) e a segunda monta a matriz
+        workers = max(1, options['workers'])
+        self.stdout.write(f'Calculando a matriz TF-IDF ({workers} processo(s))...')
+        build_started = time.perf_counter()
+        result = build_tfidf(
+            chunk_size=options['chunk_size'],
+            progress=self.report_progress,
+            workers=workers,
+        )
+        build_time = time.perf_counter() - build_started
+        if result is None:
             self.stdout.write(self.style.WARNING('Não foi encontrado jogos na base de dados. Encerrando...'))
             return
+        tfidf_matrix, game_ids, vocabulary, idf = result
+        self.stdout.write(f'Matriz com {tfidf_matrix.shape[0]} jogos e {len(vocabulary)} termos em {build_time:.2f}s.')
+
+        if options['compare_serial'] and workers > 1:
+            self.compare_with_serial(result, build_time, options['chunk_size'])
 
-        self.stdout.write(f'Localizado {len(all_games)} jogos. Gerando conteúdo...')
+        # A posição do id na lista representa a linha na matriz TFIDF
+        # o vocabulário e o IDF permitem atualizar jogos sem reajustar o modelo
+        self.stdout.write('Gravando o artefato (matriz normalizada, lista de ids e vocabulário) no disco...')
+        artifact = build_artifact(tfidf_matrix, game_ids, vocabulary, idf)
 
-        # Coleta informações de gênero, tags, descrição e título do jogo e junta tudo, guardando em um vetor
-        game_content = []
-        for game in all_games:
-            genres = ' '.join([genre.name for genre in game.genres.all()])
-            tags = ' '.join([tag.name for tag in game.tags.all()])
-            content = f"{game.title} {game.description} {genres} {tags}"
-            game_content.append(content)
+        # Salva a pré computação nova e só depois limpa os dados antigos,
+        # assim os workers sempre encontram uma versão disponível
+        self.stdout.write('Registrando a nova matriz TF-IDF na base de dados...')
+        new_tfidf = GameTFIDF.objects.create(**artifact, last_change_id=snapshot_change_id)
+        for old_tfidf in GameTFIDF.objects.exclude(pk=new_tfidf.pk):
+            delete_artifact_files(old_tfidf)
+            old_tfidf.delete()
+        prune_changes(snapshot_change_id)
 
+        # Vizinhos de cada jogo exibidos na página do jogo, calculados em
+        # blocos de linhas da matriz para limitar a memória
+        if not options['skip_similar']:
+            self.stdout.write('Calculando os jogos similares de cada jogo...')
+            similar_started = time.perf_counter()
+            total = rebuild_similar_games(
+                tfidf_matrix,
+                game_ids,
+                block_size=options['similar_block_size'],
+                progress=self.report_similar_progress,
+            )
+            self.stdout.write(f'{total} vizinhos gravados em {time.perf_counter() - similar_started:.2f}s.')
 
-        # Ignorando palavras 'inúteis' para o processamento de linguagem natural e retirando palavras muito incomuns e as muito comuns
-        self.stdout.write('Calculando a matriz TF-IDF...')
-        tfidf = TfidfVectorizer(
-            stop_words='english',
-            min_df=3, 
-            max_df=0.85, 
+        # Jogos alterados durante o ajuste (inclusive os que uma atualização
+        # incremental gravou no artefato antigo, já substituído)
+        if time.perf_counter() - started > change_retention().total_seconds():
+            self.stdout.write(self.style.WARNING(
+                'O ajuste demorou mais que TFIDF_CHANGE_RETENTION: jogos alterados no início dele '
+                'podem já ter saído da fila, execute o comando novamente.'
+            ))
+        updated, applied = apply_pending_updates()
+        if updated is not None:
+            self.stdout.write(f'{applied} jogo(s) alterado(s) durante o ajuste reaplicado(s) na matriz.')
+
+        self.stdout.write(
+            f'Tempo total: {time.perf_counter() - started:.1f}s | '
+            f'Pico de memória (RSS): {self.peak_rss_mb():.1f} MB'
         )
-        tfidf_matrix = tfidf.fit_transform(game_content)
+        self.stdout.write(self.style.SUCCESS('Sucesso na operação de pré-computação e armazenamento da matriz TF-IDF!'))
 
-        # Usando a representação do UUID em string para ser compatível com JSON
-        # game.id - > chave do dicionario, representando o jogo
-        # i -> valor do dicionário, representando a linha na matriz TFIDF
-        self.stdout.write('Criando o mapa de índices de jogos...')
-        game_index_map = {str(game.id): i for i, game in enumerate(all_games)}
+    def compare_with_serial(self, parallel_result, parallel_time, chunk_size):
+        self.stdout.write('Executando a versão serial para comparação...')
+        serial_started = time.perf_counter()
+        serial_result = build_tfidf(chunk_size=chunk_size)
+        serial_time = time.perf_counter() - serial_started
 
-        # Serializa a matriz usando pickle para ser possível armazenar na base de dados
-        pickled_matrix = pickle.dumps(tfidf_matrix)
+        if self.same_result(serial_result, parallel_result):
+            self.stdout.write(self.style.SUCCESS('Resultado paralelo idêntico ao serial (byte a byte).'))
+        else:
+            raise CommandError('O resultado paralelo difere do serial, artefato não será salvo.')
+        self.stdout.write(
+            f'Serial: {serial_time:.2f}s | Paralelo: {parallel_time:.2f}s | '
+            f'Ganho: {serial_time / parallel_time:.2f}x'
+        )
 
-        # Limpa os dados antigos e salva a pré computação nova
-        self.stdout.write('Salvando a nova matriz TF-IDF na base de dados...')
-        GameTFIDF.objects.all().delete()
-        GameTFIDF.objects.create(
-            tfidf_matrix=pickled_matrix,
-            game_index_map=game_index_map,
+    @staticmethod
+    def same_result(first, second):
+        first_matrix, first_ids, first_vocabulary, first_idf = first
+        second_matrix, second_ids, second_vocabulary, second_idf = second
+        arrays = [
+            (first_matrix.data, second_matrix.data),
+            (first_matrix.indices, second_matrix.indices),
+            (first_matrix.indptr, second_matrix.indptr),
+            (first_idf, second_idf),
+        ]
+        return (
+            first_matrix.shape == second_matrix.shape
+            and list(first_ids) == list(second_ids)
+            and list(first_vocabulary) == list(second_vocabulary)
+            and all(a.dtype == b.dtype and a.tobytes() == b.tobytes() for a, b in arrays)
         )
 
-        self.stdout.write(self.style.SUCCESS('Sucesso na operação de pré-computação e armazenamento da matriz TF-IDF!'))
-        
\ No newline at end of file
+    def report_progress(self, step, processed):
+        self.stdout.write(f'  Passagem {step}/2: {processed} jogos processados')
+
+    def report_similar_progress(self, processed):
+        self.stdout.write(f'  {processed} jogos processados')
+
+    @staticmethod
+    def peak_rss_mb():
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss é em bytes no macOS e em kilobytes no Linux
+        if sys.platform == 'darwin':
+            return peak / (1024 * 1024)
+        return peak / 1024
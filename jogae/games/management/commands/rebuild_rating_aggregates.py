@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+from games.rating_aggregates import find_mismatches, rebuild_rating_aggregates
+
+class Command(BaseCommand):
+    help = 'Recalcula a soma, a quantidade e as médias das notas armazenadas em cada jogo.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Somente compara os agregados armazenados com as notas, sem alterar a base de dados.',
+        )
+
+    def handle(self, *args, **options):
+        if options['verify']:
+            self.stdout.write(self.style.NOTICE('Verificando os agregados das notas...'))
+            mismatches = list(find_mismatches())
+            for game, expected in mismatches[:20]:
+                self.stdout.write(
+                    f'  {game.title}: armazenado {game.rating_count} notas / média {game.rating_avg:.3f}, '
+                    f"esperado {expected['rating_count']} notas / média {expected['rating_avg']:.3f}"
+                )
+            if mismatches:
+                raise CommandError(
+                    f'{len(mismatches)} jogo(s) com agregados divergentes, execute '
+                    "'python manage.py rebuild_rating_aggregates'."
+                )
+            self.stdout.write(self.style.SUCCESS('Todos os agregados estão corretos!'))
+            return
+
+        self.stdout.write(self.style.NOTICE('Recalculando os agregados das notas...'))
+        fixed = rebuild_rating_aggregates()
+        self.stdout.write(self.style.SUCCESS(f'Sucesso! {fixed} jogo(s) corrigido(s).'))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from games.search.backends import get_backend
+from games.documents import DEFAULT_CHUNK_SIZE
+
+class Command(BaseCommand):
+    help = 'Reconstrói o índice de busca textual dos jogos (título, descrição, gêneros e tags).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='Quantidade de jogos lidos da base de dados por vez.')
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+        self.stdout.write(self.style.NOTICE(f'Reconstruindo o índice de busca ({type(backend).__name__})...'))
+        total = backend.rebuild(
+            chunk_size=options['chunk_size'],
+            progress=lambda processed: self.stdout.write(f'  {processed} jogos indexados'),
+        )
+        self.stdout.write(self.style.SUCCESS(f'Sucesso! {total} jogos no índice de busca.'))
@@ -15,4 +15,12 @@ class Command(BaseCommand):
         call_command('precompute_tfidf')
         self.stdout.write(self.style.SUCCESS('TF-IDF pre-computation complete.'))
 
+        self.stdout.write(self.style.NOTICE('\nStep 3: Pre-computing item-item similarities for collaborative recommendations...'))
+        call_command('build_item_similarity')
+        self.stdout.write(self.style.SUCCESS('Item-item similarity pre-computation complete.'))
+
+        self.stdout.write(self.style.NOTICE('\nStep 4: Building the approximate nearest-neighbour index...'))
+        call_command('build_ann_index')
+        self.stdout.write(self.style.SUCCESS('ANN index build complete.'))
+
         self.stdout.write(self.style.SUCCESS('\n--- Development data setup finished successfully! ---'))
\ No newline at end of file
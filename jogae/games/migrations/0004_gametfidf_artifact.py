@@ -0,0 +1,23 @@
+# Generated by Django 5.2.1 on 2026-10-18 11:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0003_gametfidf_alter_rating_user'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gametfidf',
+            name='format_version',
+            field=models.PositiveSmallIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='gametfidf',
+            name='game_ids',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.1 on 2026-10-18 11:48
+
+import io
+import pickle
+
+from django.db import migrations, models
+
+
+def convert_pickled_matrices(apps, schema_editor):
+    # Converte as linhas no formato 1 (pickle) para o formato 2 (.npz), assim a
+    # aplicação não precisa mais desserializar pickle em tempo de execução
+    from scipy import sparse
+    from sklearn.preprocessing import normalize
+
+    GameTFIDF = apps.get_model('games', 'GameTFIDF')
+    for row in GameTFIDF.objects.filter(format_version=1):
+        matrix = normalize(sparse.csr_matrix(pickle.loads(row.tfidf_matrix)), norm='l2')
+        game_ids = [None] * matrix.shape[0]
+        for game_id, index in row.game_index_map.items():
+            game_ids[index] = game_id
+
+        buffer = io.BytesIO()
+        sparse.save_npz(buffer, matrix, compressed=False)
+        row.tfidf_matrix = buffer.getvalue()
+        row.game_ids = game_ids
+        row.format_version = 2
+        row.save(update_fields=['tfidf_matrix', 'game_ids', 'format_version'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0004_gametfidf_artifact'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gametfidf',
+            name='artifact_path',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='gametfidf',
+            name='checksum',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AlterField(
+            model_name='gametfidf',
+            name='game_index_map',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='gametfidf',
+            name='tfidf_matrix',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.RunPython(convert_pickled_matrices, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.1 on 2026-10-18 11:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0005_gametfidf_disk_artifact'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GameItemSimilarity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('artifact_path', models.CharField(max_length=255)),
+                ('checksum', models.CharField(max_length=64)),
+                ('top_n', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
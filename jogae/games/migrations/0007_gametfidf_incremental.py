@@ -0,0 +1,28 @@
+# Generated by Django 5.2.1 on 2026-10-18 11:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0006_gameitemsimilarity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gametfidf',
+            name='drift_oov_count',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='gametfidf',
+            name='drift_token_count',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='gametfidf',
+            name='needs_refit',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.1 on 2026-10-18 11:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0007_gametfidf_incremental'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GameANNIndex',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('artifact_path', models.CharField(max_length=255)),
+                ('checksum', models.CharField(max_length=64)),
+                ('vocabulary_fingerprint', models.CharField(max_length=64)),
+                ('num_components', models.PositiveIntegerField()),
+                ('num_lists', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.1 on 2026-10-18 12:04
+
+import games.rating_aggregates
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def fill_rating_aggregates(apps, schema_editor):
+    # Calcula os agregados das notas já existentes, a partir daqui eles são
+    # mantidos pelos signals de Rating
+    Game = apps.get_model('games', 'Game')
+    Rating = apps.get_model('games', 'Rating')
+    prior_mean = float(settings.RATING_PRIOR_MEAN)
+    prior_weight = float(settings.RATING_PRIOR_WEIGHT)
+
+    Game.objects.update(rating_score=prior_mean)
+    totals = Rating.objects.values('game_id').annotate(total=Sum('rating'), count=Count('id'))
+    for row in totals.iterator():
+        Game.objects.filter(pk=row['game_id']).update(
+            rating_sum=row['total'],
+            rating_count=row['count'],
+            rating_avg=row['total'] / row['count'],
+            rating_score=(prior_mean * prior_weight + row['total']) / (prior_weight + row['count']),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0008_gameannindex'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='rating_avg',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='rating_score',
+            field=models.FloatField(default=games.rating_aggregates.bayesian_prior_score),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='rating_sum',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='game',
+            index=models.Index(fields=['-rating_avg'], name='game_rating_avg_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='game',
+            index=models.Index(fields=['-rating_score'], name='game_rating_score_idx'),
+        ),
+        migrations.RunPython(fill_rating_aggregates, migrations.RunPython.noop),
+    ]
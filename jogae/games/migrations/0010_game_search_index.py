@@ -0,0 +1,62 @@
+import uuid
+from collections import defaultdict
+
+from django.db import migrations
+
+
+CREATE_TABLE_SQL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS games_search_index USING fts5("
+    "game_id UNINDEXED, title, description, genres, tags, "
+    "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+)
+
+
+def create_search_index(apps, schema_editor):
+    # Índice FTS5 usado por games.search.backends.sqlite_fts. Outros bancos de
+    # dados usam o backend sem índice (GAME_SEARCH_BACKEND)
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+
+    Game = apps.get_model('games', 'Game')
+    genre_names = defaultdict(list)
+    for game_id, name in Game.genres.through.objects.values_list('game_id', 'genre__name'):
+        genre_names[game_id].append(name)
+    tag_names = defaultdict(list)
+    for game_id, name in Game.tags.through.objects.values_list('game_id', 'tag__name'):
+        tag_names[game_id].append(name)
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(CREATE_TABLE_SQL)
+        cursor.executemany(
+            "INSERT INTO games_search_index (rowid, game_id, title, description, genres, tags) "
+            "VALUES (%s, %s, %s, %s, %s, %s)",
+            [
+                (
+                    uuid.UUID(str(game_id)).int & ((1 << 63) - 1),
+                    str(game_id),
+                    title,
+                    description,
+                    ' '.join(genre_names[game_id]),
+                    ' '.join(tag_names[game_id]),
+                )
+                for game_id, title, description in Game.objects.values_list('id', 'title', 'description')
+            ],
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("DROP TABLE IF EXISTS games_search_index")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0009_game_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.1 on 2026-10-18 12:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0012_rating_review_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GameTFIDFChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('game_id', models.UUIDField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='gametfidf',
+            name='last_change_id',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='gametfidf',
+            name='revision',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
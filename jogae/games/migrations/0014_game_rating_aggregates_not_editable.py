@@ -0,0 +1,34 @@
+# Generated by Django 5.2.1 on 2026-10-18 12:56
+
+import games.rating_aggregates
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0013_tfidf_change_queue'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='game',
+            name='rating_avg',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='game',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='game',
+            name='rating_score',
+            field=models.FloatField(default=games.rating_aggregates.bayesian_prior_score, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='game',
+            name='rating_sum',
+            field=models.FloatField(default=0, editable=False),
+        ),
+    ]
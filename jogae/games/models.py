@@ -1,8 +1,9 @@
 import uuid
+from django.conf import settings
 from django.urls import reverse
 from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator
-from django.db.models import Avg
+from .rating_aggregates import AGGREGATE_FIELDS, bayesian_prior_score
 
 class Genre(models.Model):
     name = models.CharField(max_length=100, unique=True)
@@ -18,6 +19,16 @@ class Tag(models.Model):
         return self.name
 
 
+class GameQuerySet(models.QuerySet):
+
+    def top_rated(self):
+        # Maiores notas primeiro, pela média simples ou pela média bayesiana
+        # conforme RATING_ORDERING
+        if settings.RATING_ORDERING == 'bayesian':
+            return self.order_by('-rating_score')
+        return self.order_by('-rating_avg')
+
+
 class Game(models.Model):
     user = models.ForeignKey("app_cadastro_usuario.User", on_delete=models.CASCADE)
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -26,12 +37,46 @@ class Game(models.Model):
     picture = models.ImageField(upload_to="games/", null=True, blank=True)
     genres = models.ManyToManyField(Genre, blank=True)
     tags = models.ManyToManyField(Tag, blank=True)
+    # Agregados das notas mantidos a cada Rating criado, editado ou removido,
+    # ver games.rating_aggregates. Não são editáveis nem gravados pelo save()
+    rating_sum = models.FloatField(default=0, editable=False)
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_avg = models.FloatField(default=0, editable=False)
+    # Média bayesiana: a média com RATING_PRIOR_WEIGHT notas "virtuais" iguais a
+    # RATING_PRIOR_MEAN, assim poucas notas não dominam a ordenação
+    rating_score = models.FloatField(default=bayesian_prior_score, editable=False)
+
+    objects = GameQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-rating_avg'], name='game_rating_avg_idx'),
+            models.Index(fields=['-rating_score'], name='game_rating_score_idx'),
+        ]
+
+    def save(self, *args, update_fields=None, **kwargs):
+        # Em atualizações os agregados em memória podem estar desatualizados,
+        # então ficam de fora do UPDATE e somente os sinais de Rating (UPDATE
+        # com expressões F) e rebuild_rating_aggregates os alteram
+        if not self._state.adding:
+            if update_fields is None:
+                deferred_fields = self.get_deferred_fields()
+                update_fields = [
+                    field.attname for field in self._meta.concrete_fields
+                    if not field.primary_key
+                    and field.name not in AGGREGATE_FIELDS
+                    and field.attname not in deferred_fields
+                ]
+            else:
+                update_fields = [name for name in update_fields if name not in AGGREGATE_FIELDS]
+        super().save(*args, update_fields=update_fields, **kwargs)
 
     def get_absolute_url(self):
         return reverse("games:detail", kwargs={"pk": self.id})
 
     def average_rating(self):
-        return self.ratings.aggregate(Avg('rating'))['rating__avg'] or 0
+        # Mantida pelos signals de Rating, sem consulta na base de dados
+        return self.rating_avg
 
     def __str__(self):
         return self.title
@@ -48,15 +93,95 @@ class Rating(models.Model):
 
     class Meta:
         ordering = ['-updated', '-created']
+        # Paginação por chave das avaliações na página do jogo, ver games.reviews
+        indexes = [
+            models.Index(fields=['game', '-created', '-id'], name='rating_game_created_idx'),
+            models.Index(fields=['game', '-rating', '-id'], name='rating_game_rating_idx'),
+        ]
 
     def __str__(self):
         return self.body[0:50]
 
 
 class GameTFIDF(models.Model):
-    tfidf_matrix = models.BinaryField()  
-    game_index_map = models.JSONField()  
+    # Formatos 1 e 2 guardam a matriz na base de dados, ver games.tfidf_artifact
+    tfidf_matrix = models.BinaryField(null=True, blank=True)
+    game_index_map = models.JSONField(null=True, blank=True)
+    # Lista ordenada de ids dos jogos, a posição é a linha na matriz (formato 2)
+    game_ids = models.JSONField(null=True, blank=True)
+    # Formato 3: diretório do artefato relativo a ARTIFACTS_ROOT e seu checksum (sha256)
+    artifact_path = models.CharField(max_length=255, blank=True)
+    checksum = models.CharField(max_length=64, blank=True)
+    # Versão do formato do artefato, ver games.tfidf_artifact
+    format_version = models.PositiveSmallIntegerField(default=1)
+    # Tokens transformados por atualizações incrementais desde o último ajuste
+    # completo e quantos deles estão fora do vocabulário, ver games.tfidf_pipeline
+    drift_token_count = models.PositiveBigIntegerField(default=0)
+    drift_oov_count = models.PositiveBigIntegerField(default=0)
+    needs_refit = models.BooleanField(default=False)
+    # Atualizações incrementais trocam o artefato da mesma linha e incrementam
+    # a revisão; o id só muda em um ajuste completo. 'last_change_id' é o
+    # último GameTFIDFChange já refletido no artefato
+    revision = models.PositiveIntegerField(default=0)
+    last_change_id = models.PositiveBigIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
         return f"TF-IDF Matrix (Created: {self.created_at})"
+
+
+class GameTFIDFChange(models.Model):
+    # Jogo criado, editado ou removido a aplicar na matriz TF-IDF pelo comando
+    # 'apply_tfidf_updates', ver games.tfidf_pipeline. Sem chave estrangeira:
+    # jogos removidos também precisam sair da matriz
+    game_id = models.UUIDField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"TF-IDF change {self.game_id} ({self.created_at})"
+
+
+class GameItemSimilarity(models.Model):
+    # Matriz esparsa jogos x jogos (co-ocorrência entre favoritos e notas altas),
+    # podada para os 'top_n' vizinhos de cada jogo, ver games.item_similarity
+    artifact_path = models.CharField(max_length=255)
+    checksum = models.CharField(max_length=64)
+    top_n = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Item-Item Similarity (Created: {self.created_at})"
+
+
+class GameANNIndex(models.Model):
+    # Índice aproximado (SVD truncado + listas invertidas) sobre a matriz TF-IDF,
+    # ver games.ann_index. Só é válido para o vocabulário do ajuste que o gerou
+    artifact_path = models.CharField(max_length=255)
+    checksum = models.CharField(max_length=64)
+    vocabulary_fingerprint = models.CharField(max_length=64)
+    num_components = models.PositiveIntegerField()
+    num_lists = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"ANN Index (Created: {self.created_at})"
+
+
+class SimilarGame(models.Model):
+    # Vizinhos mais similares de cada jogo pela matriz TF-IDF, pré-calculados
+    # (ver games.similar_games) para a seção "Jogos similares" da página do jogo
+    game = models.ForeignKey(Game, on_delete=models.CASCADE, related_name='similar_games')
+    # Sem restrição no banco: ao remover um jogo as listas que apontam para ele
+    # são encontradas e recalculadas pela atualização incremental
+    similar = models.ForeignKey(Game, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    score = models.FloatField()
+    rank = models.PositiveSmallIntegerField()
+
+    class Meta:
+        ordering = ['game', 'rank']
+        constraints = [
+            models.UniqueConstraint(fields=['game', 'rank'], name='similar_game_rank_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.game_id} -> {self.similar_id} ({self.score:.3f})"
@@ -0,0 +1,82 @@
+import numpy as np
+
+
+def top_k(scores, k, exclude=None):
+    """
+    Retorna os índices dos 'k' maiores scores, do maior para o menor.
+
+    Usa seleção parcial (partition, O(n)) e ordena somente os k vencedores.
+    As posições em 'exclude' (lista de índices ou máscara booleana) e as com
+    -inf nunca são retornadas, então o resultado sempre tem k itens quando há
+    candidatos suficientes. Empates são desfeitos pelo menor índice, inclusive
+    na fronteira do k-ésimo score.
+    """
+    scores = np.asarray(scores, dtype=np.float64).ravel()
+    num_items = scores.shape[0]
+
+    available = scores > -np.inf
+    if exclude is not None and len(exclude):
+        exclude = np.asarray(exclude)
+        if exclude.dtype == bool:
+            available &= ~exclude
+        else:
+            available[exclude] = False
+    num_available = int(available.sum())
+    if num_available < num_items:
+        scores = np.where(available, scores, -np.inf)
+
+    k = min(int(k), num_available)
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+
+    if k < num_items:
+        # k-ésimo maior score: os maiores que ele entram e os empatados com
+        # ele completam os k pelo menor índice
+        kth = np.partition(scores, num_items - k)[num_items - k]
+        above = np.flatnonzero(scores > kth)
+        tied = np.flatnonzero(scores == kth)[:k - len(above)]
+        candidates = np.concatenate([above, tied])
+    else:
+        candidates = np.arange(num_items)
+
+    # Ordena os candidatos por score decrescente e índice crescente
+    order = np.lexsort((candidates, -scores[candidates]))
+    return candidates[order]
+
+
+def top_k_rows(scores, k):
+    """
+    Versão de 'top_k' para cada linha de uma matriz densa de scores.
+
+    Posições com -inf são tratadas como excluídas. Retorna uma lista com um
+    array de índices (do maior para o menor score) por linha.
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    num_rows, num_items = scores.shape
+    k = min(int(k), num_items)
+    if k <= 0 or num_rows == 0:
+        return [np.empty(0, dtype=np.intp) for _ in range(num_rows)]
+
+    if k < num_items:
+        candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        candidates = np.tile(np.arange(num_items), (num_rows, 1))
+
+    candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+    # Ordena por score decrescente e índice crescente em cada linha
+    order = np.lexsort((candidates, -candidate_scores), axis=1)
+    candidates = np.take_along_axis(candidates, order, axis=1)
+    candidate_scores = np.take_along_axis(candidate_scores, order, axis=1)
+
+    results = [
+        row_candidates[np.isfinite(row_scores)]
+        for row_candidates, row_scores in zip(candidates, candidate_scores)
+    ]
+    if k < num_items:
+        # Linhas com empates no k-ésimo score que ficaram de fora da seleção
+        # parcial são refeitas com 'top_k', que escolhe pelo menor índice
+        kth = candidate_scores[:, -1:]
+        ties_outside = (scores == kth).sum(axis=1) > (candidate_scores == kth).sum(axis=1)
+        for row in np.flatnonzero(ties_outside & np.isfinite(kth[:, 0])):
+            results[row] = top_k(scores[row], k)
+    return results
@@ -0,0 +1,108 @@
+from django.conf import settings
+from django.db.models import Case, Count, F, FloatField, Sum, Value, When
+from django.db.models.lookups import GreaterThan
+
+
+def bayesian_prior_score():
+    # Score de um jogo ainda sem notas
+    return float(settings.RATING_PRIOR_MEAN)
+
+
+def aggregate_updates(sum_delta, count_delta):
+    """
+    Expressões para um único UPDATE que aplica a variação nos agregados de
+    notas do jogo. Todos os campos são calculados a partir dos valores atuais
+    da linha, então atualizações simultâneas não se sobrescrevem.
+    """
+    new_sum = F('rating_sum') + Value(float(sum_delta))
+    new_count = F('rating_count') + Value(int(count_delta))
+    has_ratings = GreaterThan(new_count, 0)
+    prior_mean = float(settings.RATING_PRIOR_MEAN)
+    prior_weight = float(settings.RATING_PRIOR_WEIGHT)
+
+    return {
+        # Sem notas a soma volta a zero, descartando resíduos de ponto flutuante
+        'rating_sum': Case(When(has_ratings, then=new_sum), default=Value(0.0), output_field=FloatField()),
+        'rating_count': new_count,
+        'rating_avg': Case(When(has_ratings, then=new_sum / new_count), default=Value(0.0), output_field=FloatField()),
+        'rating_score': Case(
+            When(has_ratings, then=(Value(prior_mean * prior_weight) + new_sum) / (Value(prior_weight) + new_count)),
+            default=Value(prior_mean),
+            output_field=FloatField(),
+        ),
+    }
+
+
+def apply_rating_change(game_id, sum_delta, count_delta):
+    from .models import Game
+
+    Game.objects.filter(pk=game_id).update(**aggregate_updates(sum_delta, count_delta))
+
+
+def add_rating(game_id, rating):
+    apply_rating_change(game_id, rating, 1)
+
+
+def change_rating(previous_game_id, previous_rating, game_id, rating):
+    if previous_game_id == game_id:
+        apply_rating_change(game_id, rating - previous_rating, 0)
+    else:
+        apply_rating_change(previous_game_id, -previous_rating, -1)
+        apply_rating_change(game_id, rating, 1)
+
+
+def remove_rating(game_id, rating):
+    apply_rating_change(game_id, -rating, -1)
+
+
+AGGREGATE_FIELDS = ('rating_sum', 'rating_count', 'rating_avg', 'rating_score')
+
+
+def aggregate_values(total, count):
+    # Valores esperados dos agregados de um jogo com 'count' notas somando 'total'
+    prior_mean = float(settings.RATING_PRIOR_MEAN)
+    prior_weight = float(settings.RATING_PRIOR_WEIGHT)
+    if not count:
+        return {'rating_sum': 0.0, 'rating_count': 0, 'rating_avg': 0.0, 'rating_score': prior_mean}
+    return {
+        'rating_sum': float(total),
+        'rating_count': count,
+        'rating_avg': total / count,
+        'rating_score': (prior_mean * prior_weight + total) / (prior_weight + count),
+    }
+
+
+def find_mismatches(tolerance=1e-9):
+    """
+    Recalcula os agregados a partir de Rating e gera (jogo, valores esperados)
+    para cada jogo cujos agregados armazenados estão divergentes.
+    """
+    from .models import Game, Rating
+
+    totals = {
+        row['game_id']: (row['total'], row['count'])
+        for row in Rating.objects.order_by().values('game_id').annotate(total=Sum('rating'), count=Count('id'))
+    }
+    # O título é exibido por 'rebuild_rating_aggregates --verify'
+    games = Game.objects.only('pk', 'title', *AGGREGATE_FIELDS).order_by('pk')
+    for game in games.iterator(chunk_size=2000):
+        expected = aggregate_values(*totals.get(game.pk, (0.0, 0)))
+        if any(abs(getattr(game, field) - value) > tolerance for field, value in expected.items()):
+            yield game, expected
+
+
+def rebuild_rating_aggregates(batch_size=500):
+    """
+    Corrige os agregados divergentes e retorna quantos jogos foram alterados.
+    Notas gravadas durante a reconstrução podem ser sobrescritas, execute
+    fora dos horários de escrita.
+    """
+    from .models import Game
+
+    fixed = []
+    for game, expected in find_mismatches():
+        for field, value in expected.items():
+            setattr(game, field, value)
+        fixed.append(game)
+    Game.objects.bulk_update(fixed, AGGREGATE_FIELDS, batch_size=batch_size)
+    return len(fixed)
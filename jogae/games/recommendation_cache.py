@@ -0,0 +1,177 @@
+import threading
+import time
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from .tfidf_registry import get_tfidf_model
+
+
+CACHE_ALIAS = 'recommendations'
+
+
+class RecommendationCacheStats:
+    """
+    Contadores do cache de recomendações da página inicial neste processo.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.invalidations = 0
+        self.recompute_count = 0
+        self.recompute_total = 0.0
+        self.recompute_max = 0.0
+
+    def record_hit(self):
+        with self._lock:
+            self.hits += 1
+
+    def record_miss(self, stale=False):
+        with self._lock:
+            self.misses += 1
+            if stale:
+                self.stale += 1
+
+    def record_recompute(self, seconds):
+        with self._lock:
+            self.recompute_count += 1
+            self.recompute_total += seconds
+            self.recompute_max = max(self.recompute_max, seconds)
+
+    def record_invalidation(self, count):
+        with self._lock:
+            self.invalidations += count
+
+    def as_dict(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'stale': self.stale,
+                'invalidations': self.invalidations,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'recompute_count': self.recompute_count,
+                'recompute_avg_ms': (
+                    self.recompute_total * 1000 / self.recompute_count if self.recompute_count else 0.0
+                ),
+                'recompute_max_ms': self.recompute_max * 1000,
+            }
+
+
+cache_stats = RecommendationCacheStats()
+
+
+def get_cache():
+    return caches[CACHE_ALIAS]
+
+
+def _generation_key(user_id):
+    return f'home-generation:{user_id}'
+
+
+def _entry_key(user_id, generation):
+    return f'home:{user_id}:{generation}'
+
+
+def _current_generation(cache, user_id):
+    # Sem geração (primeiro acesso ou chave descartada pelo limite de entradas
+    # do cache) cria uma nova aleatória: nenhuma entrada gravada antes, nem a
+    # de um cálculo que concorreu com uma invalidação, volta a ser servida
+    key = _generation_key(user_id)
+    generation = cache.get(key)
+    if generation is None:
+        generation = uuid.uuid4().hex
+        cache.add(key, generation, timeout=None)
+        # Outro processo/thread pode ter criado a geração ao mesmo tempo
+        generation = cache.get(key, generation)
+    return generation
+
+
+def lookup(user):
+    """
+    Procura as recomendações do usuário em cache. Retorna (encontrado, itens,
+    token), o token deve ser repassado para 'store' junto com o resultado
+    calculado quando não há entrada válida.
+
+    A entrada fica sob a geração atual do usuário (trocada a cada invalidação),
+    então um cálculo que termina depois de uma invalidação nunca volta a ser
+    servido. O resultado também guarda o ajuste do TF-IDF usado (id da linha,
+    mantido pelas atualizações incrementais) e é descartado depois de um
+    ajuste completo.
+    """
+    cache = get_cache()
+    tfidf_model = get_tfidf_model()
+    tfidf_version = tfidf_model.version[0] if tfidf_model is not None else None
+
+    generation = _current_generation(cache, user.pk)
+    entry = cache.get(_entry_key(user.pk, generation))
+    if entry is not None and entry['tfidf_version'] == tfidf_version:
+        cache_stats.record_hit()
+        return True, entry['items'], None
+    cache_stats.record_miss(stale=entry is not None)
+    return False, None, (generation, tfidf_version)
+
+
+def store(user, token, items):
+    generation, tfidf_version = token
+    get_cache().set(
+        _entry_key(user.pk, generation),
+        {'tfidf_version': tfidf_version, 'items': items},
+        timeout=settings.RECOMMENDATION_CACHE_TTL,
+    )
+
+
+async def aget_cached_recommendations(user, compute):
+    """
+    Retorna a lista final de recomendações da página inicial do usuário,
+    aguardando 'compute(user)' somente quando não há resultado válido em
+    cache. 'compute' é uma corrotina que retorna (itens, completo);
+    resultados incompletos (alguma fonte excedeu o tempo) não são guardados.
+    """
+    found, items, token = await sync_to_async(lookup)(user)
+    if found:
+        return items
+
+    started = time.perf_counter()
+    items, complete = await compute(user)
+    cache_stats.record_recompute(time.perf_counter() - started)
+
+    if complete:
+        await sync_to_async(store)(user, token, items)
+    return items
+
+
+def invalidate_users(user_ids):
+    """
+    Descarta as recomendações em cache dos usuários após o commit da
+    transação atual, assim o próximo cálculo já enxerga os dados novos.
+    """
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    if not user_ids:
+        return
+
+    def invalidate():
+        cache = get_cache()
+        generations = cache.get_many([_generation_key(user_id) for user_id in user_ids])
+        cache.delete_many([
+            _entry_key(user_id, generations[_generation_key(user_id)])
+            for user_id in user_ids
+            if _generation_key(user_id) in generations
+        ])
+        cache.set_many(
+            {_generation_key(user_id): uuid.uuid4().hex for user_id in user_ids},
+            timeout=None,
+        )
+        cache_stats.record_invalidation(len(user_ids))
+
+    transaction.on_commit(invalidate)
@@ -0,0 +1,135 @@
+import asyncio
+import logging
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+from .recommendation_utils import (
+    get_collaborative_recommendations,
+    get_content_based_rating,
+    get_content_based_recommendations,
+    get_favorite_games,
+    get_friend_based_recommendations,
+    merge_home_recommendations,
+)
+
+logger = logging.getLogger(__name__)
+
+# Orçamento padrão (segundos) de cada fonte, ver RECOMMENDATION_SOURCE_BUDGETS
+DEFAULT_SOURCE_BUDGET = 0.5
+
+
+def _content_source(user, user_favorites):
+    return get_content_based_recommendations(user_favorites, return_profile=True)
+
+
+def _collaborative_source(user, user_favorites):
+    return get_collaborative_recommendations(user)
+
+
+def _friends_source(user, user_favorites):
+    return get_friend_based_recommendations(user, return_scores=True)
+
+
+def _rating_source(user, user_favorites):
+    return get_content_based_rating(user, num_recommendations=5, return_profile=False)
+
+
+# Ordem em que as recomendações de cada fonte são combinadas
+SOURCES = {
+    'rating': _rating_source,
+    'content': _content_source,
+    'friends': _friends_source,
+    'collaborative': _collaborative_source,
+}
+
+
+def source_budget(name):
+    budgets = getattr(settings, 'RECOMMENDATION_SOURCE_BUDGETS', {})
+    return budgets.get(name, DEFAULT_SOURCE_BUDGET)
+
+
+def _run_source(source, user, user_favorites):
+    # Cada fonte roda em uma thread própria com sua conexão, que é fechada ao
+    # final como nas requisições (respeitando CONN_MAX_AGE)
+    close_old_connections()
+    try:
+        return source(user, user_favorites)
+    finally:
+        close_old_connections()
+
+
+async def _timed_source(name, user, user_favorites):
+    started = time.perf_counter()
+    result = await asyncio.wait_for(
+        sync_to_async(_run_source, thread_sensitive=False)(SOURCES[name], user, user_favorites),
+        timeout=source_budget(name),
+    )
+    logger.debug("Fonte de recomendação '%s' em %.1f ms", name, (time.perf_counter() - started) * 1000)
+    return result
+
+
+async def gather_sources(user, user_favorites):
+    """
+    Executa todas as fontes de recomendação ao mesmo tempo, cada uma limitada
+    pelo seu orçamento de tempo. Retorna ({fonte: resultado}, fontes que
+    excederam o tempo ou falharam); fontes descartadas não aparecem no dicionário.
+    """
+    names = list(SOURCES)
+    results = await asyncio.gather(
+        *(_timed_source(name, user, user_favorites) for name in names),
+        return_exceptions=True,
+    )
+
+    collected, dropped = {}, []
+    for name, result in zip(names, results):
+        if isinstance(result, asyncio.TimeoutError):
+            # A thread da fonte continua até terminar, somente o resultado é descartado
+            logger.warning(
+                "Fonte de recomendação '%s' excedeu o tempo de %.2fs e foi descartada.",
+                name, source_budget(name),
+            )
+            dropped.append(name)
+        elif isinstance(result, Exception):
+            logger.error("Fonte de recomendação '%s' falhou.", name, exc_info=result)
+            dropped.append(name)
+        elif isinstance(result, BaseException):
+            # Cancelamento da própria requisição
+            raise result
+        else:
+            collected[name] = result
+    return collected, dropped
+
+
+async def aget_home_recommendations(user):
+    """
+    Lista final da página inicial: executa as recomendações por conteúdo,
+    notas, amigos e colaborativa ao mesmo tempo, ordena pela similaridade com
+    o gosto do usuário e completa com jogos populares até 10 itens (ver
+    'merge_home_recommendations').
+
+    Retorna (itens, completo): itens é [(game_id, score), ...] ou None quando
+    o usuário não possui jogos favoritos, e 'completo' é falso quando alguma
+    fonte foi descartada e a lista foi montada com as demais.
+    """
+    user_favorites = await sync_to_async(get_favorite_games)(user)
+    if user_favorites is None:
+        return None, True
+
+    collected, dropped = await gather_sources(user, user_favorites)
+
+    content_recs, user_profile = collected.get('content', ([], None))
+    friend_scored = collected.get('friends', [])
+    combined_recs = (
+        collected.get('rating', [])
+        + content_recs
+        + [game for game, score in friend_scored]
+        + collected.get('collaborative', [])
+    )
+    friend_scores = {str(game.pk): score for game, score in friend_scored}
+    items = await sync_to_async(merge_home_recommendations)(
+        user_favorites, combined_recs, user_profile, friend_scores,
+    )
+    return items, not dropped
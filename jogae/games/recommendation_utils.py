@@ -1,15 +1,39 @@
-from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
-import pickle
+from django.conf import settings
+from django.db.models import FloatField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from scipy import sparse
+from sklearn.preprocessing import normalize
+
+from .ann_index import search_similar
+from .item_similarity import get_item_based_scores
+from .models import Game, Rating
+from .ranking import top_k, top_k_rows
+from .tfidf_registry import get_tfidf_model
+from app_profile.friend_graph import get_friend_ids
+from app_biblioteca.models import FavoriteGamesByUser
 
-from django.db.models import Count, Q
-from django.contrib.auth import get_user_model
+# Nota que conta como um amigo "neutro" no score dos jogos dos amigos
+FRIEND_RATING_MIDPOINT = 2.5
 
-from .models import Game, GameTFIDF
-from app_profile.models import Friendship
-from app_biblioteca.models import FavoriteGamesByUser
 
-User = get_user_model()
+def most_similar_indices(tfidf_model, user_profile, num_recommendations, excluded_indices):
+    """
+    Linhas da matriz TF-IDF dos jogos mais similares ao perfil, do maior para o
+    menor score, sem as linhas em 'excluded_indices'.
+
+    Em catálogos grandes usa o índice aproximado (comando 'build_ann_index'),
+    que compara o perfil somente com os jogos das listas mais próximas. Sem
+    índice válido a similaridade é calculada com todos os jogos.
+    """
+    similar_indices = search_similar(tfidf_model, user_profile, num_recommendations, exclude=excluded_indices)
+    if similar_indices is not None:
+        return similar_indices
+
+    # Similaridade de coseno entre o gosto do usuário e a matriz tfidf normalizada
+    # (um único produto esparso)
+    cosine_similarities = tfidf_model.similarities(user_profile)
+    return top_k(cosine_similarities, num_recommendations, exclude=excluded_indices)
 
 
 def get_content_based_recommendations(user_favorite_games, num_recommendations=5, return_profile=False):
@@ -18,15 +42,14 @@ def get_content_based_recommendations(user_favorite_games, num_recommendations=5
     if not user_favorite_games:
         return ([], None) if return_profile else []
 
-    # Coleta dados da matriz TFIDF
-    try:
-        game_tfidf_data = GameTFIDF.objects.latest('created_at')
-        tfidf_matrix = pickle.loads(game_tfidf_data.tfidf_matrix)
-        game_index_map = game_tfidf_data.game_index_map
-    except GameTFIDF.DoesNotExist:
+    # Coleta dados da matriz TFIDF já carregada em memória
+    tfidf_model = get_tfidf_model()
+    if tfidf_model is None:
         # Caso não tenha a matriz, retorna vazio necessário rodar
         # 'docker-compose exec web python manage.py setup_dev_data'
         return ([], None) if return_profile else []
+    tfidf_matrix = tfidf_model.tfidf_matrix
+    game_index_map = tfidf_model.game_index_map
 
     # Coleta ids dos jogos favoritos
     user_favorite_ids = {str(game.id) for game in user_favorite_games}
@@ -38,34 +61,14 @@ def get_content_based_recommendations(user_favorite_games, num_recommendations=5
     # Coleta gosto do usuário
     user_profile = np.asarray(tfidf_matrix[user_game_indices].mean(axis=0))
 
-    # Algoritmo de similaridade de coseno entre o gosto do usuário e a matriz tfidf
-    cosine_similarities = cosine_similarity(user_profile, tfidf_matrix)
-
-    # Soma a quantidade de jogos necessários de recomendação com 
-    # a quantidade de jogos favoritos para que tenha maior probabilidade
-    # de coletar ao menos 'num_recommendations' recomendações válidas
-    total_to_fetch = num_recommendations + len(user_favorite_games)
-    
-    # 'Ordena' retornando os índices dos jogos de menor -> maior similaridade 
-    similar_indices = cosine_similarities.argsort().flatten()[-total_to_fetch:]
+    # Seleciona os 'num_recommendations' jogos mais similares, já do maior para o
+    # menor, ignorando os jogos favoritos
+    similar_indices = most_similar_indices(tfidf_model, user_profile, num_recommendations, user_game_indices)
 
     # Matriz de jogos volta a forma de ids
-    index_to_game_id_map = {v: k for k, v in game_index_map.items()}
-    recommended_game_ids = []
-
-    # Necessário reverter pois anteriormente foi 'ordenado' de menor -> maior
-    for i in reversed(similar_indices):
-        
-        # coleta id do jogo
-        game_id = index_to_game_id_map.get(i)
-
-        # adiciona somente se o jogo não tiver nos jogos favoritos e 
-        # ao chegar no limite máximo de recomendações para o loop
-        if game_id and game_id not in user_favorite_ids:
-            recommended_game_ids.append(game_id)
-        if len(recommended_game_ids) >= num_recommendations:
-            break
-    
+    game_ids = tfidf_model.game_ids
+    recommended_game_ids = [str(game_ids[i]) for i in similar_indices]
+
     # Coleta os objetos dos jogos pegos pelo ID
     games_map = {str(g.id): g for g in Game.objects.filter(pk__in=recommended_game_ids)}
     recommended_games = [games_map[gid] for gid in recommended_game_ids if gid in games_map]
@@ -77,27 +80,59 @@ def get_content_based_recommendations(user_favorite_games, num_recommendations=5
         return recommended_games
 
 
-def get_friend_based_recommendations(user, num_recommendations=5):
+def friend_game_scores(user, num_recommendations=5):
+    """
+    Jogos salvos pelos amigos do usuário (e ainda não salvos por ele) com uma
+    única consulta agregada: cada amigo que salvou o jogo soma nota / 2.5
+    (entre 0 e 2) quando avaliou o jogo, ou 1 quando não avaliou.
+    Retorna [(game_id, score), ...] do maior para o menor score.
+    """
+    friend_ids = list(get_friend_ids(user.pk))
+    if not friend_ids:
+        return []
 
-    # Coleta amigos do usuário
-    friends = Friendship.objects.get_friends(user)
-    
-    # Se não possuir amigo não há o que recomendar
-    if not friends:
+    FavoriteGames = FavoriteGamesByUser.games.through
+    # Nota que o amigo da linha deu ao jogo salvo, se houver
+    friend_rating = Rating.objects.filter(
+        user_id=OuterRef('favoritegamesbyuser__user_id'),
+        game_id=OuterRef('game_id'),
+    ).values('rating')[:1]
+
+    scores = (
+        FavoriteGames.objects
+        .filter(favoritegamesbyuser__user_id__in=friend_ids)
+        .exclude(game_id__in=FavoriteGames.objects.filter(
+            favoritegamesbyuser__user_id=user.pk,
+        ).values('game_id'))
+        .values('game_id')
+        .annotate(score=Sum(Coalesce(
+            Subquery(friend_rating, output_field=FloatField()) / FRIEND_RATING_MIDPOINT,
+            Value(1.0),
+        )))
+        # Empates são desfeitos pelo id, mantendo a ordem estável
+        .order_by('-score', 'game_id')[:num_recommendations]
+    )
+    return [(str(row['game_id']), row['score']) for row in scores]
+
+
+def get_friend_based_recommendations(user, num_recommendations=5, return_scores=False):
+
+    # Jogos dos amigos ordenados pelo score (quantidade de amigos que salvaram,
+    # ponderada pelas notas deles)
+    scored_ids = friend_game_scores(user, num_recommendations)
+
+    # Se não possuir amigo ou jogo salvo pelos amigos não há o que recomendar
+    if not scored_ids:
         return []
 
-    # Coleta ids dos amigos
-    friend_ids = [f.id for f in friends]
-
-    # Coleta todos os jogos diferentes de todos os amigos
-    friend_favorites = Game.objects.filter(savedInLibrary__user__in=friend_ids).distinct()
-    
-    # Exclui jogos que já estão favoritados pelo usuário
-    user_favorite_ids = user.favoritegamesbyuser.games.values_list('id', flat=True)
-    recommendations = friend_favorites.exclude(id__in=user_favorite_ids)
+    # Coleta os objetos dos jogos mantendo a ordem do score
+    games_map = {str(g.id): g for g in Game.objects.filter(pk__in=[gid for gid, score in scored_ids])}
+    recommendations = [(games_map[gid], score) for gid, score in scored_ids if gid in games_map]
 
     # Retorna recomendações
-    return list(recommendations[:num_recommendations])
+    if return_scores:
+        return recommendations
+    return [game for game, score in recommendations]
 
 
 def get_collaborative_recommendations(current_user, num_recommendations=5):
@@ -110,45 +145,28 @@ def get_collaborative_recommendations(current_user, num_recommendations=5):
     except FavoriteGamesByUser.DoesNotExist:
         return []
 
-
-    # Localiza usuários que possuem ao menos 1 jogo em comum com o usuário atual
-    # ordenando pela quantidade de jogos em comum
-    similar_users = User.objects.filter(
-        favoritegamesbyuser__games__id__in=current_user_favorite_ids
-    ).exclude(
-        pk=current_user.pk
-    ).annotate(
-        common_games_count=Count('favoritegamesbyuser__games', filter=Q(favoritegamesbyuser__games__id__in=current_user_favorite_ids))
-    ).order_by('-common_games_count')[:10]
-
-    # se não localizou nenhum usuário com jogo similar retorna vazio
-    if not similar_users:
+    # Soma a similaridade item-item (pré-computada pelo comando
+    # 'build_item_similarity') dos vizinhos de cada jogo favorito
+    scored_game_ids = get_item_based_scores(current_user_favorite_ids, num_recommendations)
+    if not scored_game_ids:
         return []
 
-    # coleta id dos usuários com jogos similares
-    similar_user_ids = [user.id for user in similar_users]
-
-    # Pega todos os jogos diferentes desses usuários, excluindo os jogos que já estão na lista de favoritos do usuário atual
-    recommended_games = Game.objects.filter( 
-        savedInLibrary__user__id__in=similar_user_ids
-    ).exclude(
-        id__in=current_user_favorite_ids
-    ).distinct()
-
-    return list(recommended_games[:num_recommendations])
+    # Coleta os objetos dos jogos mantendo a ordem do maior para o menor score
+    recommended_game_ids = [game_id for game_id, score in scored_game_ids]
+    games_map = {str(g.id): g for g in Game.objects.filter(pk__in=recommended_game_ids)}
+    return [games_map[gid] for gid in recommended_game_ids if gid in games_map]
 
 
 def get_content_based_rating(user, num_recommendations=5, return_profile=False):
 
-    # Coleta dados da matriz TFIDF
-    try:
-        game_tfidf_data = GameTFIDF.objects.latest('created_at')
-        tfidf_matrix = pickle.loads(game_tfidf_data.tfidf_matrix)
-        game_index_map = game_tfidf_data.game_index_map
-    except GameTFIDF.DoesNotExist:
+    # Coleta dados da matriz TFIDF já carregada em memória
+    tfidf_model = get_tfidf_model()
+    if tfidf_model is None:
         # Caso não tenha a matriz, retorna vazio necessário rodar
         # 'docker-compose exec web python manage.py setup_dev_data'
         return ([], None) if return_profile else []
+    tfidf_matrix = tfidf_model.tfidf_matrix
+    game_index_map = tfidf_model.game_index_map
     
     # Coleta as maiores notas dadas pelo usuário (acima de 4.5) e pré carrega os dados do jogo
     high_ratings = user.ratings.filter(rating__gte=4.5).select_related('game')
@@ -172,37 +190,17 @@ def get_content_based_rating(user, num_recommendations=5, return_profile=False):
         user_favorite_ids = set()
 
 
-    # Algoritmo de similaridade de coseno entre o gosto do usuário e a matriz tfidf
-    cosine_similarities = cosine_similarity(user_profile, tfidf_matrix)
-
-    # Soma a quantidade de jogos necessários de recomendação com 
-    # a quantidade de jogos favoritos e já com nota dada 
-    # para que tenha maior probabilidade de coletar ao menos 
-    # 'num_recommendations' recomendações válidas
+    # Exclui os jogos favoritos e os que já receberam nota alta
     excluded_ids = user_favorite_ids.union(user_game_ids)
-    total_to_fetch = num_recommendations + len(excluded_ids)
-
-    # 'Ordena' retornando os índices dos jogos de menor -> maior similaridade 
-    similar_indices = cosine_similarities.argsort().flatten()[-total_to_fetch:]
+    excluded_indices = [game_index_map[gid] for gid in excluded_ids if gid in game_index_map]
 
+    # Seleciona os 'num_recommendations' jogos mais similares, já do maior para o menor
+    similar_indices = most_similar_indices(tfidf_model, user_profile, num_recommendations, excluded_indices)
 
     # Matriz de jogos volta a forma de ids
-    index_to_game_id_map = {v: k for k, v in game_index_map.items()}
-    recommended_game_ids = []
-
-    # Necessário reverter pois anteriormente foi 'ordenado' de menor -> maior
-    for i in reversed(similar_indices):
+    game_ids = tfidf_model.game_ids
+    recommended_game_ids = [str(game_ids[i]) for i in similar_indices]
 
-        # coleta id do jogo
-        game_id = index_to_game_id_map.get(i)
-
-        # adiciona somente se o jogo não tiver nos jogos favoritos e 
-        # ao chegar no limite máximo de recomendações para o loop
-        if game_id and game_id not in excluded_ids:
-            recommended_game_ids.append(game_id)
-        if len(recommended_game_ids) >= num_recommendations:
-            break
-    
 
     # Coleta os objetos dos jogos pegos pelo ID
     games_map = {str(g.id): g for g in Game.objects.filter(pk__in=recommended_game_ids)}
@@ -222,15 +220,13 @@ def filter_by_similarity(user_profile, games, num_recommendations=10):
     if user_profile is None or not games:
         return [(game, None) for game in games[:num_recommendations]]
 
-    # Coleta dados da matriz TFIDF
-    try:
-        game_tfidf_data = GameTFIDF.objects.latest('created_at')
-        tfidf_matrix = pickle.loads(game_tfidf_data.tfidf_matrix)
-        game_index_map = game_tfidf_data.game_index_map
-    except GameTFIDF.DoesNotExist:
+    # Coleta dados da matriz TFIDF já carregada em memória
+    tfidf_model = get_tfidf_model()
+    if tfidf_model is None:
         # Sem matriz não é possível ordenar por similaridade, retorna a lista
         # truncada com a quantidade de dados passados
         return [(game, None) for game in games[:num_recommendations]]
+    game_index_map = tfidf_model.game_index_map
 
     # Pega os ids dos jogos considerados na matriz de jogos
     game_ids_in_list = {str(g.id) for g in games}
@@ -241,16 +237,12 @@ def filter_by_similarity(user_profile, games, num_recommendations=10):
     # Coleta a posição do jogo na matriz TF-IDF
     index_to_game_map = {game_index_map[str(g.id)]: g for g in games if str(g.id) in game_index_map}
 
-    # Filtra a matriz TFIDF somente com os jogos que serão
-    # verificado seu índice de similaridade
-    filtered_tfidf_matrix = tfidf_matrix[game_indices]
-
-    # Calcula índice de similaridade somente com os jogos de interesse
-    cosine_similarities = cosine_similarity(user_profile, filtered_tfidf_matrix)
-    scores = cosine_similarities[0]
+    # Calcula índice de similaridade somente com as linhas da matriz TFIDF
+    # dos jogos de interesse
+    scores = tfidf_model.similarities(user_profile, rows=game_indices)
 
-    # 'Ordena' retornando os índices dos jogos de menor -> maior similaridade
-    sorted_local_indices = cosine_similarities.argsort().flatten()[::-1]
+    # Índices dos jogos do maior para o menor score de similaridade
+    sorted_local_indices = top_k(scores, num_recommendations)
 
     # Coleta indices e adiciona os objetos do jogo e o score dele a 'sorted_games_with_scores' para retornar 
     sorted_games_with_scores = []
@@ -260,4 +252,156 @@ def filter_by_similarity(user_profile, games, num_recommendations=10):
         score = scores[local_idx]
         sorted_games_with_scores.append((game, score))
 
-    return sorted_games_with_scores[:num_recommendations]
\ No newline at end of file
+    return sorted_games_with_scores
+
+
+def recommend_for_users(user_ids, k=10, max_block_cells=2 ** 24):
+    """
+    Recomendações por conteúdo para vários usuários de uma vez (digest por
+    e-mail, aquecimento de cache...).
+
+    Monta a matriz usuários x jogos dos favoritos, calcula todos os perfis com
+    um único produto esparso com a matriz TF-IDF e seleciona o top-k de cada
+    linha. Os usuários são processados em blocos de forma que a matriz densa de
+    scores nunca passe de 'max_block_cells' posições.
+
+    Retorna {user_id: [(game_id, score), ...]} ordenado do maior para o menor score.
+    """
+    user_ids = list(dict.fromkeys(user_ids))
+    recommendations = {user_id: [] for user_id in user_ids}
+
+    tfidf_model = get_tfidf_model()
+    if tfidf_model is None or not user_ids:
+        return recommendations
+
+    tfidf_matrix = tfidf_model.tfidf_matrix
+    game_index_map = tfidf_model.game_index_map
+    game_ids = tfidf_model.game_ids
+    num_games = tfidf_matrix.shape[0]
+
+    # Quantidade de usuários por bloco limitada pelo tamanho da matriz densa de scores
+    block_size = max(1, max_block_cells // max(num_games, 1))
+    FavoriteGames = FavoriteGamesByUser.games.through
+
+    for start in range(0, len(user_ids), block_size):
+        block_user_ids = user_ids[start:start + block_size]
+        block_row = {user_id: row for row, user_id in enumerate(block_user_ids)}
+
+        # Coleta os pares (usuário, jogo favorito) do bloco com uma única consulta
+        favorite_pairs = FavoriteGames.objects.filter(
+            favoritegamesbyuser__user_id__in=block_user_ids
+        ).values_list('favoritegamesbyuser__user_id', 'game_id')
+
+        rows, cols = [], []
+        for user_id, game_id in favorite_pairs:
+            game_index = game_index_map.get(str(game_id))
+            if game_index is not None:
+                rows.append(block_row[user_id])
+                cols.append(game_index)
+        if not rows:
+            continue
+
+        # Matriz usuários x jogos dos favoritos
+        favorites_matrix = sparse.csr_matrix(
+            (np.ones(len(rows)), (rows, cols)),
+            shape=(len(block_user_ids), num_games),
+        )
+        favorites_matrix.data[:] = 1.0
+
+        # Perfis de todos os usuários do bloco (usuários x vocabulário). Como os
+        # perfis são normalizados, a soma dos favoritos equivale à média
+        user_profiles = normalize(favorites_matrix @ tfidf_matrix, norm='l2')
+
+        # Similaridade de cosseno de cada perfil com todos os jogos
+        scores = np.asarray((user_profiles @ tfidf_matrix.T).todense())
+
+        # Jogos favoritos nunca são recomendados
+        scores[favorites_matrix.nonzero()] = -np.inf
+
+        for row, top_indices in enumerate(top_k_rows(scores, k)):
+            # Usuários sem favoritos na matriz TF-IDF ficam sem recomendação
+            if favorites_matrix.indptr[row] == favorites_matrix.indptr[row + 1]:
+                continue
+            user_id = block_user_ids[row]
+            recommendations[user_id] = [
+                (str(game_ids[i]), float(scores[row, i])) for i in top_indices
+            ]
+
+    return recommendations
+
+
+def get_favorite_games(user):
+    # Jogos favoritos do usuário ou None quando a biblioteca está vazia
+    try:
+        user_favorites = list(user.favoritegamesbyuser.games.all())
+    except FavoriteGamesByUser.DoesNotExist:
+        return None
+    return user_favorites or None
+
+
+def blend_friend_scores(games_list_with_scores, friend_scores):
+    """
+    Reordena (jogo, similaridade) pela soma da similaridade com o score dos
+    amigos multiplicado por FRIEND_RECOMMENDATION_WEIGHT, os dois normalizados
+    pelo maior valor da lista. O score retornado continua sendo a
+    similaridade exibida na página.
+    """
+    if not friend_scores:
+        return games_list_with_scores
+    weight = getattr(settings, 'FRIEND_RECOMMENDATION_WEIGHT', 0.3)
+    top_friend = max(friend_scores.values())
+    top_similarity = max((score for _, score in games_list_with_scores if score is not None), default=0.0)
+    if top_friend <= 0:
+        return games_list_with_scores
+
+    def blended(item):
+        game, score = item
+        similarity = score / top_similarity if score is not None and top_similarity > 0 else 0.0
+        return similarity + weight * friend_scores.get(str(game.pk), 0.0) / top_friend
+
+    # sorted é estável: sem score dos amigos a ordem por similaridade é mantida
+    return sorted(games_list_with_scores, key=blended, reverse=True)
+
+
+def merge_home_recommendations(user_favorites, combined_recs, user_profile, friend_scores=None):
+    """
+    Remove favoritos e repetidos de 'combined_recs', ordena pela similaridade
+    com o gosto do usuário combinada com o score dos amigos ('friend_scores',
+    game_id -> score) e completa com jogos populares até 10 itens.
+    """
+    final_recommendations = []
+    # Coleta jogos que estejam nos jogos favoritos do usuário
+    seen_pks = {game.pk for game in user_favorites}
+
+    # Adiciona jogos a lista final que não estejam na lista de favoritos
+    for game in combined_recs:
+        if game.pk not in seen_pks:
+            final_recommendations.append(game)
+            seen_pks.add(game.pk)
+
+    # Se foi coletado o perfil do usuário filtra dentre todos os jogos que foram coletados recomendados
+    # os que possuem a maior similaridade com o gosto do usuário
+    if user_profile is not None:
+        # retorna uma tupla de (jogo, score de similaridade)
+        games_list_with_scores = filter_by_similarity(user_profile, final_recommendations, num_recommendations=len(final_recommendations))
+    else:
+        # Se não possui o gosto do usuário retorna uma tupla de (jogos, score nulo)
+        games_list_with_scores = [(game, None) for game in final_recommendations]
+
+    # Jogos salvos por mais amigos (e bem avaliados por eles) sobem na lista
+    games_list_with_scores = blend_friend_scores(games_list_with_scores, friend_scores)
+
+    # Se ainda não tiver os 10 jogos, completa com jogos populares
+    if len(games_list_with_scores) < 10:
+        needed = 10 - len(games_list_with_scores)
+        # coleta jogos que foram colocados na lista dos mais recomendados
+        seen_pks.update(game.pk for game, score in games_list_with_scores)
+        # pega os melhores jogos por rating e retira os jogos que ja foram colocados
+        filler_games = Game.objects.exclude(pk__in=seen_pks).top_rated()[:needed]
+        games_list_with_scores.extend([(game, None) for game in filler_games])
+
+    # Somente ids e scores, o resultado pode ser guardado em cache
+    return [
+        (str(game.pk), float(score) if score is not None else None)
+        for game, score in games_list_with_scores
+    ]
@@ -0,0 +1,71 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from django.conf import settings
+
+from .models import Rating
+
+# Campo de ordenação de cada opção da página do jogo; empates são desfeitos
+# pelo id, assim (valor, id) identifica uma posição única na lista
+REVIEW_ORDERINGS = {
+    'recentes': 'created',
+    'rating': 'rating',
+}
+DEFAULT_ORDERING = 'recentes'
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(rating, field):
+    value = getattr(rating, field)
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    payload = json.dumps([value, rating.pk], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, field):
+    try:
+        payload = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        value, pk = json.loads(payload)
+        if field == 'created':
+            value = datetime.fromisoformat(value)
+        else:
+            value = float(value)
+        return value, int(pk)
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError) as error:
+        raise InvalidCursor('Cursor de paginação inválido.') from error
+
+
+def review_page(game, ordering=DEFAULT_ORDERING, cursor=None, page_size=None):
+    """
+    Uma página das avaliações do jogo com os autores, do maior para o menor
+    valor de 'ordering'. Retorna (avaliações, cursor da próxima página ou None).
+
+    A paginação é por chave (keyset): a próxima página começa depois do
+    último (valor, id) retornado, percorrendo o índice (jogo, valor, id) sem
+    OFFSET, então qualquer página custa o mesmo que a primeira.
+    """
+    field = REVIEW_ORDERINGS.get(ordering, REVIEW_ORDERINGS[DEFAULT_ORDERING])
+    page_size = page_size or settings.REVIEWS_PAGE_SIZE
+
+    queryset = (
+        Rating.objects.filter(game=game)
+        .select_related('user')
+        .order_by(f'-{field}', '-id')
+    )
+    if cursor:
+        value, pk = decode_cursor(cursor, field)
+        # (valor, id) < (último valor, último id)
+        queryset = queryset.filter(**{f'{field}__lte': value}).exclude(**{field: value, 'id__gte': pk})
+
+    # Um item a mais indica se existe a próxima página
+    ratings = list(queryset[:page_size + 1])
+    if len(ratings) <= page_size:
+        return ratings, None
+    ratings = ratings[:page_size]
+    return ratings, encode_cursor(ratings[-1], field)
@@ -0,0 +1,65 @@
+import logging
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .backends import get_backend
+from .semantic import blend_results, semantic_search
+
+logger = logging.getLogger(__name__)
+
+
+def search_games(query, limit=None, within=None):
+    """
+    Busca textual no título, descrição, gêneros e tags dos jogos.
+    Retorna [(game_id, score), ...] do mais para o menos relevante.
+    """
+    return get_backend().search(query, limit=limit, within=within)
+
+
+def search_game_ids(query, limit=None, within=None):
+    return [game_id for game_id, score in search_games(query, limit=limit, within=within)]
+
+
+def hybrid_search(query, limit=10, semantic_weight=None):
+    """
+    Combina a busca textual com a busca por conteúdo no espaço TF-IDF, assim
+    'co-op space survival' também encontra jogos sem essas palavras no título.
+    'semantic_weight' (padrão GAME_SEARCH_SEMANTIC_WEIGHT) é o peso da busca
+    por conteúdo, entre 0 (somente textual) e 1 (somente conteúdo).
+    """
+    if semantic_weight is None:
+        semantic_weight = settings.GAME_SEARCH_SEMANTIC_WEIGHT
+    keyword_results = search_games(query, limit=limit) if semantic_weight < 1 else []
+    semantic_results = semantic_search(query, limit=limit) if semantic_weight > 0 else []
+    return blend_results(keyword_results, semantic_results, semantic_weight=semantic_weight, limit=limit)
+
+
+def schedule_index_update(game_ids):
+    """
+    Atualiza o índice de busca dos jogos depois do commit da transação atual.
+    Alterações dentro de uma mesma transação são agrupadas em uma única
+    atualização.
+    """
+    game_ids = {str(game_id) for game_id in game_ids}
+    if not game_ids:
+        return
+
+    # Reaproveita a atualização já agendada nesta transação, se ainda estiver pendente
+    for _, callback, _ in connection.run_on_commit:
+        pending_ids = getattr(callback, 'pending_search_game_ids', None)
+        if pending_ids is not None:
+            pending_ids.update(game_ids)
+            return
+
+    def flush():
+        # Depois de executada não recebe mais jogos, mesmo que continue na lista
+        game_ids, flush.pending_search_game_ids = flush.pending_search_game_ids, None
+        try:
+            get_backend().index_games(game_ids)
+        except Exception:
+            # A atualização do índice não pode derrubar a requisição que salvou o jogo
+            logger.exception("Falha na atualização do índice de busca.")
+
+    flush.pending_search_game_ids = game_ids
+    transaction.on_commit(flush)
@@ -0,0 +1,14 @@
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+@lru_cache(maxsize=None)
+def load_backend(path):
+    return import_string(path)()
+
+
+def get_backend():
+    # Backend configurado em GAME_SEARCH_BACKEND, uma instância por processo
+    return load_backend(settings.GAME_SEARCH_BACKEND)
@@ -0,0 +1,23 @@
+class SearchBackend:
+    """
+    Interface dos backends de busca de jogos, configurado em GAME_SEARCH_BACKEND.
+    """
+
+    def search(self, query, limit=None, within=None):
+        """
+        Retorna [(game_id, score), ...] do mais para o menos relevante.
+        'within' restringe a busca a uma lista de ids de jogos.
+        """
+        raise NotImplementedError
+
+    def index_games(self, game_ids):
+        """
+        Atualiza os documentos dos jogos informados, removendo do índice os
+        jogos que não existem mais.
+        """
+
+    def rebuild(self, chunk_size=None, progress=None):
+        """
+        Reconstrói o índice com todo o catálogo e retorna a quantidade de jogos.
+        """
+        return 0
@@ -0,0 +1,27 @@
+from django.db.models import Q
+
+from ...models import Game
+from .base import SearchBackend
+
+
+class DatabaseSearchBackend(SearchBackend):
+    """
+    Busca sem índice próprio (icontains no título e na descrição), para bancos
+    de dados sem FTS5. Jogos com o termo no título vêm primeiro.
+    """
+
+    def search(self, query, limit=None, within=None):
+        query = query.strip()
+        if not query:
+            return []
+
+        games = Game.objects.filter(Q(title__icontains=query) | Q(description__icontains=query))
+        if within is not None:
+            games = games.filter(pk__in=list(within))
+        games = games.top_rated().values_list('id', 'title')
+        if limit is not None:
+            games = games[:limit]
+
+        lowered = query.lower()
+        results = [(str(game_id), 1.0 if lowered in title.lower() else 0.5) for game_id, title in games]
+        return sorted(results, key=lambda item: -item[1])
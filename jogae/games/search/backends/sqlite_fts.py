@@ -0,0 +1,111 @@
+import re
+import uuid
+
+from django.db import connection, transaction
+
+from ...documents import DEFAULT_CHUNK_SIZE, iter_game_documents, load_game_documents
+from .base import SearchBackend
+
+
+TABLE_NAME = 'games_search_index'
+
+# Peso de cada coluna no bm25 (game_id, título, descrição, gêneros, tags)
+COLUMN_WEIGHTS = (0.0, 10.0, 1.0, 4.0, 4.0)
+
+TOKEN_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+
+def document_rowid(game_id):
+    # O rowid do FTS5 precisa ser inteiro: usa 63 bits do UUID do jogo, assim
+    # atualizar ou remover um jogo não precisa percorrer a tabela
+    return uuid.UUID(str(game_id)).int & ((1 << 63) - 1)
+
+
+def query_tokens(query):
+    return TOKEN_PATTERN.findall(query.lower())
+
+
+def match_expression(tokens, operator='AND'):
+    """
+    Converte as palavras digitadas em uma expressão MATCH segura: cada palavra
+    vira um termo entre aspas com busca por prefixo, unidos por 'operator'.
+    """
+    return f' {operator} '.join(f'"{token}"*' for token in tokens)
+
+
+def insert_documents(cursor, documents):
+    cursor.executemany(
+        f"INSERT INTO {TABLE_NAME} (rowid, game_id, title, description, genres, tags) "
+        "VALUES (%s, %s, %s, %s, %s, %s)",
+        [
+            (document_rowid(doc['id']), doc['id'], doc['title'], doc['description'], doc['genres'], doc['tags'])
+            for doc in documents
+        ],
+    )
+
+
+class SQLiteFTSBackend(SearchBackend):
+    """
+    Índice invertido FTS5 sobre título, descrição, gêneros e tags, com os
+    resultados ordenados pelo bm25. A tabela é criada pela migração 0010.
+    """
+
+    def search(self, query, limit=None, within=None):
+        # Primeiro os jogos com todas as palavras, depois completa com os que
+        # possuem somente algumas delas (com uma palavra as duas são iguais)
+        tokens = query_tokens(query)
+        results = self._match(match_expression(tokens, 'AND'), limit, within)
+        if len(tokens) > 1 and (limit is None or len(results) < limit):
+            seen = {game_id for game_id, score in results}
+            partial = self._match(match_expression(tokens, 'OR'), limit, within)
+            results += [(game_id, score) for game_id, score in partial if game_id not in seen]
+        return results[:limit] if limit is not None else results
+
+    def _match(self, expression, limit, within):
+        if not expression:
+            return []
+
+        weights = ', '.join(str(weight) for weight in COLUMN_WEIGHTS)
+        sql = f"SELECT game_id, bm25({TABLE_NAME}, {weights}) AS score FROM {TABLE_NAME} WHERE {TABLE_NAME} MATCH %s"
+        params = [expression]
+        if within is not None:
+            within = [str(game_id) for game_id in within]
+            if not within:
+                return []
+            sql += f" AND rowid IN ({', '.join(['%s'] * len(within))})"
+            params += [document_rowid(game_id) for game_id in within]
+        # Empates são desfeitos pelo id, mantendo a ordem estável
+        sql += " ORDER BY score, game_id"
+        if limit is not None:
+            sql += " LIMIT %s"
+            params.append(limit)
+
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            # O bm25 do SQLite é menor para os mais relevantes
+            return [(game_id, -score) for game_id, score in cursor.fetchall()]
+
+    def index_games(self, game_ids):
+        game_ids = {str(game_id) for game_id in game_ids}
+        if not game_ids:
+            return
+        documents = load_game_documents(game_ids)
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(
+                f"DELETE FROM {TABLE_NAME} WHERE rowid = %s",
+                [(document_rowid(game_id),) for game_id in game_ids],
+            )
+            insert_documents(cursor, documents)
+
+    def rebuild(self, chunk_size=None, progress=None):
+        total = 0
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {TABLE_NAME}")
+            for documents in iter_game_documents(chunk_size or DEFAULT_CHUNK_SIZE):
+                insert_documents(cursor, documents)
+                total += len(documents)
+                if progress is not None:
+                    progress(total)
+            # Junta os segmentos do índice depois da carga completa
+            cursor.execute(f"INSERT INTO {TABLE_NAME} ({TABLE_NAME}) VALUES ('optimize')")
+        return total
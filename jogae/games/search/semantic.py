@@ -0,0 +1,94 @@
+import threading
+
+import numpy as np
+
+from ..recommendation_utils import most_similar_indices
+from ..tfidf_pipeline import counts_to_tfidf, make_counter
+from ..tfidf_registry import get_tfidf_model
+
+
+class QueryVectorizer:
+    """
+    Transforma o texto buscado no espaço TF-IDF do modelo ativo usando o
+    vocabulário e os pesos IDF persistidos no artefato. O CountVectorizer é
+    montado uma única vez por versão do modelo.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._counter = None
+
+    def transform(self, tfidf_model, text):
+        with self._lock:
+            if self._version != tfidf_model.version:
+                self._counter = make_counter(tfidf_model.vocabulary)
+                self._version = tfidf_model.version
+            counter = self._counter
+        # Linha 1 x vocabulário já normalizada (L2)
+        return counts_to_tfidf(counter.transform([text]), tfidf_model.idf)
+
+
+query_vectorizer = QueryVectorizer()
+
+
+def semantic_search(query, limit=10):
+    """
+    Busca pelo conteúdo: compara o texto com a descrição, gêneros e tags de
+    todos os jogos pela similaridade de cosseno na matriz TF-IDF, sem exigir
+    que as palavras apareçam no título. Retorna [(game_id, score), ...] do
+    mais para o menos similar, somente jogos com score positivo.
+    """
+    tfidf_model = get_tfidf_model()
+    if tfidf_model is None or tfidf_model.vocabulary is None or not query.strip():
+        return []
+
+    query_vector = query_vectorizer.transform(tfidf_model, query)
+    if query_vector.nnz == 0:
+        # Nenhuma palavra do texto existe no vocabulário
+        return []
+    query_profile = query_vector.toarray().ravel()
+
+    # Mesma seleção dos recomendadores: índice aproximado em catálogos grandes,
+    # senão um único produto esparso com top-k por seleção parcial
+    rows = np.asarray(most_similar_indices(tfidf_model, query_profile, limit, []), dtype=np.intp)
+    if rows.size == 0:
+        return []
+    scores = tfidf_model.similarities(query_profile, rows=rows)
+
+    return [
+        (str(tfidf_model.game_ids[row]), float(score))
+        for row, score in zip(rows, scores)
+        if score > 0 and tfidf_model.game_ids[row] is not None
+    ]
+
+
+def _normalized(results):
+    # Scores de cada busca em [0, 1] pelo maior valor, tornando bm25 e
+    # cosseno comparáveis
+    top = max((score for _, score in results), default=0)
+    if top <= 0:
+        return {game_id: 0.0 for game_id, _ in results}
+    return {game_id: score / top for game_id, score in results}
+
+
+def blend_results(keyword_results, semantic_results, semantic_weight=0.5, limit=None):
+    """
+    Combina os resultados da busca textual e da busca por conteúdo:
+    score = (1 - peso) * textual + peso * conteúdo, com os scores de cada
+    lista normalizados. Jogos presentes em somente uma lista recebem 0 na outra.
+    """
+    keyword_scores = _normalized(keyword_results)
+    semantic_scores = _normalized(semantic_results)
+
+    blended = [
+        (
+            game_id,
+            (1 - semantic_weight) * keyword_scores.get(game_id, 0.0)
+            + semantic_weight * semantic_scores.get(game_id, 0.0),
+        )
+        for game_id in keyword_scores.keys() | semantic_scores.keys()
+    ]
+    # Empates são desfeitos pelo id, mantendo a ordem estável
+    blended.sort(key=lambda item: (-item[1], item[0]))
+    return blended[:limit] if limit is not None else blended
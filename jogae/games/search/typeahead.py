@@ -0,0 +1,161 @@
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection
+
+from ..models import Game
+
+# Prefixos curtos casam com boa parte do catálogo, então os melhores
+# resultados deles são pré-calculados na construção
+SHORT_PREFIX_LENGTH = 2
+# Máximo de entradas percorridas por consulta nos prefixos longos
+MAX_SCAN = 2000
+# Palavras de cada título que viram entradas e tamanho máximo das chaves,
+# limitando a memória em catálogos grandes
+MAX_WORDS = 6
+KEY_LENGTH = 40
+
+SEPARATOR_PATTERN = re.compile(r'[\W_]+', re.UNICODE)
+
+
+def normalize_title(text):
+    # Sem acentos, sem diferença entre maiúsculas e minúsculas e com a
+    # pontuação trocada por espaço
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return SEPARATOR_PATTERN.sub(' ', text.casefold()).strip()
+
+
+class TitleIndex:
+    """
+    Índice de prefixos dos títulos dos jogos em memória: uma lista ordenada
+    de chaves (o título normalizado a partir de cada palavra) consultada com
+    bisect, sem acessar a base de dados a cada tecla digitada.
+
+    O índice é reconstruído em segundo plano quando um jogo muda neste
+    processo ou depois de TYPEAHEAD_REFRESH_INTERVAL segundos, enquanto a
+    versão anterior continua respondendo.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._built_at = None
+        self._dirty = False
+        self._rebuilding = False
+
+    def search(self, prefix, limit=10):
+        """
+        Retorna até 'limit' jogos [(game_id, título), ...] cujo título (ou uma
+        palavra do título) começa com 'prefix'. Títulos que começam com o
+        prefixo vêm primeiro, depois os mais bem avaliados.
+        """
+        key = normalize_title(prefix)[:KEY_LENGTH]
+        if not key:
+            return []
+        keys, entries, short_prefixes = self._get_snapshot()
+
+        if len(key) <= SHORT_PREFIX_LENGTH:
+            return short_prefixes.get(key, [])[:limit]
+
+        start = bisect_left(keys, key)
+        stop = min(bisect_left(keys, key + '\uffff'), start + MAX_SCAN)
+        return _best(entries[start:stop], limit)
+
+    def mark_dirty(self):
+        with self._lock:
+            self._dirty = True
+
+    def _get_snapshot(self):
+        with self._lock:
+            snapshot = self._snapshot
+            refresh_interval = getattr(settings, 'TYPEAHEAD_REFRESH_INTERVAL', 60)
+            stale = (
+                self._dirty
+                or self._built_at is None
+                or time.monotonic() - self._built_at >= refresh_interval
+            )
+            start_rebuild = stale and snapshot is not None and not self._rebuilding
+            if start_rebuild:
+                self._rebuilding = True
+                self._dirty = False
+
+        if snapshot is None:
+            # Primeira consulta do processo: constrói antes de responder
+            return self.rebuild()
+        if start_rebuild:
+            threading.Thread(target=self._rebuild_in_background, daemon=True).start()
+        return snapshot
+
+    def _rebuild_in_background(self):
+        try:
+            self.rebuild()
+        finally:
+            connection.close()
+            with self._lock:
+                self._rebuilding = False
+
+    def rebuild(self):
+        snapshot = build_snapshot()
+        with self._lock:
+            self._snapshot = snapshot
+            self._built_at = time.monotonic()
+        return snapshot
+
+
+def _best(entries, limit):
+    # entries: (chave, começa no título, popularidade, título, game_id)
+    ranked = sorted(entries, key=lambda entry: (not entry[1], -entry[2], entry[3]))
+    results, seen = [], set()
+    for _, _, _, title, game_id in ranked:
+        if game_id in seen:
+            continue
+        seen.add(game_id)
+        results.append((game_id, title))
+        if len(results) == limit:
+            break
+    return results
+
+
+def build_snapshot(limit=None):
+    """
+    Lê os títulos do catálogo (uma única consulta) e monta (chaves ordenadas,
+    entradas, melhores resultados dos prefixos curtos).
+    """
+    limit = limit or getattr(settings, 'TYPEAHEAD_MAX_RESULTS', 10)
+    popularity_field = 'rating_score' if settings.RATING_ORDERING == 'bayesian' else 'rating_avg'
+
+    entries = []
+    for game_id, title, popularity in Game.objects.values_list('id', 'title', popularity_field).iterator(chunk_size=5000):
+        normalized = normalize_title(title)
+        words = normalized.split(' ')
+        game_id = str(game_id)
+        # Uma entrada por palavra: 'volc' encontra 'Tiger Tank 59 I: Volcano'
+        position = 0
+        for index, word in enumerate(words[:MAX_WORDS]):
+            if word:
+                key = normalized[position:position + KEY_LENGTH]
+                entries.append((key, index == 0, popularity, title, game_id))
+            position += len(word) + 1
+    entries.sort(key=lambda entry: entry[0])
+
+    grouped = defaultdict(list)
+    for entry in entries:
+        for length in range(1, SHORT_PREFIX_LENGTH + 1):
+            if len(entry[0]) >= length:
+                grouped[entry[0][:length]].append(entry)
+    short_prefixes = {prefix: _best(group, limit) for prefix, group in grouped.items()}
+
+    return [entry[0] for entry in entries], entries, short_prefixes
+
+
+title_index = TitleIndex()
+
+
+def suggest_titles(prefix, limit=10):
+    return title_index.search(prefix, limit=limit)
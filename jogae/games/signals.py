@@ -0,0 +1,112 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from app_biblioteca.models import FavoriteGamesByUser
+from app_profile.models import Friendship
+
+from .models import Game, Genre, Rating, Tag
+from .rating_aggregates import add_rating, change_rating, remove_rating
+from .recommendation_cache import invalidate_users
+from .search import schedule_index_update
+from .search.typeahead import title_index
+from .tfidf_pipeline import schedule_incremental_update
+
+
+@receiver(post_save, sender=Game)
+@receiver(post_delete, sender=Game)
+def game_changed(sender, instance, **kwargs):
+    # Jogo criado, editado ou removido: enfileira sua linha na matriz TF-IDF
+    # e atualiza seu documento no índice de busca
+    schedule_incremental_update([instance.pk])
+    schedule_index_update([instance.pk])
+    # Títulos das sugestões de busca
+    transaction.on_commit(title_index.mark_dirty)
+
+
+@receiver(m2m_changed, sender=Game.genres.through)
+@receiver(m2m_changed, sender=Game.tags.through)
+def game_terms_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if not reverse:
+        schedule_incremental_update([instance.pk])
+        schedule_index_update([instance.pk])
+    elif pk_set:
+        # Alteração feita a partir do gênero/tag: pk_set são os jogos afetados
+        schedule_incremental_update(pk_set)
+        schedule_index_update(pk_set)
+
+
+@receiver(post_save, sender=Genre)
+@receiver(post_save, sender=Tag)
+def term_renamed(sender, instance, created, **kwargs):
+    # O nome do gênero/tag faz parte do documento (TF-IDF e busca) dos seus jogos
+    if not created:
+        game_ids = list(instance.game_set.values_list('pk', flat=True))
+        schedule_incremental_update(game_ids)
+        schedule_index_update(game_ids)
+
+
+@receiver(pre_delete, sender=Genre)
+@receiver(pre_delete, sender=Tag)
+def term_deleted(sender, instance, **kwargs):
+    # A remoção das relações em cascata não dispara m2m_changed
+    game_ids = list(instance.game_set.values_list('pk', flat=True))
+    schedule_incremental_update(game_ids)
+    schedule_index_update(game_ids)
+
+
+@receiver(m2m_changed, sender=FavoriteGamesByUser.games.through)
+def favorites_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    # Jogo salvo ou removido da biblioteca: recomendações do usuário mudam
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            invalidate_users([instance.user_id])
+    elif action in ('post_add', 'post_remove') and pk_set:
+        # Alteração feita a partir do jogo: pk_set são as bibliotecas afetadas
+        invalidate_users(
+            FavoriteGamesByUser.objects.filter(pk__in=pk_set).values_list('user_id', flat=True)
+        )
+    elif action == 'pre_clear':
+        invalidate_users(
+            FavoriteGamesByUser.objects.filter(games=instance).values_list('user_id', flat=True)
+        )
+
+
+@receiver(pre_save, sender=Rating)
+def rating_before_save(sender, instance, **kwargs):
+    # Guarda o jogo e a nota anteriores para aplicar somente a diferença nos agregados
+    instance._previous_rating = None
+    if not instance._state.adding:
+        instance._previous_rating = (
+            Rating.objects.filter(pk=instance.pk).values_list('game_id', 'rating').first()
+        )
+
+
+@receiver(post_save, sender=Rating)
+def rating_saved(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_rating', None)
+    if previous is None:
+        add_rating(instance.game_id, instance.rating)
+    else:
+        change_rating(previous[0], previous[1], instance.game_id, instance.rating)
+
+
+@receiver(post_delete, sender=Rating)
+def rating_removed(sender, instance, **kwargs):
+    remove_rating(instance.game_id, instance.rating)
+
+
+@receiver(post_save, sender=Rating)
+@receiver(post_delete, sender=Rating)
+def rating_changed(sender, instance, **kwargs):
+    # Qualquer alteração pode fazer a nota entrar ou sair das notas altas
+    invalidate_users([instance.user_id])
+
+
+@receiver(post_save, sender=Friendship)
+@receiver(post_delete, sender=Friendship)
+def friendship_changed(sender, instance, **kwargs):
+    invalidate_users([instance.from_user_id, instance.to_user_id])
@@ -0,0 +1,162 @@
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from scipy import sparse
+
+from .models import SimilarGame
+from .ranking import top_k
+
+# Linhas da matriz TF-IDF multiplicadas por vez: o produto do bloco com o
+# catálogo inteiro é o maior objeto em memória
+DEFAULT_BLOCK_SIZE = 512
+# Consultas com IN são quebradas em partes menores que o limite do SQLite
+QUERY_CHUNK_SIZE = 500
+
+
+def similar_games_top_n():
+    return getattr(settings, 'SIMILAR_GAMES_TOP_N', 10)
+
+
+def compute_neighbours(matrix, game_ids, rows, top_n, block_size=DEFAULT_BLOCK_SIZE):
+    """
+    Para cada linha em 'rows', os 'top_n' jogos mais similares pelo cosseno
+    (as linhas da matriz já são normalizadas). As linhas são multiplicadas em
+    blocos contra a transposta, assim a memória fica limitada pelo tamanho do
+    bloco e não pelo quadrado do catálogo.
+
+    Gera (linha, linhas dos vizinhos, scores) do mais para o menos similar,
+    sem o próprio jogo e sem vizinhos de score zero.
+    """
+    matrix = sparse.csr_matrix(matrix)
+    matrix_t = matrix.T.tocsr()
+    # Linhas sem jogo (removidas do catálogo) nunca são vizinhas
+    missing = np.array([game_id is None for game_id in game_ids], dtype=bool)
+    rows = np.asarray(rows, dtype=np.intp)
+
+    for start in range(0, len(rows), block_size):
+        block_rows = rows[start:start + block_size]
+        products = (matrix[block_rows] @ matrix_t).tocsr()
+
+        for local_row, row in enumerate(block_rows):
+            row_slice = slice(products.indptr[local_row], products.indptr[local_row + 1])
+            neighbours = products.indices[row_slice]
+            scores = products.data[row_slice]
+
+            keep = top_k(scores, top_n, exclude=(neighbours == row) | (scores <= 0) | missing[neighbours])
+            yield row, neighbours[keep], scores[keep]
+
+
+def _similar_game_objects(game_ids, neighbours):
+    for row, neighbour_rows, scores in neighbours:
+        game_id = game_ids[row]
+        if game_id is None:
+            continue
+        for rank, (neighbour_row, score) in enumerate(zip(neighbour_rows, scores)):
+            yield SimilarGame(
+                game_id=game_id,
+                similar_id=game_ids[neighbour_row],
+                score=float(score),
+                rank=rank,
+            )
+
+
+def rebuild_similar_games(matrix, game_ids, top_n=None, block_size=DEFAULT_BLOCK_SIZE, progress=None):
+    """
+    Recalcula as listas de jogos similares de todo o catálogo. As listas
+    antigas são trocadas pelas novas em uma única transação.
+    """
+    top_n = top_n or similar_games_top_n()
+    game_ids = [str(game_id) if game_id is not None else None for game_id in game_ids]
+    rows = np.arange(matrix.shape[0])
+
+    total = 0
+    with transaction.atomic():
+        SimilarGame.objects.all().delete()
+        for start in range(0, len(rows), block_size):
+            neighbours = compute_neighbours(matrix, game_ids, rows[start:start + block_size], top_n, block_size)
+            objects = list(_similar_game_objects(game_ids, neighbours))
+            SimilarGame.objects.bulk_create(objects, batch_size=1000)
+            total += len(objects)
+            if progress is not None:
+                progress(min(start + block_size, len(rows)))
+    return total
+
+
+def _in_chunks(values):
+    values = list(values)
+    for start in range(0, len(values), QUERY_CHUNK_SIZE):
+        yield values[start:start + QUERY_CHUNK_SIZE]
+
+
+def update_similar_games(matrix, game_ids, changed_ids, top_n=None, block_size=DEFAULT_BLOCK_SIZE):
+    """
+    Atualiza as listas após a edição, criação ou remoção dos jogos em
+    'changed_ids', sem recalcular o catálogo inteiro. São recalculadas:
+
+    - as listas dos próprios jogos alterados;
+    - as listas que apontavam para algum deles (o score mudou ou o jogo saiu);
+    - as listas em que algum deles passa a superar o último vizinho.
+
+    Retorna a quantidade de listas recalculadas.
+    """
+    top_n = top_n or similar_games_top_n()
+    game_ids = [str(game_id) if game_id is not None else None for game_id in game_ids]
+    changed_ids = {str(game_id) for game_id in changed_ids}
+    index_map = {game_id: row for row, game_id in enumerate(game_ids) if game_id is not None}
+
+    changed_rows = [index_map[game_id] for game_id in changed_ids if game_id in index_map]
+    affected = set(changed_rows)
+
+    # Listas que possuem algum dos jogos alterados como vizinho
+    for chunk in _in_chunks(changed_ids):
+        for game_id in SimilarGame.objects.filter(similar_id__in=chunk).values_list('game_id', flat=True).distinct():
+            row = index_map.get(str(game_id))
+            if row is not None:
+                affected.add(row)
+
+    if changed_rows:
+        # A similaridade é simétrica: a linha do jogo alterado contra o
+        # catálogo dá o score dele na lista de cada outro jogo
+        scores = (matrix[changed_rows] @ matrix.T).tocsr().max(axis=0).toarray().ravel()
+        candidates = [
+            row for row in np.nonzero(scores > 0)[0]
+            if row not in affected and game_ids[row] is not None
+        ]
+        # Score do último vizinho das listas completas, as incompletas aceitam qualquer score positivo
+        thresholds = {}
+        for chunk in _in_chunks(game_ids[row] for row in candidates):
+            thresholds.update(
+                (str(game_id), score)
+                for game_id, score in SimilarGame.objects.filter(
+                    game_id__in=chunk, rank=top_n - 1,
+                ).values_list('game_id', 'score')
+            )
+        affected.update(
+            row for row in candidates
+            if scores[row] > thresholds.get(game_ids[row], 0)
+        )
+
+    affected_ids = [game_ids[row] for row in affected]
+    neighbours = compute_neighbours(matrix, game_ids, sorted(affected), top_n, block_size)
+    objects = list(_similar_game_objects(game_ids, neighbours))
+
+    with transaction.atomic():
+        for chunk in _in_chunks(changed_ids | set(affected_ids)):
+            SimilarGame.objects.filter(game_id__in=chunk).delete()
+        SimilarGame.objects.bulk_create(objects, batch_size=1000)
+    return len(affected)
+
+
+def similar_games_for(game, limit=None):
+    """
+    Jogos similares pré-calculados, do mais para o menos similar, com uma
+    única consulta pelo índice (jogo, posição).
+    """
+    queryset = (
+        SimilarGame.objects.filter(game=game)
+        .select_related('similar')
+        .order_by('rank')
+    )
+    if limit is not None:
+        queryset = queryset[:limit]
+    return [similar_game.similar for similar_game in queryset]
@@ -1,3 +1,1222 @@
-from django.test import TestCase
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from scipy import sparse
+from sklearn.preprocessing import normalize
+
+from app_biblioteca.models import FavoriteGamesByUser
+from app_cadastro_usuario.models import User
+from app_profile.friend_graph import get_cache as friends_cache, get_friend_ids
+from app_profile.models import Friendship
+
+from . import recommendation_cache
+from .ann_index import LoadedANNIndex, ann_index_registry, build_index, recall_report, search_similar
+from .management.commands.precompute_tfidf import Command as PrecomputeTFIDFCommand
+from .artifact_storage import ArtifactChecksumError, delete_artifact, load_arrays, save_arrays
+from .item_similarity import build_similarity_matrix, item_similarity_registry
+from .models import Game, GameTFIDF, GameTFIDFChange, Genre, Rating, SimilarGame, Tag
+from .ranking import top_k, top_k_rows
+from .rating_aggregates import aggregate_values
+from .search import hybrid_search, search_game_ids, search_games
+from .search.semantic import blend_results, semantic_search
+from .search.typeahead import TitleIndex
+from .recommendation_cache import aget_cached_recommendations
+from .recommendation_orchestrator import aget_home_recommendations, gather_sources
+from .recommendation_utils import (
+    blend_friend_scores,
+    friend_game_scores,
+    get_collaborative_recommendations,
+    get_friend_based_recommendations,
+    most_similar_indices,
+    recommend_for_users,
+)
+from .similar_games import rebuild_similar_games
+from .tfidf_pipeline import (
+    apply_pending_updates,
+    build_tfidf,
+    change_retention,
+    count_terms,
+    counts_to_tfidf,
+    iter_game_chunks,
+    prune_changes,
+    transform_documents,
+)
+from .tfidf_artifact import load_artifact
+from .tfidf_registry import LoadedTFIDF, TFIDFRegistry, get_tfidf_model, tfidf_registry
+
+
+class DetailViewQueryCountTests(TestCase):
+    """
+    A página do jogo deve usar sempre a mesma quantidade de consultas,
+    independente da quantidade de avaliações.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.creator = User.objects.create(username='criador')
+        cls.game = Game.objects.create(user=cls.creator, title='Space Survival', description='co-op')
+        cls.game.genres.add(Genre.objects.create(name='survival'), Genre.objects.create(name='sandbox'))
+        cls.game.tags.add(Tag.objects.create(name='co-op'), Tag.objects.create(name='space'))
+
+        similar = Game.objects.create(user=cls.creator, title='Space Base', description='co-op')
+        SimilarGame.objects.create(game=cls.game, similar=similar, score=0.5, rank=0)
+
+    def add_ratings(self, count):
+        for i in range(count):
+            user = User.objects.create(username=f'avaliador{Rating.objects.count()}')
+            Rating.objects.create(game=self.game, user=user, rating=4.0, body=f'Avaliação {i}')
+
+    def test_anonymous_query_count(self):
+        # Jogo com o criador, gêneros, tags, jogos similares e avaliações com os autores
+        self.add_ratings(1)
+        with self.assertNumQueries(5):
+            response = self.client.get(self.game.get_absolute_url())
+        self.assertContains(response, 'avaliador0')
+
+        self.add_ratings(10)
+        for ordering in ('recentes', 'rating'):
+            with self.assertNumQueries(5):
+                response = self.client.get(self.game.get_absolute_url(), {'orderby': ordering})
+            self.assertContains(response, 'Avaliações (11)')
+
+    def test_query_count_does_not_grow_with_ratings(self):
+        viewer = User.objects.create(username='visitante')
+        self.client.force_login(viewer)
+        # Amigos da barra lateral já em cache nas duas requisições
+        friends_cache().clear()
+        get_friend_ids(viewer.pk)
+
+        self.add_ratings(1)
+        with CaptureQueriesContext(connection) as few_ratings:
+            self.client.get(self.game.get_absolute_url())
+
+        self.add_ratings(10)
+        with CaptureQueriesContext(connection) as many_ratings:
+            self.client.get(self.game.get_absolute_url())
+
+        self.assertEqual(len(few_ratings), len(many_ratings))
+
+
+class ReviewPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        creator = User.objects.create(username='criador')
+        cls.game = Game.objects.create(user=creator, title='Space Survival', description='co-op')
+        for i in range(7):
+            user = User.objects.create(username=f'avaliador{i}')
+            # Notas repetidas para exercitar o desempate pelo id
+            Rating.objects.create(game=cls.game, user=user, rating=float(i % 3), body=f'Avaliação {i}')
+
+    def collect_pages(self, ordering):
+        url = reverse('games:reviews', kwargs={'pk': self.game.pk})
+        ids, cursor = [], None
+        while True:
+            params = {'orderby': ordering}
+            if cursor:
+                params['cursor'] = cursor
+            # Cada página é uma única consulta das avaliações além do jogo
+            with self.assertNumQueries(2):
+                data = self.client.get(url, params).json()
+            ids += [review['id'] for review in data['results']]
+            cursor = data['next_cursor']
+            if not cursor:
+                return ids
+
+    @override_settings(REVIEWS_PAGE_SIZE=2)
+    def test_pages_follow_both_orderings(self):
+        ratings = Rating.objects.filter(game=self.game)
+        self.assertEqual(self.collect_pages('recentes'), list(ratings.order_by('-created', '-id').values_list('id', flat=True)))
+        self.assertEqual(self.collect_pages('rating'), list(ratings.order_by('-rating', '-id').values_list('id', flat=True)))
+
+    def test_invalid_cursor(self):
+        url = reverse('games:reviews', kwargs={'pk': self.game.pk})
+        self.assertEqual(self.client.get(url, {'cursor': 'inválido'}).status_code, 400)
+
+
+class RankingTests(SimpleTestCase):
+    """
+    Seleção parcial dos k maiores scores comparada com a ordenação completa
+    (score decrescente, menor índice nos empates).
+    """
+
+    def expected(self, scores, k, excluded=()):
+        scores = np.asarray(scores, dtype=float)
+        order = np.lexsort((np.arange(len(scores)), -scores))
+        return [i for i in order if np.isfinite(scores[i]) and i not in set(excluded)][:k]
+
+    def test_returns_k_items_when_many_are_excluded(self):
+        rng = np.random.default_rng(0)
+        scores = rng.random(100)
+        excluded = np.argsort(-scores)[:95]
+        result = top_k(scores, 5, exclude=excluded)
+        self.assertEqual(result.tolist(), self.expected(scores, 5, excluded))
+        # Máscara booleana equivale à lista de índices
+        mask = np.zeros(100, dtype=bool)
+        mask[excluded] = True
+        self.assertEqual(top_k(scores, 5, exclude=mask).tolist(), result.tolist())
+        # Menos candidatos que k: todos os disponíveis
+        self.assertEqual(len(top_k(scores, 10, exclude=excluded)), 5)
+        self.assertEqual(len(top_k(scores, 3, exclude=np.arange(100))), 0)
+        self.assertEqual(len(top_k(scores, 0)), 0)
+
+    def test_ties_are_broken_by_index(self):
+        rng = np.random.default_rng(1)
+        for _ in range(50):
+            # Poucos valores distintos: empates na fronteira do k-ésimo score
+            scores = rng.integers(0, 3, size=int(rng.integers(2, 500))).astype(float)
+            k = int(rng.integers(1, len(scores)))
+            expected = self.expected(scores, k)
+            self.assertEqual(top_k(scores, k).tolist(), expected)
+            self.assertEqual(top_k_rows(np.vstack([scores, scores[::-1]]), k)[0].tolist(), expected)
+        self.assertEqual(top_k(np.ones(1000), 3).tolist(), [0, 1, 2])
+
+    def test_negative_infinity(self):
+        scores = np.array([0.5, -np.inf, 2.0, -np.inf, 0.5, -1.0])
+        # -inf nunca é retornado, mesmo com k maior que os scores finitos
+        self.assertEqual(top_k(scores, 10).tolist(), [2, 0, 4, 5])
+        self.assertEqual(top_k(scores, 2, exclude=[2]).tolist(), [0, 4])
+        self.assertEqual(top_k(np.full(4, -np.inf), 2).tolist(), [])
+
+        rows = top_k_rows(np.vstack([scores, np.full(6, -np.inf), np.arange(6.0)]), 5)
+        self.assertEqual([row.tolist() for row in rows], [[2, 0, 4, 5], [], [5, 4, 3, 2, 1]])
+        self.assertEqual(top_k_rows(np.empty((0, 3)), 2), [])
+
+
+class TFIDFCatalogMixin:
+    """
+    Catálogo pequeno com a matriz TF-IDF pré-computada em um diretório de
+    artefatos temporário.
+    """
+
+    WORDS = ['space', 'survival', 'craft', 'racing', 'puzzle', 'horror', 'coop', 'pixel']
+
+    def setUp(self):
+        artifacts_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, artifacts_root, ignore_errors=True)
+        settings_override = override_settings(ARTIFACTS_ROOT=artifacts_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(tfidf_registry.clear)
+        tfidf_registry.clear()
+
+        self.creator = User.objects.create(username='criador')
+        self.genre = Genre.objects.create(name='sandbox')
+        self.games = [
+            Game.objects.create(
+                user=self.creator,
+                title=f'Jogo {i}',
+                description=' '.join(self.WORDS[j % len(self.WORDS)] for j in range(i, i + 3)),
+            )
+            for i in range(10)
+        ]
+        for game in self.games[:4]:
+            game.genres.add(self.genre)
+        call_command('precompute_tfidf', stdout=StringIO())
+
+
+class ArtifactRegistryTests(TFIDFCatalogMixin, TestCase):
+    """
+    Modelo TF-IDF mantido por processo: consulta leve da versão, recarga
+    somente quando ela muda e os contadores de hits/misses/reloads.
+    """
+
+    def test_reloads_when_the_version_changes(self):
+        registry = TFIDFRegistry(check_interval=0)
+        first = registry.get()
+        self.assertEqual(first.version[0], GameTFIDF.objects.get().pk)
+
+        # Mesma versão: somente a consulta da versão, sem recarregar
+        with self.assertNumQueries(1):
+            self.assertIs(registry.get(), first)
+
+        # Novo ajuste completo
+        call_command('precompute_tfidf', stdout=StringIO())
+        second = registry.get()
+        self.assertIsNot(second, first)
+        self.assertEqual(second.version[0], GameTFIDF.objects.get().pk)
+
+        # Atualização incremental: mesma linha com outra revisão
+        self.games[0].save()
+        apply_pending_updates()
+        third = registry.get()
+        self.assertEqual(third.version[:2], second.version[:2])
+        self.assertEqual(third.version[2], second.version[2] + 1)
+
+        self.assertEqual(registry.stats(), {
+            'hits': 1, 'misses': 1, 'reloads': 2, 'hit_ratio': 0.25, 'version': third.version,
+        })
+
+        # Sem matriz pré-computada
+        GameTFIDF.objects.all().delete()
+        self.assertIsNone(registry.get())
+        self.assertEqual(registry.stats()['misses'], 2)
+        self.assertIsNone(registry.stats()['version'])
+
+    def test_check_interval_and_invalidate(self):
+        registry = TFIDFRegistry(check_interval=3600)
+        first = registry.get()
+        call_command('precompute_tfidf', stdout=StringIO())
+
+        # Dentro do intervalo nem a versão é consultada
+        with self.assertNumQueries(0):
+            self.assertIs(registry.get(), first)
+        registry.invalidate()
+        self.assertEqual(registry.get().version[0], GameTFIDF.objects.get().pk)
+        self.assertEqual((registry.hits, registry.misses, registry.reloads), (1, 1, 1))
+
+        registry.clear()
+        self.assertIsNot(registry.get(), first)
+        self.assertEqual(registry.misses, 2)
+
+    def test_keeps_the_current_model_when_the_new_files_are_gone(self):
+        registry = TFIDFRegistry(check_interval=0)
+        first = registry.get()
+
+        # Versão nova cujos arquivos foram removidos antes da leitura
+        call_command('precompute_tfidf', stdout=StringIO())
+        newest = GameTFIDF.objects.get()
+        shutil.move(
+            os.path.join(settings.ARTIFACTS_ROOT, newest.artifact_path),
+            os.path.join(settings.ARTIFACTS_ROOT, 'movido'),
+        )
+        self.assertIs(registry.get(), first)
+
+        shutil.move(
+            os.path.join(settings.ARTIFACTS_ROOT, 'movido'),
+            os.path.join(settings.ARTIFACTS_ROOT, newest.artifact_path),
+        )
+        self.assertEqual(registry.get().version[0], newest.pk)
+
+
+class TFIDFArtifactFormatTests(TestCase):
+    """
+    Artefatos antigos: o formato 2 (matriz .npz e lista de ids na própria
+    linha) continua sendo lido, sem vocabulário.
+    """
+
+    def setUp(self):
+        tfidf_registry.clear()
+        self.addCleanup(tfidf_registry.clear)
+        matrix = normalize(sparse.random(6, 20, density=0.4, format='csr', random_state=0), norm='l2')
+        matrix.sort_indices()
+        self.matrix = matrix
+        self.game_ids = [f'jogo-{i}' for i in range(6)]
+        buffer = BytesIO()
+        sparse.save_npz(buffer, matrix)
+        self.row = GameTFIDF.objects.create(format_version=2, tfidf_matrix=buffer.getvalue(), game_ids=self.game_ids)
+
+    def test_load_format_2(self):
+        matrix, game_ids, vectorizer = load_artifact(GameTFIDF.objects.get())
+        self.assertIsInstance(matrix, sparse.csr_matrix)
+        self.assertEqual((matrix != self.matrix).nnz, 0)
+        self.assertEqual(game_ids, self.game_ids)
+        self.assertIsNone(vectorizer)
+
+        # O registro serve o modelo sem vocabulário
+        tfidf_model = get_tfidf_model()
+        self.assertIsNone(tfidf_model.vocabulary)
+        self.assertEqual(tfidf_model.game_index_map['jogo-2'], 2)
+        profile = self.matrix[0].toarray()
+        np.testing.assert_array_equal(
+            most_similar_indices(tfidf_model, profile, 3, [0]),
+            top_k(np.asarray(self.matrix @ profile.T).ravel(), 3, exclude=[0]),
+        )
+        # Sem vocabulário não há busca por conteúdo nem atualização incremental
+        self.assertEqual(semantic_search('space', limit=5), [])
+        GameTFIDFChange.objects.create(game_id=uuid.uuid4())
+        with self.assertLogs('games.tfidf_pipeline', 'WARNING'):
+            self.assertEqual(apply_pending_updates(), (None, 0))
+
+    def test_unsupported_format(self):
+        GameTFIDF.objects.filter(pk=self.row.pk).update(format_version=1)
+        with self.assertRaisesMessage(ValueError, 'precompute_tfidf'):
+            load_artifact(GameTFIDF.objects.get())
+
+
+class ArtifactStorageTests(SimpleTestCase):
+    """
+    Arrays gravados em diretórios versionados, lidos com mmap e verificados
+    pelo checksum.
+    """
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        settings_override = override_settings(ARTIFACTS_ROOT=self.root, ARTIFACTS_VERIFY_CHECKSUM=True)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.arrays = {'data': np.arange(10, dtype=np.float64), 'ids': np.array(['a', 'b'], dtype='U36')}
+
+    def test_save_and_load(self):
+        relative_path, checksum = save_arrays('teste', self.arrays)
+        self.assertTrue(relative_path.startswith('teste/v'))
+        # Nenhum diretório temporário sobra depois da gravação
+        self.assertEqual(os.listdir(os.path.join(self.root, 'teste')), [relative_path.split('/')[1]])
+
+        loaded = load_arrays(relative_path, ('data', 'ids'), checksum=checksum)
+        np.testing.assert_array_equal(loaded['data'], self.arrays['data'])
+        np.testing.assert_array_equal(loaded['ids'], self.arrays['ids'])
+        # Somente leitura, compartilhado entre os processos
+        self.assertIsInstance(loaded['data'], np.memmap)
+        self.assertFalse(loaded['data'].flags.writeable)
+
+        delete_artifact(relative_path)
+        self.assertFalse(os.path.exists(os.path.join(self.root, relative_path)))
+
+    def test_checksum_mismatch(self):
+        relative_path, checksum = save_arrays('teste', self.arrays)
+        path = os.path.join(self.root, relative_path, 'data.npy')
+        # Corrompe o último byte de dados do arquivo
+        with open(path, 'r+b') as file:
+            file.seek(-1, os.SEEK_END)
+            last = file.read(1)
+            file.seek(-1, os.SEEK_END)
+            file.write(bytes([last[0] ^ 0xFF]))
+
+        with self.assertRaises(ArtifactChecksumError):
+            load_arrays(relative_path, ('data', 'ids'), checksum=checksum)
+        # Sem verificação (ou sem checksum) o arquivo é aberto assim mesmo
+        with override_settings(ARTIFACTS_VERIFY_CHECKSUM=False):
+            load_arrays(relative_path, ('data', 'ids'), checksum=checksum)
+        load_arrays(relative_path, ('data', 'ids'))
+
+    def test_failed_save_leaves_nothing_behind(self):
+        with self.assertRaises(ValueError):
+            save_arrays('teste', {'data': self.arrays['data'], 'objetos': np.array([{}, []], dtype=object)})
+        self.assertEqual(os.listdir(os.path.join(self.root, 'teste')), [])
+
+
+class IncrementalTFIDFTests(TFIDFCatalogMixin, TestCase):
+    """
+    Jogos criados, editados e removidos entram na fila e, aplicados pelo
+    comando, deixam a matriz igual a uma reconstrução com o vocabulário ajustado.
+    """
+
+    def assert_matches_full_rebuild(self, tfidf_model):
+        # Reconstrução completa do catálogo atual com o vocabulário e o IDF do ajuste
+        counts, game_ids = count_terms(iter_game_chunks(), tfidf_model.vocabulary)
+        expected = counts_to_tfidf(counts, tfidf_model.idf)
+        self.assertEqual(sorted(tfidf_model.game_index_map), sorted(game_ids))
+        for row, game_id in enumerate(game_ids):
+            np.testing.assert_allclose(
+                tfidf_model.tfidf_matrix[tfidf_model.game_index_map[game_id]].toarray(),
+                expected[row].toarray(),
+            )
+
+    def similar_game_lists(self):
+        return {
+            (str(game_id), str(similar_id), rank)
+            for game_id, similar_id, rank in SimilarGame.objects.values_list('game_id', 'similar_id', 'rank')
+        }
+
+    def test_create_edit_delete(self):
+        base = get_tfidf_model()
+        fitted_vocabulary = list(base.vocabulary)
+        self.assertFalse(GameTFIDFChange.objects.exists())
+
+        created = Game.objects.create(user=self.creator, title='Novo', description='space survival craft pixel')
+        created.genres.add(self.genre)
+        edited = self.games[1]
+        edited.description = 'horror puzzle coop'
+        edited.save()
+        deleted = self.games[2]
+        deleted_id = deleted.pk
+        deleted.delete()
+
+        # Somente a fila muda durante as alterações
+        self.assertEqual(
+            set(GameTFIDFChange.objects.values_list('game_id', flat=True)),
+            {created.pk, edited.pk, deleted_id},
+        )
+        self.assertEqual(GameTFIDF.objects.get().revision, 0)
+
+        updated, applied = apply_pending_updates()
+        self.assertEqual(applied, 3)
+        self.assertEqual(apply_pending_updates(), (None, 0))
+
+        # O registro carrega a nova revisão mantendo o id da versão
+        tfidf_registry.invalidate()
+        tfidf_model = get_tfidf_model()
+        self.assertEqual(tfidf_model.version[0], base.version[0])
+        self.assertEqual(tfidf_model.version[2], 1)
+        self.assertEqual(list(tfidf_model.vocabulary), fitted_vocabulary)
+        self.assertIn(str(created.pk), tfidf_model.game_index_map)
+        self.assertNotIn(str(deleted_id), tfidf_model.game_index_map)
+        self.assert_matches_full_rebuild(tfidf_model)
+
+        # Listas de jogos similares iguais às de um recálculo completo
+        lists = self.similar_game_lists()
+        self.assertTrue(any(game_id == str(created.pk) for game_id, _, _ in lists))
+        self.assertFalse(any(str(deleted_id) in (game_id, similar_id) for game_id, similar_id, _ in lists))
+        rebuild_similar_games(tfidf_model.tfidf_matrix, tfidf_model.game_ids)
+        self.assertEqual(lists, self.similar_game_lists())
+
+    def test_genre_renamed_and_deleted(self):
+        genre_game_ids = {game.pk for game in self.games[:4]}
+
+        # O nome do gênero entra no documento dos seus jogos
+        self.genre.name = 'horror'
+        self.genre.save()
+        self.assertEqual(set(GameTFIDFChange.objects.values_list('game_id', flat=True)), genre_game_ids)
+        self.assertEqual(apply_pending_updates()[1], 4)
+        tfidf_registry.invalidate()
+        self.assert_matches_full_rebuild(get_tfidf_model())
+
+        GameTFIDFChange.objects.all().delete()
+        self.genre.delete()
+        self.assertEqual(set(GameTFIDFChange.objects.values_list('game_id', flat=True)), genre_game_ids)
+        apply_pending_updates()
+        tfidf_registry.invalidate()
+        self.assert_matches_full_rebuild(get_tfidf_model())
+
+    def test_applied_changes_leave_the_queue_after_the_retention(self):
+        self.games[1].save()
+        apply_pending_updates()
+        # Ainda dentro do período em que um ajuste completo pode precisar delas
+        self.assertEqual(GameTFIDFChange.objects.count(), 1)
+
+        self.games[2].save()
+        with override_settings(TFIDF_CHANGE_RETENTION=0):
+            apply_pending_updates()
+        self.assertFalse(GameTFIDFChange.objects.exists())
+
+        # Alterações ainda não aplicadas nunca são removidas
+        self.games[3].save()
+        with override_settings(TFIDF_CHANGE_RETENTION=0):
+            prune_changes(GameTFIDF.objects.get().last_change_id, older_than=change_retention())
+        self.assertEqual(GameTFIDFChange.objects.count(), 1)
+
+    def test_refit_reapplies_changes_made_during_the_refit(self):
+        edited = self.games[3]
+
+        def build_then_edit(*args, **kwargs):
+            # O jogo é editado (e aplicado no artefato antigo) depois que o
+            # ajuste completo já leu o catálogo
+            result = build_tfidf(*args, **kwargs)
+            edited.description = 'racing racing pixel'
+            edited.save()
+            apply_pending_updates()
+            return result
+
+        with mock.patch('games.management.commands.precompute_tfidf.build_tfidf', side_effect=build_then_edit):
+            call_command('precompute_tfidf', stdout=StringIO())
+
+        tfidf_registry.invalidate()
+        self.assert_matches_full_rebuild(get_tfidf_model())
+
+
+class SearchIndexTests(TestCase):
+    """
+    Índice FTS5 da busca: ordenação pelo bm25 e sincronização com os jogos,
+    gêneros e tags pelos sinais.
+    """
+
+    def setUp(self):
+        self.creator = User.objects.create(username='criador')
+
+    def create_game(self, title, description):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Game.objects.create(user=self.creator, title=title, description=description)
+
+    def test_bm25_ordering(self):
+        in_description = self.create_game('Estação', 'base no space com horror')
+        in_title = self.create_game('Space Colony', 'construção de colônias')
+        in_both = self.create_game('Space Horror', 'sobreviva ao horror no space')
+        only_horror = self.create_game('Mansão', 'horror')
+        # Sem outros jogos o IDF das palavras buscadas seria quase zero
+        for i in range(10):
+            self.create_game(f'Corrida {i}', 'carros e pistas')
+
+        # O título pesa mais que a descrição
+        results = search_game_ids('space')
+        self.assertEqual(set(results), {str(in_description.pk), str(in_title.pk), str(in_both.pk)})
+        self.assertLess(results.index(str(in_title.pk)), results.index(str(in_description.pk)))
+        scores = dict(search_games('space'))
+        self.assertEqual(sorted(scores.values(), reverse=True), list(scores.values()))
+
+        # Primeiro os jogos com todas as palavras, depois os com alguma delas
+        results = search_game_ids('space horror')
+        self.assertEqual(set(results[:2]), {str(in_both.pk), str(in_description.pk)})
+        self.assertEqual(set(results[2:]), {str(in_title.pk), str(only_horror.pk)})
+        self.assertEqual(search_game_ids('space horror', limit=2), results[:2])
+
+        # Uma palavra só: a consulta com OR seria igual à com AND
+        with self.assertNumQueries(1):
+            search_game_ids('spa')
+
+    def test_index_follows_game_and_term_changes(self):
+        game = self.create_game('Space Colony', 'construção de colônias')
+        self.assertEqual(search_game_ids('colony'), [str(game.pk)])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            game.title = 'Ocean Colony'
+            game.save()
+        self.assertEqual(search_game_ids('space'), [])
+        self.assertEqual(search_game_ids('ocean'), [str(game.pk)])
+
+        genre = Genre.objects.create(name='estratégia')
+        tag = Tag.objects.create(name='multiplayer')
+        with self.captureOnCommitCallbacks(execute=True):
+            game.genres.add(genre)
+            tag.game_set.add(game)
+        self.assertEqual(search_game_ids('estrategia'), [str(game.pk)])
+        self.assertEqual(search_game_ids('multiplayer'), [str(game.pk)])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            genre.name = 'simulação'
+            genre.save()
+            tag.delete()
+        self.assertEqual(search_game_ids('estrategia'), [])
+        self.assertEqual(search_game_ids('simulacao'), [str(game.pk)])
+        self.assertEqual(search_game_ids('multiplayer'), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            game.genres.clear()
+        self.assertEqual(search_game_ids('simulacao'), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            game.delete()
+        self.assertEqual(search_game_ids('ocean'), [])
+
+    def test_rebuild_search_index(self):
+        games = [self.create_game(f'Space {i}', 'colônia') for i in range(5)]
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM games_search_index')
+        self.assertEqual(search_game_ids('space'), [])
+
+        stdout = StringIO()
+        call_command('rebuild_search_index', '--chunk-size', '2', stdout=stdout)
+        self.assertIn('5 jogos no índice de busca', stdout.getvalue())
+        self.assertEqual(sorted(search_game_ids('space')), sorted(str(game.pk) for game in games))
+
+
+@override_settings(RATING_ORDERING='average', TYPEAHEAD_MAX_RESULTS=10, TYPEAHEAD_REFRESH_INTERVAL=3600)
+class TypeaheadTests(TestCase):
+    """
+    Sugestões de títulos respondidas pelo índice de prefixos em memória.
+    """
+
+    def setUp(self):
+        creator = User.objects.create(username='criador')
+        titles = {
+            'Volcano Rush': 1.0,
+            'Volleyball Stars': 3.0,
+            'Tiger Tank 59 I: Volcano': 5.0,
+            'Évolution': 4.0,
+            'Space Colony': 2.0,
+        }
+        self.games = {}
+        for title, popularity in titles.items():
+            game = Game.objects.create(user=creator, title=title, description='co-op')
+            Game.objects.filter(pk=game.pk).update(rating_avg=popularity)
+            self.games[title] = str(game.pk)
+        self.index = TitleIndex()
+
+    def titles(self, prefix, limit=10):
+        return [title for _, title in self.index.search(prefix, limit=limit)]
+
+    def test_prefix_and_word_start_matches(self):
+        # Títulos que começam com o prefixo primeiro, depois os mais bem avaliados
+        self.assertEqual(self.titles('vol'), ['Volleyball Stars', 'Volcano Rush', 'Tiger Tank 59 I: Volcano'])
+        self.assertEqual(self.titles('VOLC'), ['Volcano Rush', 'Tiger Tank 59 I: Volcano'])
+        # Início de qualquer palavra, inclusive com pontuação no meio
+        self.assertEqual(self.titles('tank 59 i vol'), ['Tiger Tank 59 I: Volcano'])
+        # Sem acentos e sem casar no meio de uma palavra
+        self.assertEqual(self.titles('evo'), ['Évolution'])
+        self.assertEqual(self.titles('olution'), [])
+        self.assertEqual(self.index.search('space')[0], (self.games['Space Colony'], 'Space Colony'))
+
+    def test_short_prefixes_and_limit(self):
+        # Prefixos de até SHORT_PREFIX_LENGTH letras vêm pré-calculados
+        self.assertEqual(self.titles('v'), ['Volleyball Stars', 'Volcano Rush', 'Tiger Tank 59 I: Volcano'])
+        self.assertEqual(self.titles('vo', limit=2), ['Volleyball Stars', 'Volcano Rush'])
+        self.assertEqual(self.titles('vol', limit=1), ['Volleyball Stars'])
+        # Sem letras ou números não há prefixo
+        self.assertEqual(self.titles(''), [])
+        self.assertEqual(self.titles(' :! '), [])
+
+    @override_settings(TYPEAHEAD_MAX_RESULTS=2)
+    def test_view_clamps_the_limit(self):
+        url = reverse('games:typeahead')
+        with mock.patch('games.views.suggest_titles', side_effect=self.index.search) as suggest:
+            for limit, expected in (('50', 2), ('0', 1), ('-3', 1), ('abc', 2), ('1', 1)):
+                data = self.client.get(url, {'q': 'vol', 'limit': limit}).json()
+                self.assertEqual(suggest.call_args.kwargs['limit'], expected)
+                self.assertEqual(len(data['results']), expected)
+        self.assertEqual(data['results'][0]['url'], reverse('games:detail', kwargs={'pk': self.games['Volleyball Stars']}))
+
+    def test_rebuilds_when_marked_dirty(self):
+        self.assertEqual(self.titles('space'), ['Space Colony'])
+        with self.captureOnCommitCallbacks(execute=True):
+            Game.objects.create(user=User.objects.get(username='criador'), title='Space Base', description='co-op')
+        # O sinal marca o índice global; este índice é marcado diretamente
+        self.index.mark_dirty()
+
+        # A reconstrução roda em segundo plano enquanto a versão anterior responde
+        with mock.patch('games.search.typeahead.threading.Thread') as thread:
+            thread.return_value.start.side_effect = lambda: thread.call_args.kwargs['target']()
+            self.assertEqual(self.titles('space'), ['Space Colony'])
+        thread.assert_called_once()
+        self.assertEqual(self.titles('space'), ['Space Colony', 'Space Base'])
+
+        # Sem alterações a versão atual continua sendo usada
+        with mock.patch('games.search.typeahead.threading.Thread') as thread:
+            self.titles('space')
+        thread.assert_not_called()
+
+
+class SemanticSearchTests(TFIDFCatalogMixin, TestCase):
+    """
+    Busca por conteúdo no espaço TF-IDF e a combinação com a busca textual.
+    """
+
+    def expected_semantic(self, query, limit):
+        # Cosseno do texto transformado com todas as linhas da matriz
+        tfidf_model = get_tfidf_model()
+        query_vector = transform_documents([query], tfidf_model.vocabulary, tfidf_model.idf)
+        scores = (tfidf_model.tfidf_matrix @ query_vector.T).toarray().ravel()
+        return [(str(tfidf_model.game_ids[row]), scores[row]) for row in top_k(scores, limit) if scores[row] > 0]
+
+    def assert_results_equal(self, results, expected):
+        self.assertEqual([game_id for game_id, _ in results], [game_id for game_id, _ in expected])
+        np.testing.assert_allclose([score for _, score in results], [score for _, score in expected])
+
+    def test_semantic_search(self):
+        for query in ('space survival', 'Horror!', 'pixel coop racing'):
+            results = semantic_search(query, limit=4)
+            self.assertTrue(results)
+            self.assert_results_equal(results, self.expected_semantic(query, 4))
+
+        # Somente jogos com alguma palavra em comum
+        results = semantic_search('space', limit=10)
+        self.assertEqual(len(results), len(self.expected_semantic('space', 10)))
+        self.assertLess(len(results), len(self.games))
+
+    def test_semantic_search_without_matches(self):
+        self.assertEqual(semantic_search('', limit=5), [])
+        self.assertEqual(semantic_search('   ', limit=5), [])
+        # Palavras fora do vocabulário do ajuste
+        self.assertEqual(semantic_search('zeppelin quixotic', limit=5), [])
+
+        GameTFIDF.objects.all().delete()
+        tfidf_registry.clear()
+        self.assertEqual(semantic_search('space', limit=5), [])
+
+    def test_blend_weights(self):
+        keyword = [('a', 10.0), ('b', 5.0)]
+        semantic = [('b', 0.8), ('c', 0.4)]
+
+        # Scores de cada lista divididos pelo maior: a = (1, 0), b = (0.5, 1), c = (0, 0.5)
+        self.assert_results_equal(blend_results(keyword, semantic, 0.5), [('b', 0.75), ('a', 0.5), ('c', 0.25)])
+        self.assert_results_equal(blend_results(keyword, semantic, 0.2), [('a', 0.8), ('b', 0.6), ('c', 0.1)])
+        self.assert_results_equal(blend_results(keyword, semantic, 0.0, limit=2), [('a', 1.0), ('b', 0.5)])
+        self.assert_results_equal(blend_results(keyword, semantic, 1.0), [('b', 1.0), ('c', 0.5), ('a', 0.0)])
+        # Empates desfeitos pelo id e listas vazias ou sem score positivo
+        self.assert_results_equal(blend_results([('y', 2.0), ('x', 2.0)], [], 0.5), [('x', 0.5), ('y', 0.5)])
+        self.assert_results_equal(blend_results([], [('x', 0.0)], 0.5), [('x', 0.0)])
+        self.assertEqual(blend_results([], [], 0.5), [])
+
+    def test_hybrid_search(self):
+        call_command('rebuild_search_index', stdout=StringIO())
+        query = 'space survival'
+        self.assertTrue(search_games(query, limit=5) and semantic_search(query, limit=5))
+
+        with override_settings(GAME_SEARCH_SEMANTIC_WEIGHT=0.3):
+            self.assert_results_equal(
+                hybrid_search(query, limit=5),
+                blend_results(search_games(query, limit=5), semantic_search(query, limit=5), 0.3, limit=5),
+            )
+
+        # Com peso 0 ou 1 somente uma das buscas é executada
+        with mock.patch('games.search.semantic_search') as semantic:
+            results = hybrid_search(query, limit=5, semantic_weight=0)
+        semantic.assert_not_called()
+        self.assert_results_equal(results, blend_results(search_games(query, limit=5), [], 0, limit=5))
+
+        with mock.patch('games.search.search_games') as keyword:
+            results = hybrid_search(query, limit=5, semantic_weight=1)
+        keyword.assert_not_called()
+        self.assert_results_equal(results, blend_results([], semantic_search(query, limit=5), 1, limit=5))
+
+
+class RecommendationCacheTests(TestCase):
+
+    def setUp(self):
+        self.cache = recommendation_cache.get_cache()
+        self.cache.clear()
+        self.addCleanup(self.cache.clear)
+        self.user = User.objects.create(username='jogador')
+
+    def cached(self, items):
+        found, _, token = recommendation_cache.lookup(self.user)
+        self.assertFalse(found)
+        recommendation_cache.store(self.user, token, items)
+
+    def test_hit_until_invalidated(self):
+        self.cached([('jogo', 0.5)])
+        self.assertEqual(recommendation_cache.lookup(self.user)[:2], (True, [('jogo', 0.5)]))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            recommendation_cache.invalidate_users([self.user.pk])
+        self.assertFalse(recommendation_cache.lookup(self.user)[0])
+
+    def test_evicted_generation_is_a_miss(self):
+        self.cached([('jogo', 0.5)])
+        # Entrada que um cálculo concorrente com uma invalidação gravaria
+        self.cache.set(recommendation_cache._entry_key(self.user.pk, '0'), {'tfidf_version': None, 'items': []})
+
+        # Geração descartada pelo limite de entradas do LocMemCache
+        self.cache.delete(recommendation_cache._generation_key(self.user.pk))
+        self.assertFalse(recommendation_cache.lookup(self.user)[0])
+
+
+@override_settings(RECOMMENDATION_SOURCE_BUDGETS={'friends': 0.05})
+class RecommendationSourceBudgetTests(TestCase):
+    """
+    Fontes da página inicial que excedem o orçamento de tempo são descartadas
+    e o resultado incompleto não é guardado em cache.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        creator = User.objects.create(username='criador')
+        cls.games = [Game.objects.create(user=creator, title=f'Jogo {i}', description='co-op') for i in range(4)]
+        cls.user = User.objects.create(username='jogador')
+        FavoriteGamesByUser.objects.create(user=cls.user).games.add(cls.games[0])
+
+    def setUp(self):
+        cache = recommendation_cache.get_cache()
+        cache.clear()
+        self.addCleanup(cache.clear)
+        # Libera a thread da fonte lenta, que continua depois de descartada
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+
+    def sources(self, slow_friends, broken=False):
+        # Fontes sem acesso à base de dados, já que rodam em threads próprias
+        def friends(user, user_favorites):
+            if slow_friends:
+                self.release.wait(5)
+            return [(self.games[1], 2.0)]
+
+        sources = {
+            'rating': lambda user, user_favorites: [],
+            'content': lambda user, user_favorites: ([], None),
+            'friends': friends,
+            'collaborative': lambda user, user_favorites: [self.games[2]],
+        }
+        if broken:
+            sources['broken'] = lambda user, user_favorites: 1 / 0
+        return mock.patch.dict('games.recommendation_orchestrator.SOURCES', sources, clear=True)
+
+    async def test_slow_source_is_dropped(self):
+        with self.sources(slow_friends=True, broken=True), \
+                self.assertLogs('games.recommendation_orchestrator', 'WARNING') as logs:
+            started = time.perf_counter()
+            collected, dropped = await gather_sources(self.user, [self.games[0]])
+        # Não espera a fonte lenta além do orçamento dela (0.5s das demais)
+        self.assertLess(time.perf_counter() - started, 1.0)
+        self.assertEqual(sorted(dropped), ['broken', 'friends'])
+        self.assertEqual(collected, {'rating': [], 'content': ([], None), 'collaborative': [self.games[2]]})
+        self.assertTrue(any("'friends' excedeu o tempo" in line for line in logs.output))
+
+    async def test_incomplete_result_is_not_cached(self):
+        with self.sources(slow_friends=True), self.assertLogs('games.recommendation_orchestrator', 'WARNING'):
+            items = await aget_cached_recommendations(self.user, aget_home_recommendations)
+        # Lista montada com as demais fontes e completada com jogos populares
+        game_ids = [game_id for game_id, _ in items]
+        self.assertEqual(game_ids[0], str(self.games[2].pk))
+        self.assertNotIn(str(self.games[0].pk), game_ids)
+        self.assertFalse((await sync_to_async(recommendation_cache.lookup)(self.user))[0])
+
+        with self.sources(slow_friends=False):
+            items = await aget_cached_recommendations(self.user, aget_home_recommendations)
+        # Resultado completo: amigos primeiro pelo score e guardado em cache
+        self.assertEqual([game_id for game_id, _ in items][:2], [str(self.games[1].pk), str(self.games[2].pk)])
+        found, cached_items, _ = await sync_to_async(recommendation_cache.lookup)(self.user)
+        self.assertTrue(found)
+        self.assertEqual(cached_items, items)
+
+
+class ParallelTFIDFBuildTests(TFIDFCatalogMixin, TestCase):
+    """
+    A construção em faixas de pk em paralelo deve ser idêntica à serial.
+    """
+
+    def test_parallel_build_matches_serial(self):
+        # Blocos menores que as faixas para exercitar a paginação dentro delas
+        serial = build_tfidf(chunk_size=3)
+        for workers in (2, 3):
+            parallel = build_tfidf(chunk_size=3, workers=workers)
+            self.assertTrue(PrecomputeTFIDFCommand.same_result(serial, parallel), msg=f'workers={workers}')
+            self.assertEqual(list(parallel[1]), sorted(str(game.pk) for game in self.games))
+
+
+class RecommendForUsersTests(TFIDFCatalogMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.favorites = {}
+        for name, games in (('dois', self.games[:2]), ('um', self.games[5:6]), ('vazio', []), ('outro', self.games[7:10])):
+            user = User.objects.create(username=name)
+            FavoriteGamesByUser.objects.create(user=user).games.set(games)
+            self.favorites[user.pk] = games
+        self.without_library = User.objects.create(username='sem_biblioteca')
+
+    def expected(self, games, k):
+        # Perfil e top-k de um usuário por vez
+        tfidf_model = get_tfidf_model()
+        rows = [tfidf_model.game_index_map[str(game.pk)] for game in games]
+        profile = normalize(tfidf_model.tfidf_matrix[rows].sum(axis=0).A, norm='l2')
+        scores = tfidf_model.similarities(profile)
+        return [(str(tfidf_model.game_ids[i]), scores[i]) for i in top_k(scores, k, exclude=rows)]
+
+    def test_blocks_match_single_user_results(self):
+        user_ids = list(self.favorites) + [self.without_library.pk]
+        # 10 jogos e 30 células: blocos de 3 usuários para 5 usuários
+        for max_block_cells in (30, 2 ** 24):
+            recommendations = recommend_for_users(user_ids, k=3, max_block_cells=max_block_cells)
+            self.assertEqual(set(recommendations), set(user_ids))
+            self.assertEqual(recommendations[self.without_library.pk], [])
+
+            for user_id, games in self.favorites.items():
+                if not games:
+                    self.assertEqual(recommendations[user_id], [])
+                    continue
+                expected = self.expected(games, 3)
+                self.assertEqual([game_id for game_id, _ in recommendations[user_id]], [game_id for game_id, _ in expected])
+                np.testing.assert_allclose([score for _, score in recommendations[user_id]], [score for _, score in expected])
+                # Favoritos nunca são recomendados
+                self.assertFalse({str(game.pk) for game in games} & {game_id for game_id, _ in recommendations[user_id]})
+
+    def test_export_command(self):
+        stdout = StringIO()
+        call_command('export_content_recommendations', '--k', '2', '--batch-size', '2', stdout=stdout, stderr=StringIO())
+        lines = [json.loads(line) for line in stdout.getvalue().splitlines()]
+        # Somente usuários com jogos favoritos
+        self.assertEqual(
+            sorted(line['user_id'] for line in lines),
+            sorted(user_id for user_id, games in self.favorites.items() if games),
+        )
+        self.assertTrue(all(len(line['games']) == 2 for line in lines))
+
+
+class FriendRecommendationTests(TestCase):
+    """
+    Jogos salvos pelos amigos, cada amigo somando nota / 2.5 (ou 1 sem nota),
+    e a combinação desse score com a similaridade da página inicial.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        creator = User.objects.create(username='criador')
+        cls.games = [Game.objects.create(user=creator, title=f'Jogo {i}', description='co-op') for i in range(6)]
+        cls.viewer = User.objects.create(username='jogador')
+        first_friend = User.objects.create(username='amigo1')
+        second_friend = User.objects.create(username='amigo2')
+        pending_friend = User.objects.create(username='pendente')
+        Friendship.objects.create(from_user=cls.viewer, to_user=first_friend, status=Friendship.Status.ACCEPTED)
+        Friendship.objects.create(from_user=second_friend, to_user=cls.viewer, status=Friendship.Status.ACCEPTED)
+        Friendship.objects.create(from_user=cls.viewer, to_user=pending_friend, status=Friendship.Status.PENDING)
+
+        g = cls.games
+        cls.favorite(cls.viewer, g[3])
+        cls.favorite(first_friend, g[0], g[1], g[3])
+        cls.favorite(second_friend, g[0], g[1], g[2])
+        cls.favorite(pending_friend, g[4])
+        Rating.objects.create(game=g[0], user=first_friend, rating=5.0)
+        Rating.objects.create(game=g[0], user=second_friend, rating=1.0)
+        Rating.objects.create(game=g[1], user=second_friend, rating=5.0)
+        # Notas do próprio usuário não entram no score dos amigos
+        Rating.objects.create(game=g[1], user=cls.viewer, rating=0.0)
+        # Nota sem o jogo salvo não conta
+        Rating.objects.create(game=g[5], user=first_friend, rating=5.0)
+
+    @staticmethod
+    def favorite(user, *games):
+        FavoriteGamesByUser.objects.create(user=user).games.add(*games)
+
+    def setUp(self):
+        friends_cache().clear()
+        self.addCleanup(friends_cache().clear)
+
+    def test_friend_game_scores(self):
+        g = self.games
+        # g1: 1 (sem nota) + 5 / 2.5; g0: 5 / 2.5 + 1 / 2.5; g2: 1 (sem nota).
+        # O favorito do usuário (g3) e os jogos de quem não é amigo (g4) ficam de fora
+        expected = [(str(g[1].pk), 3.0), (str(g[0].pk), 2.4), (str(g[2].pk), 1.0)]
+        scores = friend_game_scores(self.viewer, num_recommendations=10)
+        self.assertEqual([game_id for game_id, _ in scores], [game_id for game_id, _ in expected])
+        for (_, score), (_, expected_score) in zip(scores, expected):
+            self.assertAlmostEqual(score, expected_score)
+
+        self.assertEqual([game_id for game_id, _ in friend_game_scores(self.viewer, 2)], [str(g[1].pk), str(g[0].pk)])
+        self.assertEqual(friend_game_scores(User.objects.get(username='pendente')), [])
+
+        recommendations = get_friend_based_recommendations(self.viewer, 2, return_scores=True)
+        self.assertEqual([game for game, _ in recommendations], [g[1], g[0]])
+
+    @override_settings(FRIEND_RECOMMENDATION_WEIGHT=0.3)
+    def test_blend_friend_scores(self):
+        g = self.games
+        games = [(g[0], 0.9), (g[1], 0.8), (g[2], None), (g[3], 0.7)]
+        friend_scores = {str(g[1].pk): 3.0, str(g[2].pk): 3.0, str(g[3].pk): 1.5}
+
+        # g0: 0.9 / 0.9; g1: 0.8 / 0.9 + 0.3 * 3 / 3; g2: 0.3; g3: 0.7 / 0.9 + 0.3 * 1.5 / 3
+        self.assertEqual(blend_friend_scores(games, friend_scores), [games[1], games[0], games[3], games[2]])
+        # O score retornado continua sendo a similaridade
+        self.assertEqual(blend_friend_scores(games, {}), games)
+
+        # Sem peso dos amigos somente a similaridade ordena (sem score conta como 0)
+        with override_settings(FRIEND_RECOMMENDATION_WEIGHT=0):
+            self.assertEqual(blend_friend_scores(games, friend_scores), [games[0], games[1], games[3], games[2]])
+
+
+class ItemSimilarityTests(TestCase):
+    """
+    Similaridade item-item comparada com a co-ocorrência calculada por força
+    bruta sobre conjuntos de usuários de cada jogo.
+    """
+
+    def brute_force_similarity(self, users_by_game, num_games):
+        similarity = np.zeros((num_games, num_games))
+        for first in range(num_games):
+            for second in range(num_games):
+                common = len(users_by_game[first] & users_by_game[second])
+                if first != second and common:
+                    similarity[first, second] = common / np.sqrt(len(users_by_game[first]) * len(users_by_game[second]))
+        return similarity
+
+    def test_build_similarity_matrix(self):
+        rng = np.random.default_rng(0)
+        interactions = sparse.csr_matrix((rng.random((40, 15)) < 0.25).astype(float))
+        users_by_game = [set(np.nonzero(interactions[:, game].toarray().ravel())[0]) for game in range(15)]
+        expected = self.brute_force_similarity(users_by_game, 15)
+
+        for top_n in (3, 50):
+            similarity = build_similarity_matrix(interactions, top_n=top_n, block_size=4)
+            for game in range(15):
+                row = similarity[game]
+                # O próprio jogo nunca é vizinho
+                self.assertNotIn(game, row.indices)
+                np.testing.assert_allclose(row.data, expected[game, row.indices])
+                # Somente os top_n maiores (empates podem escolher qualquer um)
+                candidates = np.sort(expected[game][expected[game] > 0])[::-1]
+                np.testing.assert_allclose(np.sort(row.data)[::-1], candidates[:top_n])
+
+    def test_collaborative_recommendations(self):
+        artifacts_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, artifacts_root, ignore_errors=True)
+        settings_override = override_settings(ARTIFACTS_ROOT=artifacts_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        item_similarity_registry.clear()
+        self.addCleanup(item_similarity_registry.clear)
+
+        creator = User.objects.create(username='criador')
+        games = [Game.objects.create(user=creator, title=f'Jogo {i}', description='co-op') for i in range(8)]
+        users = [User.objects.create(username=f'jogador{i}') for i in range(6)]
+        rng = np.random.default_rng(1)
+        users_by_game = [set() for _ in games]
+        for user_index, user in enumerate(users):
+            favorites = rng.choice(len(games), 3, replace=False)
+            FavoriteGamesByUser.objects.create(user=user).games.add(*[games[i] for i in favorites])
+            interacted = set(favorites.tolist())
+            # Notas altas contam como interação, notas baixas não
+            rated = int(rng.integers(len(games)))
+            Rating.objects.create(game=games[rated], user=user, rating=5.0)
+            interacted.add(rated)
+            low = next(i for i in range(len(games)) if i not in interacted)
+            Rating.objects.create(game=games[low], user=user, rating=2.0)
+            for game_index in interacted:
+                users_by_game[game_index].add(user_index)
+
+        # A matriz usa a ordem dos jogos por pk
+        ordered = sorted(range(len(games)), key=lambda i: str(games[i].pk))
+        call_command('build_item_similarity', stdout=StringIO())
+        model = item_similarity_registry.get()
+        expected = self.brute_force_similarity(users_by_game, len(games))
+        np.testing.assert_allclose(model.similarity_matrix.toarray(), expected[np.ix_(ordered, ordered)])
+
+        viewer = users[0]
+        favorite_indices = [games.index(game) for game in viewer.favoritegamesbyuser.games.all()]
+        scores = expected[favorite_indices].sum(axis=0)
+        scores[favorite_indices] = 0
+        recommended = get_collaborative_recommendations(viewer, num_recommendations=3)
+        recommended_scores = [scores[games.index(game)] for game in recommended]
+        self.assertEqual(len(recommended), min(3, int((scores > 0).sum())))
+        self.assertTrue(all(score > 0 for score in recommended_scores))
+        self.assertEqual(recommended_scores, sorted(recommended_scores, reverse=True))
+        # Nenhum jogo fora da lista tem score maior que o último recomendado
+        others = [scores[i] for i in range(len(games)) if games[i] not in recommended]
+        self.assertLessEqual(max(others), recommended_scores[-1] + 1e-12)
+
+
+class RatingAggregateTests(TestCase):
+    """
+    Os agregados das notas de cada jogo são mantidos pelos sinais de Rating.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        creator = User.objects.create(username='criador')
+        cls.game = Game.objects.create(user=creator, title='Space Survival', description='co-op')
+        cls.other_game = Game.objects.create(user=creator, title='Space Base', description='co-op')
+        cls.users = [User.objects.create(username=f'avaliador{i}') for i in range(2)]
+
+    def assert_aggregates(self, game, total, count):
+        game.refresh_from_db()
+        for field, value in aggregate_values(total, count).items():
+            self.assertAlmostEqual(getattr(game, field), value, msg=field)
+
+    def test_signals_keep_aggregates(self):
+        first = Rating.objects.create(game=self.game, user=self.users[0], rating=4.0)
+        Rating.objects.create(game=self.game, user=self.users[1], rating=2.0)
+        self.assert_aggregates(self.game, 6.0, 2)
+
+        # Nota editada
+        first.rating = 5.0
+        first.save()
+        self.assert_aggregates(self.game, 7.0, 2)
+
+        # Nota movida para outro jogo
+        first.game = self.other_game
+        first.save()
+        self.assert_aggregates(self.game, 2.0, 1)
+        self.assert_aggregates(self.other_game, 5.0, 1)
+
+        # Nota removida: sem notas o jogo volta ao score da média a priori
+        first.delete()
+        self.assert_aggregates(self.other_game, 0.0, 0)
+        self.assertEqual(self.other_game.rating_score, aggregate_values(0, 0)['rating_score'])
+
+    def test_verify_detects_drift(self):
+        Rating.objects.create(game=self.game, user=self.users[0], rating=4.0)
+        call_command('rebuild_rating_aggregates', '--verify', stdout=StringIO())
+
+        Game.objects.filter(pk=self.game.pk).update(rating_count=3)
+        Game.objects.filter(pk=self.other_game.pk).update(rating_avg=1.0)
+        stdout = StringIO()
+        # Notas agregadas e jogos, sem consultas por jogo divergente
+        with self.assertNumQueries(2), self.assertRaises(CommandError):
+            call_command('rebuild_rating_aggregates', '--verify', stdout=stdout)
+        self.assertIn('Space Survival: armazenado 3 notas', stdout.getvalue())
+        self.assertIn('Space Base: armazenado 0 notas', stdout.getvalue())
+
+        call_command('rebuild_rating_aggregates', stdout=StringIO())
+        self.assert_aggregates(self.game, 4.0, 1)
+        self.assert_aggregates(self.other_game, 0.0, 0)
+        call_command('rebuild_rating_aggregates', '--verify', stdout=StringIO())
+
+    def test_saving_a_stale_game_keeps_aggregates(self):
+        # Instância carregada antes da nota, como em um formulário aberto
+        stale = Game.objects.get(pk=self.game.pk)
+        Rating.objects.create(game=self.game, user=self.users[0], rating=4.0)
+
+        stale.title = 'Space Survival 2'
+        stale.save()
+        stale.save(update_fields=['title', 'rating_count'])
+        self.assert_aggregates(stale, 4.0, 1)
+        self.assertEqual(stale.title, 'Space Survival 2')
+
+        # Instância com campos adiados continua gravando só os carregados
+        partial = Game.objects.only('pk', 'description').get(pk=self.game.pk)
+        partial.description = 'sobrevivência'
+        with CaptureQueriesContext(connection) as queries:
+            partial.save()
+        updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE "games_game"')]
+        self.assertEqual(len(updates), 1)
+        self.assertNotIn('"title"', updates[0])
+        self.assertNotIn('"rating_', updates[0])
+        self.assert_aggregates(partial, 4.0, 1)
+        self.assertEqual(partial.title, 'Space Survival 2')
+
+
+@override_settings(ANN_INDEX_ENABLED=True, ANN_MIN_CATALOG_SIZE=0, ANN_NPROBE=8)
+class ANNIndexTests(TestCase):
+    """
+    Índice IVF sobre uma matriz sintética com jogos agrupados por assunto.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        rng = np.random.default_rng(0)
+        num_games, num_topics, vocabulary_size = 2000, 20, 400
+        rows, cols = [], []
+        for row in range(num_games):
+            topic = rng.integers(num_topics)
+            # Termos do assunto do jogo mais alguns termos quaisquer
+            terms = np.concatenate([
+                rng.choice(np.arange(topic * 15, topic * 15 + 15), 6, replace=False),
+                rng.choice(vocabulary_size, 2, replace=False),
+            ])
+            rows += [row] * len(terms)
+            cols += terms.tolist()
+        matrix = sparse.csr_matrix((rng.random(len(rows)) + 0.1, (rows, cols)), shape=(num_games, vocabulary_size))
+        matrix.sum_duplicates()
+
+        cls.tfidf_model = LoadedTFIDF(
+            version=(1, None, 0),
+            tfidf_matrix=normalize(matrix, norm='l2'),
+            game_ids=np.array([f'jogo-{row}' for row in range(num_games)]),
+            vocabulary=np.array([f'termo{i}' for i in range(vocabulary_size)]),
+            idf=np.ones(vocabulary_size),
+        )
+        arrays = build_index(cls.tfidf_model.tfidf_matrix, num_components=32)
+        arrays['game_ids'] = cls.tfidf_model.game_ids
+        cls.index = LoadedANNIndex((1, None), arrays, cls.tfidf_model.vocabulary_fingerprint)
+
+    def setUp(self):
+        ann_index_registry.clear()
+        self.addCleanup(ann_index_registry.clear)
+
+    def profile(self, row):
+        return self.tfidf_model.tfidf_matrix[row].toarray()
+
+    def test_recall_against_exact_top_k(self):
+        report = recall_report(self.tfidf_model, self.index, [8], k=10, num_queries=100)
+        self.assertGreaterEqual(report[0]['recall'], 0.9)
+
+    def test_uses_index_when_valid(self):
+        with mock.patch('games.ann_index.get_ann_index', return_value=self.index):
+            rows = search_similar(self.tfidf_model, self.profile(0), 10, exclude=[0])
+        self.assertEqual(len(rows), 10)
+        self.assertNotIn(0, rows)
+
+    def test_falls_back_to_exact_search(self):
+        exact = top_k(self.tfidf_model.similarities(self.profile(0)), 10, exclude=[0])
+        stale_index = LoadedANNIndex((2, None), {
+            'components': self.index.components,
+            'centroids': self.index.centroids,
+            'list_offsets': self.index.list_offsets,
+            'list_rows': self.index.list_rows,
+            'game_ids': self.index.game_ids,
+        }, 'vocabulario-de-outro-ajuste')
+
+        # Sem índice construído (nenhum GameANNIndex) e com índice de outro vocabulário
+        for index in (None, stale_index):
+            with mock.patch('games.ann_index.get_ann_index', return_value=index):
+                self.assertIsNone(search_similar(self.tfidf_model, self.profile(0), 10, exclude=[0]))
+                rows = most_similar_indices(self.tfidf_model, self.profile(0), 10, [0])
+            np.testing.assert_array_equal(rows, exact)
+
+        # O registro também não encontra índice na base de dados
+        self.assertEqual(most_similar_indices(self.tfidf_model, self.profile(0), 10, [0]).tolist(), exact.tolist())
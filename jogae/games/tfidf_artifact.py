@@ -0,0 +1,126 @@
+import hashlib
+import io
+
+import numpy as np
+from scipy import sparse
+from sklearn.preprocessing import normalize
+
+from .artifact_storage import delete_artifact, load_arrays, save_arrays
+
+
+# Versões do artefato armazenado em GameTFIDF
+# 1 -> matriz TF-IDF serializada com pickle + game_index_map (legado, convertido
+#      para o formato 2 pela migração 0005)
+# 2 -> matriz CSR já normalizada (L2) em formato .npz + lista ordenada de ids
+# 3 -> arrays CSR e lista de ids em arquivos .npy no disco, a linha na base de
+#      dados guarda somente o caminho e o checksum
+# 4 -> formato 3 + vocabulário e pesos IDF do vetorizador, permitindo
+#      transformar jogos novos sem reajustar o modelo
+LEGACY_FORMAT_VERSION = 1
+NPZ_FORMAT_VERSION = 2
+DISK_FORMAT_VERSION = 3
+ARTIFACT_FORMAT_VERSION = 4
+
+ARTIFACT_KIND = 'tfidf'
+MATRIX_ARRAYS = ('data', 'indices', 'indptr', 'shape', 'game_ids')
+VECTORIZER_ARRAYS = ('vocabulary', 'idf')
+
+
+def normalize_matrix(tfidf_matrix):
+    normalized_matrix = normalize(sparse.csr_matrix(tfidf_matrix), norm='l2', copy=True)
+    normalized_matrix.sort_indices()
+    return normalized_matrix
+
+
+def build_artifact(tfidf_matrix, game_ids, vocabulary, idf):
+    """
+    Grava o artefato pronto para servir (matriz CSR normalizada por linha, os
+    ids onde a posição é a linha na matriz, o vocabulário e os pesos IDF) e
+    retorna os campos de GameTFIDF.
+    """
+    normalized_matrix = normalize_matrix(tfidf_matrix)
+    relative_path, checksum = save_arrays(ARTIFACT_KIND, {
+        'data': normalized_matrix.data,
+        'indices': normalized_matrix.indices,
+        'indptr': normalized_matrix.indptr,
+        'shape': np.array(normalized_matrix.shape, dtype=np.int64),
+        'game_ids': np.array([str(game_id) for game_id in game_ids], dtype='U36'),
+        # A posição do termo no vocabulário é a coluna na matriz
+        'vocabulary': np.array(vocabulary, dtype=str),
+        'idf': np.asarray(idf, dtype=np.float64),
+    })
+
+    return {
+        'format_version': ARTIFACT_FORMAT_VERSION,
+        'artifact_path': relative_path,
+        'checksum': checksum,
+    }
+
+
+def load_artifact(game_tfidf_data):
+    """
+    Lê uma linha de GameTFIDF e retorna (matriz normalizada, ids dos jogos,
+    (vocabulário, idf)). No formato 3 os arrays são abertos com mmap, sem
+    cópia. O vocabulário só existe a partir do formato 4, nos anteriores o
+    terceiro item é None.
+    """
+    if game_tfidf_data.format_version >= DISK_FORMAT_VERSION:
+        arrays = load_arrays(
+            game_tfidf_data.artifact_path,
+            artifact_arrays(game_tfidf_data),
+            checksum=game_tfidf_data.checksum,
+        )
+        matrix = sparse.csr_matrix(
+            (arrays['data'], arrays['indices'], arrays['indptr']),
+            shape=tuple(arrays['shape']),
+            copy=False,
+        )
+        vectorizer = None
+        if game_tfidf_data.format_version >= ARTIFACT_FORMAT_VERSION:
+            vectorizer = (arrays['vocabulary'], arrays['idf'])
+        return matrix, arrays['game_ids'], vectorizer
+
+    if game_tfidf_data.format_version == NPZ_FORMAT_VERSION:
+        matrix = sparse.load_npz(io.BytesIO(bytes(game_tfidf_data.tfidf_matrix)))
+        return sparse.csr_matrix(matrix), list(game_tfidf_data.game_ids), None
+
+    raise ValueError(
+        f"Formato de artefato TF-IDF não suportado: {game_tfidf_data.format_version}. "
+        "Execute 'python manage.py precompute_tfidf'."
+    )
+
+
+def artifact_arrays(game_tfidf_data):
+    # O checksum cobre todos os arquivos gravados na versão do artefato
+    if game_tfidf_data.format_version >= ARTIFACT_FORMAT_VERSION:
+        return MATRIX_ARRAYS + VECTORIZER_ARRAYS
+    return MATRIX_ARRAYS
+
+
+def vocabulary_fingerprint(vocabulary):
+    """
+    Identifica o vocabulário (termos e a ordem das colunas) de um ajuste do
+    modelo. Atualizações incrementais mantêm o vocabulário, então artefatos
+    derivados da matriz continuam compatíveis até o próximo ajuste completo.
+    """
+    digest = hashlib.sha256()
+    for term in vocabulary:
+        digest.update(str(term).encode('utf-8'))
+        digest.update(b'\n')
+    return digest.hexdigest()
+
+
+def delete_artifact_files(game_tfidf_data):
+    delete_artifact(game_tfidf_data.artifact_path)
+
+
+def similarity_scores(normalized_matrix, user_profile):
+    """
+    Similaridade de cosseno entre o perfil e cada linha da matriz normalizada,
+    calculada com um único produto esparso. Retorna um vetor 1-D.
+    """
+    profile = np.asarray(user_profile, dtype=np.float64).ravel()
+    norm = np.linalg.norm(profile)
+    if norm == 0:
+        return np.zeros(normalized_matrix.shape[0])
+    return normalized_matrix @ (profile / norm)
@@ -0,0 +1,440 @@
+import logging
+import multiprocessing
+from collections import Counter
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db import connections as db_connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+from scipy import sparse
+from sklearn.feature_extraction.text import CountVectorizer
+from sklearn.preprocessing import normalize
+
+from .documents import DEFAULT_CHUNK_SIZE, document_text, iter_game_documents, load_game_documents
+from .models import Game, GameTFIDF, GameTFIDFChange
+from .tfidf_artifact import (
+    ARTIFACT_FORMAT_VERSION,
+    build_artifact,
+    delete_artifact_files,
+    load_artifact,
+)
+from .similar_games import update_similar_games
+from .tfidf_registry import tfidf_registry
+
+logger = logging.getLogger(__name__)
+
+# Ignorando palavras 'inúteis' para o processamento de linguagem natural e
+# retirando palavras muito incomuns e as muito comuns
+STOP_WORDS = 'english'
+MIN_DF = 3
+MAX_DF = 0.85
+
+def make_analyzer():
+    # Mesmo pré-processamento e tokenização do TfidfVectorizer
+    return CountVectorizer(stop_words=STOP_WORDS).build_analyzer()
+
+
+def make_counter(vocabulary):
+    return CountVectorizer(
+        stop_words=STOP_WORDS,
+        vocabulary={term: i for i, term in enumerate(vocabulary)},
+    )
+
+
+def counts_to_tfidf(counts, idf):
+    """
+    Aplica os pesos IDF sobre a matriz de contagens e normaliza as linhas (L2),
+    exatamente como o TfidfTransformer.
+    """
+    tfidf = sparse.csr_matrix(counts, dtype=np.float64)
+    tfidf.data *= np.asarray(idf)[tfidf.indices]
+    return normalize(tfidf, norm='l2', copy=False)
+
+
+def transform_documents(documents, vocabulary, idf):
+    """
+    Transforma textos novos no espaço TF-IDF já ajustado (vocabulário e IDF
+    armazenados no artefato), sem reajustar o modelo. As linhas retornadas
+    já estão normalizadas (L2), igual ao TfidfVectorizer.
+    """
+    if not documents:
+        return sparse.csr_matrix((0, len(vocabulary)))
+    return counts_to_tfidf(make_counter(vocabulary).transform(documents), idf)
+
+
+def iter_game_chunks(chunk_size=DEFAULT_CHUNK_SIZE, pk_gte=None, pk_lt=None):
+    """
+    Percorre os jogos em blocos ordenados por pk (ver
+    games.documents.iter_game_documents). Cada bloco é uma lista de
+    (id do jogo, conteúdo).
+    """
+    for documents in iter_game_documents(chunk_size, pk_gte, pk_lt):
+        yield [(document['id'], document_text(document)) for document in documents]
+
+
+def count_document_frequencies(chunks, progress=None):
+    """
+    Primeira passagem: conta em quantos documentos cada termo aparece.
+    Retorna (Counter termo -> documentos, total de documentos).
+    """
+    analyzer = make_analyzer()
+    document_frequencies = Counter()
+    num_documents = 0
+    for chunk in chunks:
+        for _, content in chunk:
+            document_frequencies.update(set(analyzer(content)))
+        num_documents += len(chunk)
+        if progress:
+            progress(1, num_documents)
+    return document_frequencies, num_documents
+
+
+def fit_vocabulary(document_frequencies, num_documents):
+    """
+    Aplica min_df/max_df e calcula os pesos IDF (com suavização) da mesma forma
+    que o TfidfVectorizer. Retorna (vocabulário ordenado, idf).
+    """
+    max_doc_count = MAX_DF if isinstance(MAX_DF, int) else MAX_DF * num_documents
+    min_doc_count = MIN_DF if isinstance(MIN_DF, int) else MIN_DF * num_documents
+    vocabulary = sorted(
+        term for term, frequency in document_frequencies.items()
+        if min_doc_count <= frequency <= max_doc_count
+    )
+    if not vocabulary:
+        raise ValueError("Nenhum termo restou após aplicar min_df/max_df.")
+
+    frequencies = np.array([document_frequencies[term] for term in vocabulary], dtype=np.float64)
+    frequencies += 1.0
+    idf = np.full_like(frequencies, fill_value=num_documents + 1)
+    idf /= frequencies
+    np.log(idf, out=idf)
+    idf += 1.0
+    return vocabulary, idf
+
+
+def count_terms(chunks, vocabulary, progress=None):
+    """
+    Segunda passagem: matriz de contagens (jogos x vocabulário) montada bloco a
+    bloco. Retorna (contagens, ids dos jogos na ordem das linhas).
+    """
+    counter = make_counter(vocabulary)
+    blocks, game_ids = [], []
+    for chunk in chunks:
+        blocks.append(counter.transform([content for _, content in chunk]))
+        game_ids.extend(game_id for game_id, _ in chunk)
+        if progress:
+            progress(2, len(game_ids))
+    if not blocks:
+        return sparse.csr_matrix((0, len(vocabulary)), dtype=np.int64), game_ids
+    return sparse.vstack(blocks, format='csr'), game_ids
+
+
+def build_tfidf(chunk_size=DEFAULT_CHUNK_SIZE, progress=None, workers=1):
+    """
+    Monta a matriz TF-IDF do catálogo em duas passagens sobre os jogos em
+    blocos, mantendo em memória somente um bloco de textos por vez.
+
+    Com 'workers' > 1 o catálogo é dividido em faixas de pk processadas em
+    paralelo: cada processo tokeniza e conta a sua faixa, e o processo pai junta
+    as frequências/contagens e aplica o IDF. O resultado é idêntico ao serial.
+
+    Retorna (matriz, ids dos jogos, vocabulário, idf) ou None sem jogos.
+    """
+    if workers > 1:
+        return _build_tfidf_parallel(chunk_size, progress, workers)
+
+    document_frequencies, num_documents = count_document_frequencies(
+        iter_game_chunks(chunk_size), progress=progress
+    )
+    if not num_documents:
+        return None
+    vocabulary, idf = fit_vocabulary(document_frequencies, num_documents)
+    del document_frequencies
+
+    counts, game_ids = count_terms(iter_game_chunks(chunk_size), vocabulary, progress=progress)
+    return counts_to_tfidf(counts, idf), game_ids, vocabulary, idf
+
+
+def shard_bounds(num_shards):
+    """
+    Divide os jogos em faixas contíguas de pk com aproximadamente a mesma
+    quantidade de jogos. Retorna [(pk_gte, pk_lt), ...] na ordem de pk.
+    """
+    total = Game.objects.count()
+    num_shards = max(1, min(num_shards, total))
+    ordered_pks = Game.objects.order_by('pk').values_list('pk', flat=True)
+    splits = [ordered_pks[total * i // num_shards] for i in range(1, num_shards)]
+    bounds = [None] + splits + [None]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def _shard_document_frequencies(task):
+    chunk_size, pk_gte, pk_lt = task
+    return count_document_frequencies(iter_game_chunks(chunk_size, pk_gte, pk_lt))
+
+
+def _shard_counts(task):
+    chunk_size, pk_gte, pk_lt, vocabulary = task
+    return count_terms(iter_game_chunks(chunk_size, pk_gte, pk_lt), vocabulary)
+
+
+def _build_tfidf_parallel(chunk_size, progress, workers):
+    bounds = shard_bounds(workers)
+
+    # Os processos filhos abrem suas próprias conexões com a base de dados
+    db_connections.close_all()
+    # 'fork' para que os filhos herdem o Django já configurado
+    context = multiprocessing.get_context('fork')
+    with context.Pool(processes=len(bounds)) as pool:
+        document_frequencies = Counter()
+        num_documents = 0
+        tasks = [(chunk_size, pk_gte, pk_lt) for pk_gte, pk_lt in bounds]
+        for shard_frequencies, shard_documents in pool.imap(_shard_document_frequencies, tasks):
+            document_frequencies.update(shard_frequencies)
+            num_documents += shard_documents
+            if progress:
+                progress(1, num_documents)
+        if not num_documents:
+            return None
+        vocabulary, idf = fit_vocabulary(document_frequencies, num_documents)
+        del document_frequencies
+
+        # As faixas voltam na ordem de pk, a mesma ordem de linhas do serial
+        blocks, game_ids = [], []
+        tasks = [(chunk_size, pk_gte, pk_lt, vocabulary) for pk_gte, pk_lt in bounds]
+        for shard_counts, shard_game_ids in pool.imap(_shard_counts, tasks):
+            blocks.append(shard_counts)
+            game_ids.extend(shard_game_ids)
+            if progress:
+                progress(2, len(game_ids))
+
+    counts = sparse.vstack(blocks, format='csr')
+    return counts_to_tfidf(counts, idf), game_ids, vocabulary, idf
+
+
+def count_out_of_vocabulary(documents, vocabulary):
+    """
+    Retorna (total de tokens, tokens fora do vocabulário) dos textos, usado
+    para medir o quanto o vocabulário ajustado está defasado.
+    """
+    analyzer = make_analyzer()
+    known_terms = set(vocabulary)
+    token_count = 0
+    oov_count = 0
+    for document in documents:
+        tokens = analyzer(document)
+        token_count += len(tokens)
+        oov_count += sum(1 for token in tokens if token not in known_terms)
+    return token_count, oov_count
+
+
+def drift_ratio(game_tfidf_data):
+    if not game_tfidf_data.drift_token_count:
+        return 0.0
+    return game_tfidf_data.drift_oov_count / game_tfidf_data.drift_token_count
+
+
+def _games_content(game_ids):
+    return {document['id']: document_text(document) for document in load_game_documents(game_ids)}
+
+
+def last_change_id():
+    # Última alteração enfileirada, 0 quando a fila está vazia
+    return GameTFIDFChange.objects.aggregate(last_id=Max('id'))['last_id'] or 0
+
+
+def pending_changes(base, limit=None):
+    """
+    Alterações ainda não refletidas no artefato 'base', da mais antiga para a
+    mais nova. Retorna (ids dos jogos, id da última alteração lida).
+    """
+    queryset = GameTFIDFChange.objects.filter(id__gt=base.last_change_id).order_by('id')
+    if limit:
+        queryset = queryset[:limit]
+    changes = list(queryset.values_list('id', 'game_id'))
+    if not changes:
+        return set(), base.last_change_id
+    return {str(game_id) for _, game_id in changes}, changes[-1][0]
+
+
+def apply_incremental_update(base, game_ids, last_change_id):
+    """
+    Atualiza a matriz TF-IDF de 'base' somente para os jogos informados: jogos
+    novos são adicionados ao final, jogos editados têm sua linha substituída e
+    jogos removidos saem da matriz. O vocabulário e o IDF do último ajuste
+    completo são mantidos.
+
+    O artefato novo (diretório imutável) é trocado na mesma linha de GameTFIDF
+    com a revisão incrementada, assim o id da versão (usado pelos caches de
+    recomendação) só muda em um ajuste completo. A troca só acontece se 'base'
+    ainda é a versão atual na mesma revisão.
+
+    Retorna a linha atualizada ou None quando outra atualização ou um ajuste
+    completo trocou a versão no meio do caminho.
+    """
+    matrix, matrix_game_ids, vectorizer = load_artifact(base)
+    vocabulary, idf = vectorizer
+    matrix_game_ids = np.asarray(matrix_game_ids)
+
+    # Jogos que ainda existem são transformados, os demais foram removidos
+    contents = _games_content(game_ids)
+    changed_ids = list(contents.keys())
+
+    # Posição de cada jogo alterado na matriz atual
+    touched = np.nonzero(np.isin(matrix_game_ids, list(game_ids)))[0]
+    current_position = {str(matrix_game_ids[row]): row for row in touched}
+    if not changed_ids and not current_position:
+        # Jogos criados e removidos antes da atualização: a matriz não muda,
+        # somente a posição da fila avança
+        replaced = GameTFIDF.objects.filter(pk=base.pk, revision=base.revision).update(last_change_id=last_change_id)
+        if not replaced:
+            return None
+        base.last_change_id = last_change_id
+        return base
+
+    new_rows = transform_documents([contents[gid] for gid in changed_ids], vocabulary, idf)
+    num_rows = matrix.shape[0]
+    stacked = sparse.vstack([matrix, new_rows], format='csr')
+
+    # Linhas da nova matriz apontando para 'stacked': as editadas passam a
+    # usar a linha transformada e as removidas saem da matriz
+    order = np.arange(num_rows)
+    keep = np.ones(num_rows, dtype=bool)
+    for game_id, row in current_position.items():
+        if game_id not in contents:
+            keep[row] = False
+    appended_rows, appended_ids = [], []
+    for j, game_id in enumerate(changed_ids):
+        if game_id in current_position:
+            order[current_position[game_id]] = num_rows + j
+        else:
+            appended_rows.append(num_rows + j)
+            appended_ids.append(game_id)
+
+    order = np.concatenate([order[keep], np.array(appended_rows, dtype=order.dtype)])
+    new_game_ids = np.concatenate([matrix_game_ids[keep], np.array(appended_ids, dtype='U36')])
+    new_matrix = stacked[order]
+
+    token_count, oov_count = count_out_of_vocabulary(contents.values(), vocabulary)
+    artifact = build_artifact(new_matrix, new_game_ids, vocabulary, idf)
+    updated = GameTFIDF(
+        pk=base.pk,
+        created_at=base.created_at,
+        revision=base.revision + 1,
+        last_change_id=last_change_id,
+        drift_token_count=base.drift_token_count + token_count,
+        drift_oov_count=base.drift_oov_count + oov_count,
+        **artifact,
+    )
+    updated.needs_refit = _should_refit(updated)
+
+    with transaction.atomic():
+        # Compare-and-swap pela revisão: se outro processo já trocou o
+        # artefato, nada é alterado e a atualização é refeita
+        replaced = GameTFIDF.objects.filter(pk=base.pk, revision=base.revision).update(
+            artifact_path=updated.artifact_path,
+            checksum=updated.checksum,
+            format_version=updated.format_version,
+            revision=updated.revision,
+            last_change_id=updated.last_change_id,
+            drift_token_count=updated.drift_token_count,
+            drift_oov_count=updated.drift_oov_count,
+            needs_refit=updated.needs_refit,
+        )
+    if not replaced:
+        delete_artifact_files(updated)
+        return None
+
+    delete_artifact_files(base)
+    tfidf_registry.invalidate()
+
+    try:
+        # Listas de jogos similares afetadas pelos jogos alterados
+        update_similar_games(new_matrix, new_game_ids, game_ids)
+    except Exception:
+        logger.exception("Falha na atualização das listas de jogos similares.")
+
+    if updated.needs_refit:
+        logger.warning(
+            "Vocabulário TF-IDF defasado (%.1f%% dos tokens fora do vocabulário), "
+            "execute 'python manage.py precompute_tfidf --if-needed'.",
+            drift_ratio(updated) * 100,
+        )
+    return updated
+
+
+def apply_pending_updates(limit=None, max_attempts=3):
+    """
+    Aplica na matriz TF-IDF as alterações enfileiradas (GameTFIDFChange) que
+    ainda não estão no artefato atual, em um único lote de até 'limit'
+    alterações. Roda fora das requisições, pelo comando 'apply_tfidf_updates'.
+
+    Depois de aplicadas, as alterações só saem da fila quando ficam mais
+    antigas que TFIDF_CHANGE_RETENTION: um ajuste completo que começou antes
+    delas as reaplica sobre o artefato novo, ver 'precompute_tfidf'. Se a
+    versão mudar no meio do caminho o lote é lido de novo sobre a versão mais
+    nova.
+
+    Retorna (linha de GameTFIDF atualizada, alterações aplicadas) ou
+    (None, 0) quando não há o que atualizar.
+    """
+    for _ in range(max_attempts):
+        base = GameTFIDF.objects.order_by('-created_at', '-id').first()
+        if base is None:
+            # Sem matriz pré-computada não há o que atualizar
+            return None, 0
+        if base.format_version < ARTIFACT_FORMAT_VERSION:
+            logger.warning(
+                "Artefato TF-IDF %s não possui vocabulário, execute 'precompute_tfidf'.", base.pk
+            )
+            return None, 0
+
+        game_ids, change_id = pending_changes(base, limit)
+        if not game_ids:
+            return None, 0
+
+        updated = apply_incremental_update(base, game_ids, change_id)
+        if updated is not None:
+            prune_changes(updated.last_change_id, older_than=change_retention())
+            return updated, len(game_ids)
+
+    logger.warning("Atualização incremental TF-IDF abandonada após %s tentativas.", max_attempts)
+    return None, 0
+
+
+def change_retention():
+    # Tempo que alterações já aplicadas ficam na fila para um ajuste completo em andamento
+    return timedelta(seconds=getattr(settings, 'TFIDF_CHANGE_RETENTION', 24 * 60 * 60))
+
+
+def prune_changes(up_to_id, older_than=None):
+    """
+    Remove da fila as alterações até 'up_to_id', já refletidas no artefato
+    atual. Com 'older_than' somente as enfileiradas há mais tempo que ele.
+    """
+    queryset = GameTFIDFChange.objects.filter(id__lte=up_to_id)
+    if older_than is not None:
+        queryset = queryset.filter(created_at__lt=timezone.now() - older_than)
+    return queryset.delete()[0]
+
+
+def _should_refit(game_tfidf_data):
+    threshold = getattr(settings, 'TFIDF_REFIT_DRIFT_THRESHOLD', 0.2)
+    min_tokens = getattr(settings, 'TFIDF_REFIT_MIN_TOKENS', 1000)
+    return (
+        game_tfidf_data.drift_token_count >= min_tokens
+        and drift_ratio(game_tfidf_data) > threshold
+    )
+
+
+def schedule_incremental_update(game_ids):
+    """
+    Enfileira os jogos para a próxima execução de 'apply_tfidf_updates'. A
+    linha é gravada na transação que alterou o jogo, então só entra na fila
+    se a alteração for confirmada, e a requisição não espera a matriz.
+    """
+    if not getattr(settings, 'TFIDF_INCREMENTAL_UPDATES', True):
+        return
+    GameTFIDFChange.objects.bulk_create([GameTFIDFChange(game_id=game_id) for game_id in set(game_ids)])
@@ -0,0 +1,87 @@
+import numpy as np
+
+from .artifact_registry import ArtifactRegistry
+from .models import GameTFIDF
+from .tfidf_artifact import load_artifact, similarity_scores, vocabulary_fingerprint
+
+
+class LoadedTFIDF:
+    """
+    Modelo TF-IDF já desserializado e pronto para uso em memória.
+    """
+
+    def __init__(self, version, tfidf_matrix, game_ids, vocabulary=None, idf=None):
+        # version -> (id, created_at, revision) da linha de GameTFIDF que
+        # originou o modelo; o id só muda em um ajuste completo
+        self.version = version
+        # Matriz CSR com as linhas já normalizadas (L2)
+        self.tfidf_matrix = tfidf_matrix
+        # Posição na lista -> linha na matriz TF-IDF
+        self.game_ids = game_ids
+        self.game_index_map = {game_id: i for i, game_id in enumerate(game_ids) if game_id is not None}
+        # Vocabulário (termo -> coluna pela posição) e pesos IDF do ajuste,
+        # None em artefatos antigos que não os armazenam
+        self.vocabulary = vocabulary
+        self.idf = idf
+        self._vocabulary_fingerprint = None
+        self._sorted_game_ids = None
+
+    @property
+    def vocabulary_fingerprint(self):
+        if self._vocabulary_fingerprint is None and self.vocabulary is not None:
+            self._vocabulary_fingerprint = vocabulary_fingerprint(self.vocabulary)
+        return self._vocabulary_fingerprint
+
+    def sorted_game_ids(self):
+        """
+        (linhas, ids) com os ids em ordem crescente, para localizar vários
+        jogos de uma vez com busca binária (np.searchsorted).
+        """
+        if self._sorted_game_ids is None:
+            game_ids = self.game_ids
+            if not isinstance(game_ids, np.ndarray):
+                game_ids = np.array(['' if game_id is None else str(game_id) for game_id in game_ids], dtype='U36')
+            order = np.argsort(game_ids, kind='stable')
+            self._sorted_game_ids = (order, game_ids[order])
+        return self._sorted_game_ids
+
+    def similarities(self, user_profile, rows=None):
+        """
+        Similaridade de cosseno do perfil com todos os jogos ou somente com as
+        linhas informadas em 'rows'.
+        """
+        matrix = self.tfidf_matrix if rows is None else self.tfidf_matrix[rows]
+        return similarity_scores(matrix, user_profile)
+
+
+class TFIDFRegistry(ArtifactRegistry):
+    """
+    Mantém o modelo TF-IDF carregado por processo, recarregando somente quando
+    uma linha mais nova de GameTFIDF aparece ou a revisão da atual muda.
+    """
+
+    model = GameTFIDF
+    # Atualizações incrementais trocam o artefato da mesma linha
+    version_fields = ('id', 'created_at', 'revision')
+
+    def load(self, row, version):
+        tfidf_matrix, game_ids, vectorizer = load_artifact(row)
+        vocabulary, idf = vectorizer if vectorizer is not None else (None, None)
+        return LoadedTFIDF(
+            version=version,
+            tfidf_matrix=tfidf_matrix,
+            game_ids=game_ids,
+            vocabulary=vocabulary,
+            idf=idf,
+        )
+
+
+tfidf_registry = TFIDFRegistry()
+
+
+def get_tfidf_model():
+    """
+    Retorna o modelo TF-IDF em memória (LoadedTFIDF) ou None caso ainda não
+    tenha sido pré-computado.
+    """
+    return tfidf_registry.get()
@@ -7,4 +7,8 @@ urlpatterns = [
     path("", views.indexView, name="index"),
     path("create/", views.CreateView.as_view(), name="create"),
     path("<uuid:pk>/", views.DetailView.as_view(), name="detail"),
+    path("<uuid:pk>/reviews/", views.reviewsView, name="reviews"),
+    path("search/", views.searchView, name="search"),
+    path("typeahead/", views.typeaheadView, name="typeahead"),
+    path("stats/recommendations/", views.recommendationStatsView, name="recommendation_stats"),
 ]
\ No newline at end of file
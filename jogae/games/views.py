@@ -1,18 +1,27 @@
+from asgiref.sync import sync_to_async
 from django.views import generic
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.db.models import Avg, F
-from django.shortcuts import redirect, render
+from django.db import transaction
+from django.conf import settings
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404, redirect, render
+from django.urls import reverse
+from django.utils import formats, timezone
 
 from .models import Game
 from .forms import GameForm, RatingForm
 
-from .recommendation_utils import (
-    get_content_based_recommendations,
-    get_collaborative_recommendations,
-    get_friend_based_recommendations,
-    get_content_based_rating,
-    filter_by_similarity
-)
+from .ann_index import ann_index_registry
+from .item_similarity import item_similarity_registry
+from .recommendation_cache import aget_cached_recommendations, cache_stats
+from .recommendation_orchestrator import aget_home_recommendations
+from .reviews import InvalidCursor, review_page
+from .search import hybrid_search, search_game_ids, search_games
+from .search.semantic import semantic_search
+from .search.typeahead import suggest_titles
+from .similar_games import similar_games_for
+from .tfidf_registry import tfidf_registry
 
 """ class IndexView(generic.ListView):
     template_name = "games/index.html"
@@ -22,8 +31,28 @@ from .recommendation_utils import (
         return Game.objects.annotate(avg_rating=Avg('ratings__rating')).order_by("-avg_rating")[:10]
         return Game.objects.order_by("rating")[:10] """
 
-def indexView(request):
+async def indexView(request):
     user = request.user
+    search_query = request.GET.get('q', '')
+    # Carrega o usuário da sessão fora do event loop, o mesmo objeto é usado no template
+    is_authenticated = await sync_to_async(lambda: user.is_authenticated)()
+
+    # Lista final de recomendações (ids e scores) guardada em cache por usuário,
+    # recalculada somente quando os favoritos, notas, amizades ou a matriz TF-IDF mudam.
+    # As fontes de recomendação rodam ao mesmo tempo, cada uma com seu tempo limite
+    ranked = None
+    if not search_query and is_authenticated:
+        ranked = await aget_cached_recommendations(user, aget_home_recommendations)
+
+    # Consultas dos jogos e renderização do template são síncronas
+    return await sync_to_async(render_index)(request, ranked)
+
+
+def games_by_id(game_ids):
+    return {str(game.pk): game for game in Game.objects.filter(pk__in=game_ids)}
+
+
+def render_index(request, ranked):
     search_query = request.GET.get('q', '')
     sort_param = request.GET.get('orderby', None)
     
@@ -32,63 +61,31 @@ def indexView(request):
     # games_list_with_scores para coletar os jogos recomendados e seu score de similaridade
     games_list_with_scores = []
 
-    # se possuir alguma busca coleta jogos que atingem o item buscado
+    # se possuir alguma busca coleta os jogos mais relevantes para o texto buscado
+    # (título, descrição, gêneros e tags), as ordenações por título e nota
+    # escolhem os 10 dentre mais resultados
     if search_query:
-        games_queryset = Game.objects.filter(title__icontains=search_query)
+        limit = settings.GAME_SEARCH_MAX_RESULTS if sort_param in ('title', 'rating') else 10
+        matched_ids = search_game_ids(search_query, limit=limit)
+        games_map = games_by_id(matched_ids)
+        games_list_with_scores = [
+            (games_map[game_id], None) for game_id in matched_ids
+            if game_id in games_map
+        ]
+    # View padrão, para usuários que não estão autentificados ou não possuem jogos favoritos 
+    elif ranked is None:
+        games_queryset = Game.objects.top_rated()
     else:
-        # Caso não possuir busca efetua processo de recomendação
-        
-        # View padrão, para usuários que não estão autentificados ou não possuem jogos favoritos 
-        if not user.is_authenticated or not hasattr(user, 'favoritegamesbyuser') or not user.favoritegamesbyuser.games.exists():
-            games_queryset = Game.objects.annotate(avg_rating=Avg('ratings__rating')).order_by("-avg_rating")
-        else:
-            # View personalizada para aqueles que estão logados e possuem jogos favoritos
-            user_favorites = list(user.favoritegamesbyuser.games.all())
-
-            # Coleta as recomendações baseada em:
-            # conteúdo comparado com os jogos favoritos | coletando também o gosto do usuário
-            content_recs, user_profile = get_content_based_recommendations(user_favorites, return_profile=True)
-            # usuários com gostos similares
-            collab_recs = get_collaborative_recommendations(user)
-            # amigos
-            friend_recs = get_friend_based_recommendations(user)
-            # conteúdo dos jogos com maiores ratings 
-            rating_recs = get_content_based_rating(user, num_recommendations=5, return_profile=False)
-            
-            # Combina as recomendações
-            combined_recs = rating_recs + content_recs + friend_recs + collab_recs
-
-            final_recommendations = []
-            # Coleta jogos que estejam nos jogos favoritos do usuário
-            seen_pks = {game.pk for game in user_favorites}
-
-            # Adiciona jogos a lista final que não estejam na lista de favoritos 
-            for game in combined_recs:
-                if game.pk not in seen_pks:
-                    final_recommendations.append(game)
-                    seen_pks.add(game.pk)
-
-
-            # Se foi coletado o perfil do usuário filtra dentre todos os jogos que foram coletados recomendados
-            # os 10 que possuem a maior similaridade com o gosto do usuário
-            if user_profile is not None:
-                # retorna uma tupla de (jogo, score de similaridade)
-                games_list_with_scores = filter_by_similarity(user_profile, final_recommendations, num_recommendations=len(final_recommendations))
-            else:
-                # Se não possui o gosto do usuário retorna uma tupla de (jogos, score nulo)
-                games_list_with_scores = [(game, None) for game in final_recommendations]
-
-            # Se ainda não tiver os 10 jogos, completa com jogos populares
-            if len(games_list_with_scores) < 10:
-                needed = 10 - len(games_list_with_scores)
-                # coleta jogos que foram colocados na lista dos mais recomendados
-                current_pks = {game.pk for game, score in games_list_with_scores}
-                seen_pks.update(current_pks)
-                # pega os melhores jogos por rating e retira os jogos que ja foram colocados
-                filler_games = Game.objects.annotate(
-                    avg_rating=Avg('ratings__rating')
-                ).exclude(pk__in=seen_pks).order_by('-avg_rating')[:needed]
-                games_list_with_scores.extend([(game, None) for game in filler_games])
+        # View personalizada para aqueles que estão logados e possuem jogos favoritos.
+        # Somente os jogos exibidos são buscados, as ordenações por título e nota
+        # escolhem os 10 dentre todos os recomendados
+        if sort_param not in ('title', 'rating'):
+            ranked = ranked[:10]
+        games_map = games_by_id([game_id for game_id, score in ranked])
+        games_list_with_scores = [
+            (games_map[game_id], score) for game_id, score in ranked
+            if game_id in games_map
+        ]
 
     # Aplica os parâmetros de organização
     if sort_param:
@@ -96,7 +93,7 @@ def indexView(request):
             if sort_param == 'title':
                 games_queryset = games_queryset.order_by('title')
             elif sort_param == 'rating':
-                games_queryset = games_queryset.annotate(avg_rating=Avg('ratings__rating')).order_by('-avg_rating')
+                games_queryset = games_queryset.top_rated()
         else:
             if sort_param == 'title':
                 games_list_with_scores = sorted(games_list_with_scores, key=lambda item: item[0].title)
@@ -107,9 +104,7 @@ def indexView(request):
                 # coletando somente os ids dos jogos
                 game_ids = list(score_map.keys())
                 # fazendo uma filtragem pelos jogos mais bem avaliados 
-                games_with_ratings = Game.objects.filter(pk__in=game_ids).annotate(
-                    avg_rating=Avg('ratings__rating')
-                ).order_by('-avg_rating')
+                games_with_ratings = Game.objects.filter(pk__in=game_ids).top_rated()
                 # Recolocando jogos na nova ordem
                 games_list_with_scores = [(game, score_map.get(game.id)) for game in games_with_ratings]
 
@@ -127,21 +122,129 @@ def indexView(request):
     return render(request, 'games/index.html', context)
 
 
+def typeaheadView(request):
+    # Sugestões de títulos enquanto o usuário digita, respondidas pelo índice
+    # em memória (games.search.typeahead) sem consultar a base de dados
+    query = request.GET.get('q', '')
+    try:
+        limit = int(request.GET.get('limit', settings.TYPEAHEAD_MAX_RESULTS))
+    except ValueError:
+        limit = settings.TYPEAHEAD_MAX_RESULTS
+    limit = max(1, min(limit, settings.TYPEAHEAD_MAX_RESULTS))
+
+    results = [
+        {'id': game_id, 'title': title, 'url': reverse('games:detail', kwargs={'pk': game_id})}
+        for game_id, title in suggest_titles(query, limit=limit)
+    ]
+    return JsonResponse({'results': results})
+
+
+def searchView(request):
+    # Busca em JSON: 'mode' escolhe a busca textual (keyword), por conteúdo
+    # (semantic) ou a combinação das duas (hybrid, padrão)
+    query = request.GET.get('q', '')
+    mode = request.GET.get('mode', 'hybrid')
+    try:
+        limit = int(request.GET.get('limit', 10))
+    except ValueError:
+        limit = 10
+    limit = max(1, min(limit, settings.GAME_SEARCH_MAX_RESULTS))
+
+    if not query.strip():
+        results = []
+    elif mode == 'keyword':
+        results = search_games(query, limit=limit)
+    elif mode == 'semantic':
+        results = semantic_search(query, limit=limit)
+    elif mode == 'hybrid':
+        try:
+            semantic_weight = float(request.GET.get('weight', settings.GAME_SEARCH_SEMANTIC_WEIGHT))
+        except ValueError:
+            semantic_weight = settings.GAME_SEARCH_SEMANTIC_WEIGHT
+        results = hybrid_search(query, limit=limit, semantic_weight=max(0.0, min(semantic_weight, 1.0)))
+    else:
+        return JsonResponse({'error': 'Modo de busca inválido.'}, status=400)
+
+    titles = dict(Game.objects.filter(pk__in=[game_id for game_id, _ in results]).values_list('id', 'title'))
+    titles = {str(game_id): title for game_id, title in titles.items()}
+    return JsonResponse({
+        'mode': mode,
+        'results': [
+            {
+                'id': game_id,
+                'title': titles[game_id],
+                'url': reverse('games:detail', kwargs={'pk': game_id}),
+                'score': score,
+            }
+            for game_id, score in results
+            if game_id in titles
+        ],
+    })
+
+
+def reviewsView(request, pk):
+    # Próximas páginas das avaliações do jogo (rolagem infinita), a partir do
+    # cursor devolvido pela página anterior
+    game = get_object_or_404(Game.objects.only('pk'), pk=pk)
+    try:
+        ratings, next_cursor = review_page(
+            game,
+            request.GET.get('orderby', 'recentes'),
+            cursor=request.GET.get('cursor'),
+        )
+    except InvalidCursor as error:
+        return JsonResponse({'error': str(error)}, status=400)
+
+    return JsonResponse({
+        'results': [
+            {
+                'id': rating.pk,
+                'rating': rating.rating,
+                'body': rating.body,
+                'username': rating.user.username,
+                'profile_url': reverse('profile:profile', args=[rating.user.username]),
+                'created': formats.date_format(timezone.localtime(rating.created), 'd M, Y'),
+            }
+            for rating in ratings
+        ],
+        'next_cursor': next_cursor,
+    })
+
+
+@staff_member_required
+def recommendationStatsView(request):
+    # Métricas do processo (worker) que atendeu a requisição
+    return JsonResponse({
+        'home_cache': cache_stats.as_dict(),
+        'tfidf': tfidf_registry.stats(),
+        'item_similarity': item_similarity_registry.stats(),
+        'ann_index': ann_index_registry.stats(),
+    })
+
+
 class DetailView(generic.DetailView):
     model = Game
     template_name = "games/detail.html"
 
+    def get_queryset(self):
+        # Criador, gêneros e tags carregados junto com o jogo
+        return Game.objects.select_related('user').prefetch_related('genres', 'tags')
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        game = self.get_object()
+        # Jogo já carregado pelo DetailView (get/post), sem consultar de novo
+        game = self.object
 
         ordering = self.request.GET.get('orderby', 'recentes') 
 
-        if ordering == 'recentes':
-            context['ratings'] = game.ratings.order_by('-created')
+        # Primeira página das avaliações com os autores em uma única consulta,
+        # as demais são carregadas pelo reviewsView; a quantidade e a média
+        # vêm dos agregados guardados no próprio jogo
+        context['ratings'], context['next_cursor'] = review_page(game, ordering)
+        context['ordering'] = ordering
 
-        if ordering == 'rating':
-            context['ratings'] = game.ratings.order_by('-rating')
+        # Lista pré-calculada pelo precompute_tfidf, uma única consulta
+        context['similar_games'] = similar_games_for(game)
 
         if self.request.user.is_authenticated:
             context['rating_form'] = RatingForm()
@@ -158,7 +261,9 @@ class DetailView(generic.DetailView):
             rating = form.save(commit=False)
             rating.game = self.object
             rating.user = request.user
-            rating.save()
+            # A nota e os agregados do jogo (games.rating_aggregates) são salvos juntos
+            with transaction.atomic():
+                rating.save()
             return redirect(self.object.get_absolute_url())
         else:
             context = self.get_context_data()
@@ -179,4 +284,7 @@ class CreateView(LoginRequiredMixin, generic.CreateView):
 
     def form_valid(self, form):
         form.instance.user = self.request.user
-        return super().form_valid(form)
+        # Jogo, gêneros e tags são salvos juntos, assim o jogo só entra na fila
+        # da matriz TF-IDF e no índice de busca com tudo já gravado
+        with transaction.atomic():
+            return super().form_valid(form)
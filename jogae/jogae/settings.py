@@ -162,4 +162,126 @@ AUTH_USER_MODEL='app_cadastro_usuario.User'
 
 # Page to redirect after login / logout
 LOGIN_REDIRECT_URL= '/'
-LOGOUT_REDIRECT_URL= '/'
\ No newline at end of file
+LOGOUT_REDIRECT_URL= '/'
+
+# Recommendations
+# Seconds a worker reuses an in-memory recommendation artifact (TF-IDF model,
+# item-item similarities) before checking the database for a newer version.
+ARTIFACTS_VERSION_CHECK_INTERVAL = 2
+
+# Directory where precomputed recommendation artifacts (memory-mapped .npy
+# files) are written. Each GameTFIDF row points to a versioned subdirectory.
+ARTIFACTS_ROOT = BASE_DIR / 'artifacts'
+ARTIFACTS_VERIFY_CHECKSUM = True
+
+# Incremental TF-IDF updates: games created, edited or deleted are queued in the
+# saving transaction and transformed with the stored vocabulary/IDF by
+# `apply_tfidf_updates` (run it with --loop or from cron), off the request path.
+# Once more than TFIDF_REFIT_DRIFT_THRESHOLD of the incrementally added tokens
+# are out of the vocabulary, the artifact is flagged for
+# `precompute_tfidf --if-needed`.
+TFIDF_INCREMENTAL_UPDATES = True
+# Applied queue entries are kept this many seconds, so a full refit that
+# started before them can re-apply them on top of its new artifact; refits
+# running longer than this may miss edits applied in the meantime.
+TFIDF_CHANGE_RETENTION = 24 * 60 * 60
+TFIDF_REFIT_DRIFT_THRESHOLD = 0.2
+TFIDF_REFIT_MIN_TOKENS = 1000
+
+# Approximate nearest-neighbour index (`build_ann_index`) for content
+# recommendations. Catalogs smaller than ANN_MIN_CATALOG_SIZE always use the
+# exact search; ANN_NPROBE is the number of inverted lists visited per query
+# (higher = better recall, slower). See the recall@k report of the command.
+ANN_INDEX_ENABLED = True
+ANN_MIN_CATALOG_SIZE = 50000
+ANN_NPROBE = 8
+
+# Per-user cache of the home page recommendations (ids and scores). Entries are
+# invalidated when the user's favorites, ratings or friendships change and
+# when a new TF-IDF version is active. With several workers configure a shared
+# backend (e.g. Redis) so invalidations reach every process.
+RECOMMENDATION_CACHE_TTL = 60 * 15
+
+# Per-user friend id sets (app_profile.friend_graph) used by the friends sidebar,
+# invalidated when a friendship of the user changes. The same note about a
+# shared backend applies.
+FRIEND_GRAPH_CACHE_TTL = 60 * 5
+# In-memory graph of accepted friendships (mutual friends and suggestions on the
+# profile page). Changes made in the process are applied immediately; the graph
+# is rebuilt in the background every FRIEND_GRAPH_REFRESH_INTERVAL seconds.
+FRIEND_GRAPH_REFRESH_INTERVAL = 60 * 5
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'recommendations': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'recommendations',
+        'TIMEOUT': RECOMMENDATION_CACHE_TTL,
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    'friends': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'friends',
+        'TIMEOUT': FRIEND_GRAPH_CACHE_TTL,
+        'OPTIONS': {'MAX_ENTRIES': 50000},
+    },
+}
+
+# Time budget (seconds) of each home page recommendation source. The sources
+# run concurrently; a source over its budget is dropped (and logged) and the
+# page is built from the others plus popular games, without being cached.
+RECOMMENDATION_SOURCE_BUDGETS = {
+    'content': 0.5,
+    'rating': 0.5,
+    'friends': 0.5,
+    'collaborative': 0.5,
+}
+
+# Weight of the friends score (friends who saved the game, weighted by their
+# ratings) added to the content similarity when ranking the home page
+# recommendations; both are normalized to [0, 1] by the best game of the list.
+FRIEND_RECOMMENDATION_WEIGHT = 0.3
+
+# Rating aggregates stored on Game. Ordering by rating uses the plain average
+# ('average') or the Bayesian average ('bayesian'), which behaves as if every
+# game had RATING_PRIOR_WEIGHT extra ratings of RATING_PRIOR_MEAN.
+RATING_ORDERING = 'average'
+RATING_PRIOR_MEAN = 3.0
+RATING_PRIOR_WEIGHT = 5
+
+# Game search backend. The SQLite FTS5 index (created by the games migrations)
+# ranks by bm25 over title, description, genres and tags; use
+# 'games.search.backends.database.DatabaseSearchBackend' on databases without FTS5.
+GAME_SEARCH_BACKEND = 'games.search.backends.sqlite_fts.SQLiteFTSBackend'
+# Matches considered when search results are re-sorted by title or rating.
+GAME_SEARCH_MAX_RESULTS = 200
+# Weight of the content (TF-IDF) similarity when blending it with the keyword
+# search in games:search, from 0 (keyword only) to 1 (content only).
+GAME_SEARCH_SEMANTIC_WEIGHT = 0.5
+
+# Title suggestions (games:typeahead) are served from an in-memory prefix index
+# per process, rebuilt in the background when a game changes in the process or
+# every TYPEAHEAD_REFRESH_INTERVAL seconds.
+TYPEAHEAD_MAX_RESULTS = 10
+TYPEAHEAD_REFRESH_INTERVAL = 60
+
+# Similar games shown on the game page, precomputed by precompute_tfidf and
+# refreshed by the incremental TF-IDF updates.
+SIMILAR_GAMES_TOP_N = 10
+
+# Reviews per page on the game page; further pages are loaded by cursor
+# (games:reviews) as the user scrolls.
+REVIEWS_PAGE_SIZE = 20
+
+# Messages rendered when a chat room opens; older ones are loaded by cursor
+# (chat:history) as the user scrolls up.
+CHAT_HISTORY_PAGE_SIZE = 50
+
+# Chat messages are broadcast right away and saved in batches by a per-process
+# write buffer (app_chat.write_buffer): a batch is written when it reaches
+# CHAT_WRITE_BUFFER_SIZE messages or CHAT_WRITE_BUFFER_INTERVAL seconds after
+# its oldest message arrived.
+CHAT_WRITE_BUFFER_SIZE = 100
+CHAT_WRITE_BUFFER_INTERVAL = 0.5
@@ -29,4 +29,102 @@ document.addEventListener('DOMContentLoaded', function() {
             }
         });
     }
-});
\ No newline at end of file
+});
+// Sugestões de títulos no campo de busca de jogos
+document.addEventListener('DOMContentLoaded', function() {
+    const input = document.querySelector('input[data-typeahead-url]');
+    if (!input) {
+        return;
+    }
+    const suggestions = document.getElementById(input.getAttribute('list'));
+    let timer = null;
+    let controller = null;
+
+    input.addEventListener('input', function() {
+        clearTimeout(timer);
+        const query = input.value.trim();
+        if (!query) {
+            suggestions.innerHTML = '';
+            return;
+        }
+
+        timer = setTimeout(function() {
+            // Descarta a requisição anterior que ainda não respondeu
+            if (controller) {
+                controller.abort();
+            }
+            controller = new AbortController();
+
+            fetch(input.dataset.typeaheadUrl + '?q=' + encodeURIComponent(query), { signal: controller.signal })
+                .then(function(response) { return response.json(); })
+                .then(function(data) {
+                    suggestions.innerHTML = '';
+                    data.results.forEach(function(game) {
+                        const option = document.createElement('option');
+                        option.value = game.title;
+                        suggestions.appendChild(option);
+                    });
+                })
+                .catch(function() {});
+        }, 150);
+    });
+});
+// Rolagem infinita das avaliações na página do jogo
+document.addEventListener('DOMContentLoaded', function() {
+    const list = document.querySelector('.reviews-list[data-reviews-url]');
+    const sentinel = document.querySelector('.reviews-sentinel');
+    if (!list || !sentinel || !('IntersectionObserver' in window)) {
+        return;
+    }
+    let loading = false;
+
+    function reviewCard(review) {
+        const card = document.createElement('div');
+        card.className = 'review-card';
+
+        const header = document.createElement('div');
+        header.className = 'review-card-header';
+        const rating = document.createElement('span');
+        rating.className = 'review-rating';
+        rating.textContent = 'Nota: ' + review.rating.toFixed(1).replace('.', ',') + ' / 5.0';
+        const meta = document.createElement('span');
+        meta.className = 'review-meta';
+        const author = document.createElement('a');
+        author.href = review.profile_url;
+        author.textContent = review.username;
+        meta.append('Por ', author, ' em ' + review.created);
+        header.append(rating, meta);
+
+        const body = document.createElement('div');
+        body.className = 'review-card-body';
+        const text = document.createElement('p');
+        text.textContent = review.body;
+        body.appendChild(text);
+
+        card.append(header, body);
+        return card;
+    }
+
+    const observer = new IntersectionObserver(function(entries) {
+        if (!entries[0].isIntersecting || loading || !list.dataset.nextCursor) {
+            return;
+        }
+        loading = true;
+        const params = new URLSearchParams({ orderby: list.dataset.ordering, cursor: list.dataset.nextCursor });
+        fetch(list.dataset.reviewsUrl + '?' + params)
+            .then(function(response) { return response.json(); })
+            .then(function(data) {
+                data.results.forEach(function(review) {
+                    list.appendChild(reviewCard(review));
+                });
+                list.dataset.nextCursor = data.next_cursor || '';
+                if (!data.next_cursor) {
+                    observer.disconnect();
+                    sentinel.remove();
+                }
+            })
+            .catch(function() {})
+            .finally(function() { loading = false; });
+    });
+    observer.observe(sentinel);
+});